@@ -0,0 +1,161 @@
+# benchmark_email_fetch.py
+"""Compare IMAP acquisition modes against a local stand-in server.
+
+The stand-in server answers imaplib-style calls from memory and sleeps for
+a configurable round-trip time on every command, which is the cost that
+batching removes. Run with: python benchmark_email_fetch.py [messages] [rtt_ms]
+"""
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+from src.collectors.email_collector import EmailMetadataExtractor, migrate_email_database
+from src.collectors.message_store import MessageStore
+
+
+class StandInIMAP:
+    """Minimal in-memory IMAP server with a simulated network round trip."""
+
+    def __init__(self, messages, rtt=0.1, uidvalidity=1):
+        self.messages = messages  # uid -> raw RFC822 bytes
+        self.rtt = rtt
+        self.uidvalidity = uidvalidity
+        self.round_trips = 0
+        self.bytes_sent = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+
+    def status(self, mailbox, items):
+        self._round_trip()
+        return 'OK', [f'{mailbox} (UIDVALIDITY {self.uidvalidity})'.encode()]
+
+    def uid(self, command, *args):
+        self._round_trip()
+        if command == 'SEARCH':
+            low = int(re.search(r'UID (\d+):', args[1]).group(1))
+            uids = [uid for uid in sorted(self.messages) if uid >= low]
+            return 'OK', [b' '.join(str(uid).encode() for uid in uids)]
+        if command == 'FETCH':
+            headers_only = 'HEADER' in args[1]
+            data = []
+            for uid in self._expand(args[0]):
+                if uid in self.messages:
+                    raw = self.messages[uid]
+                    if headers_only:
+                        raw = raw.split(b'\r\n\r\n', 1)[0] + b'\r\n\r\n'
+                        trailer = b' BODYSTRUCTURE ("text" "plain" NIL NIL NIL "7bit" 0 0))'
+                    else:
+                        trailer = b')'
+                    data.append((f'{uid} (UID {uid} BODY[] {{{len(raw)}}}'.encode(), raw))
+                    data.append(trailer)
+                    self.bytes_sent += len(raw) + len(trailer)
+            return 'OK', data
+        return 'NO', [b'unsupported']
+
+    def _expand(self, uid_set):
+        for part in uid_set.split(','):
+            if ':' in part:
+                low, high = part.split(':')
+                yield from range(int(low), int(high) + 1)
+            else:
+                yield int(part)
+
+    def close(self):
+        pass
+
+    def logout(self):
+        pass
+
+
+class StandInExtractor(EmailMetadataExtractor):
+    """EmailMetadataExtractor wired to the stand-in and a scratch database."""
+
+    def __init__(self, server, db_path):
+        self.stand_in = server
+        self.db_path = db_path
+        super().__init__('stand-in', 'benchmark', '')
+
+    def setup_connections(self):
+        self.mail = self.stand_in
+        self.conn = sqlite3.connect(self.db_path)
+        migrate_email_database(self.conn)
+
+    def get_message_store(self):
+        if self.message_store is None:
+            self.message_store = MessageStore(self.db_path + '.messages')
+        return self.message_store
+
+
+def make_messages(count, body_size=4096):
+    body = ('x' * 76 + '\r\n') * (body_size // 78)
+    return {
+        uid: (
+            f"From: sender{uid}@example.com\r\n"
+            f"To: custodian@example.com\r\n"
+            f"Subject: Benchmark message {uid}\r\n"
+            f"Date: Mon, 3 Mar 2025 10:00:00 +0000\r\n"
+            f"Message-ID: <bench-{uid}@example.com>\r\n"
+            f"Authentication-Results: mx.example.com; spf=pass; dkim=pass\r\n"
+            f"\r\n{body}"
+        ).encode()
+        for uid in range(1, count + 1)
+    }
+
+
+def run_per_message(server, db_path):
+    """The old path: one UID FETCH round trip per message."""
+    extractor = StandInExtractor(server, db_path)
+    uids = extractor.search_new_uids(0)
+    for uid in uids:
+        status, data = extractor.mail.uid('FETCH', str(uid), '(RFC822)')
+        for response_part in data:
+            if isinstance(response_part, tuple):
+                extractor.process_raw_message(response_part[1])
+    extractor.cleanup()
+    return len(uids)
+
+
+def run_batched(server, db_path):
+    """sync_emails: UID-range batches with fetch/parse overlap."""
+    extractor = StandInExtractor(server, db_path)
+    return extractor.sync_emails()
+
+
+def run_headers_only(server, db_path):
+    """sync_emails in header-only mode: BODY.PEEK[HEADER] + BODYSTRUCTURE."""
+    extractor = StandInExtractor(server, db_path)
+    return extractor.sync_emails(headers_only=True)
+
+
+def benchmark(name, runner, count, rtt):
+    server = StandInIMAP(make_messages(count), rtt=rtt)
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        stored = runner(server, db_path)
+        elapsed = time.perf_counter() - start
+    finally:
+        for path in (db_path, db_path + '.messages', db_path + '.messages-wal', db_path + '.messages-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+    print(f"{name:<14} {stored:>6} msgs  {server.round_trips:>6} round trips  "
+          f"{server.bytes_sent / 1024:9.0f} KiB  {elapsed:8.2f} s  {stored / elapsed:9.1f} msg/s")
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rtt = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+
+    print(f"Fetching {count} messages with {rtt * 1000:.0f} ms simulated RTT")
+    benchmark("per-message", run_per_message, count, rtt)
+    benchmark("batched", run_batched, count, rtt)
+    benchmark("headers-only", run_headers_only, count, rtt)
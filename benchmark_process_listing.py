@@ -0,0 +1,91 @@
+# benchmark_process_listing.py
+"""Compare the psutil and /proc-native process listing paths (Linux only).
+
+Idle child processes are spawned to bring the process count up to a
+realistic host size, then both paths list every process repeatedly:
+
+  psutil   process_iter with the attributes the sampler needs
+  proc     read_process_table (stat + status per PID) into columns
+
+Rows present in both listings are cross-checked. Run with:
+python benchmark_process_listing.py [extra_processes] [rounds]
+"""
+import os
+import subprocess
+import sys
+import time
+
+import psutil
+
+from src.memory_analysis.proc_enumerator import proc_fs_available, read_process_table
+from src.memory_analysis.process_sampler import SAMPLE_ATTRS
+
+
+def list_psutil():
+    processes = []
+    for proc in psutil.process_iter(SAMPLE_ATTRS):
+        info = proc.info
+        memory = info['memory_info']
+        processes.append({
+            'pid': info['pid'],
+            'name': info['name'],
+            'username': info['username'],
+            'memory_usage': memory.rss // 1024 // 1024 if memory else 0,
+            'cpu_time': info['cpu_times'].user + info['cpu_times'].system if info['cpu_times'] else None
+        })
+    return processes
+
+
+def list_proc():
+    table = read_process_table()
+    return table.processes(sort_by_memory=False)
+
+
+def spawn_children(count):
+    return [subprocess.Popen(['sleep', '600']) for _ in range(count)]
+
+
+def benchmark(name, runner, rounds):
+    runner()  # warm caches (psutil's process map, username lookups)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        rows = runner()
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"{name:<8} {len(rows):>6} processes  {elapsed * 1000:8.1f} ms/listing  "
+          f"{elapsed / len(rows) * 1e6:7.1f} us/process")
+    return rows
+
+
+def compare(psutil_rows, proc_rows):
+    by_pid = {row['pid']: row for row in psutil_rows}
+    checked = mismatched = 0
+    for row in proc_rows:
+        other = by_pid.get(row['pid'])
+        if other is None:
+            continue
+        checked += 1
+        # RSS may move by a page or two between the two listings
+        if row['name'] != other['name'] or row['username'] != other['username'] or \
+                abs(row['memory_usage'] - other['memory_usage']) > 1:
+            mismatched += 1
+            print(f"  mismatch pid {row['pid']}: {row} vs {other}")
+    print(f"Cross-checked {checked} processes, {mismatched} mismatches")
+
+
+if __name__ == "__main__":
+    if not proc_fs_available():
+        sys.exit("The /proc fast path needs Linux")
+
+    extra = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    children = spawn_children(extra)
+    try:
+        print(f"Listing {len(psutil.pids())} processes, {rounds} rounds each (pid {os.getpid()})")
+        psutil_rows = benchmark("psutil", list_psutil, rounds)
+        proc_rows = benchmark("proc", list_proc, rounds)
+        compare(psutil_rows, proc_rows)
+    finally:
+        for child in children:
+            child.kill()
+            child.wait()
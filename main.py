@@ -2,6 +2,7 @@ import os
 import sys
 from dotenv import load_dotenv
 from src.collectors.email_collector import EmailMetadataExtractor
+from src.collectors.attachment_extractor import AttachmentExtractor
 from src.collectors.file_collector import LocalFileExtractor
 from src.dashboard.dashboard import ForensicsDashboard
 # Add this import at the top
@@ -23,17 +24,25 @@ def collect_evidence(email_settings, directory_to_scan):
         email_settings['user'],
         email_settings['password']
     )
-    email_extractor.fetch_emails(limit=10)
+    email_extractor.sync_emails()
+
+    # Email attachments become evidence files alongside the scanned directory
+    attachment_extractor = AttachmentExtractor()
+    attachment_extractor.extract_pending()
+    attachment_extractor.close()
    
     # Local file collection
     file_extractor = LocalFileExtractor(directory_to_scan)
-    file_extractor.collect_files()
+    counts = file_extractor.collect_files()
     file_extractor.close()
+    print(f"📁 {counts['files']} files collected: {counts['known_good']} known good, "
+          f"{counts['known_bad']} known bad")
    
     # Use enhanced analyzer instead of the old FileAnalyzer
     analyzer = EnhancedFileAnalyzer()
     cursor = analyzer.conn.cursor()
-    cursor.execute("SELECT file_path FROM file_metadata")
+    # Files matching a known-good hash set need no analysis
+    cursor.execute("SELECT file_path FROM file_metadata WHERE known_status IS NOT 'known_good'")
    
     print("\n🔍 Starting enhanced file analysis...")
     for (file_path,) in cursor.fetchall():
@@ -13,6 +13,10 @@ import struct
 import logging
 from pathlib import Path
 from src.chain_of_custody.custody_manager import CustodyManager
+from src.collectors.attachment_extractor import setup_analysis_queue
+from src.collectors.hash_sets import (
+    KNOWN_BAD, KNOWN_GOOD, KnownFileFilter, file_digests, setup_known_file_columns
+)
 from PIL.ExifTags import TAGS
 
 
@@ -25,6 +29,7 @@ class EnhancedFileAnalyzer:
         self.db_initialized = False  # Add flag
         self.setup_database()
         self.magic_instance = magic.Magic(mime=True)
+        self.known_files = KnownFileFilter(db_path)
 
     def setup_logging(self):
         """Setup logging configuration"""
@@ -86,6 +91,20 @@ class EnhancedFileAnalyzer:
                 FOREIGN KEY (evidence_id) REFERENCES file_metadata(id)
             )""")
 
+            # The latest analysis and image rows of a file are looked up by
+            # file_id in every evidence listing
+            self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_file_analysis_file_id
+            ON file_analysis (file_id)""")
+            self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_image_metadata_file_id
+            ON image_metadata (file_id)""")
+
+            # Files waiting for analysis, e.g. extracted email attachments
+            setup_analysis_queue(self.conn)
+
+            setup_known_file_columns(self.conn)
+
             self.conn.commit()
             logging.info("Database tables created/verified")
             self.db_initialized = True  # Set flag
@@ -112,22 +131,69 @@ class EnhancedFileAnalyzer:
             self.logger.error(f"Error extracting basic metadata from {file_path}: {str(e)}")
             raise
 
+    def check_known_file(self, file_id):
+        """Return (known_status, hash_set) for an evidence file.
+
+        Uses the result recorded at collection time; files collected
+        before any hash set was loaded are looked up now and the result
+        stored. Only SHA-256 is recorded, so digests an MD5 or SHA-1 set
+        needs are computed from the file when it is still on disk.
+        """
+        row = self.conn.execute(
+            "SELECT known_status, hash_set, hash_sha256, file_path FROM file_metadata WHERE id = ?",
+            (file_id,)
+        ).fetchone()
+        if not row:
+            return None, None
+        known_status, hash_set, file_hash, file_path = row
+        if known_status is None and self.known_files:
+            digests = {'sha256': file_hash} if file_hash else {}
+            missing = [algorithm for algorithm in self.known_files.algorithms if algorithm not in digests]
+            if missing and file_path and os.path.isfile(file_path):
+                try:
+                    digests.update(file_digests(file_path, missing))
+                except OSError as e:
+                    self.logger.error(f"Error hashing {file_path}: {str(e)}")
+            known_status, hash_set = self.known_files.lookup(digests)
+            if known_status:
+                self.conn.execute(
+                    "UPDATE file_metadata SET known_status = ?, hash_set = ? WHERE id = ?",
+                    (known_status, hash_set, file_id)
+                )
+                self.conn.commit()
+        return known_status, hash_set
+
     def analyze_file(self, file_path):
+        """Analyze one evidence file.
+
+        Files matching a known-good hash set are skipped and the returned
+        dict has skipped=True; known-bad matches are analyzed and carry
+        their known_status so callers can flag them.
+        """
         try:
-            self.logger.info(f"Starting analysis of {file_path}")
-            metadata = self.extract_basic_metadata(file_path)
-            
             # Get file_id
             cursor = self.conn.cursor()
             cursor.execute("SELECT id FROM file_metadata WHERE file_path = ?", (file_path,))
             file_id = cursor.fetchone()[0]
 
+            known_status, hash_set = self.check_known_file(file_id)
+            if known_status == KNOWN_GOOD:
+                self.logger.info(f"Skipping analysis of {file_path}: known good ({hash_set})")
+                return {'skipped': True, 'known_status': known_status, 'hash_set': hash_set}
+            if known_status == KNOWN_BAD:
+                self.logger.warning(f"{file_path} matches known-bad hash set {hash_set}")
+
+            self.logger.info(f"Starting analysis of {file_path}")
+            metadata = self.extract_basic_metadata(file_path)
+
             # Initialize analysis data
             analysis_data = {
                 'file_type': metadata['file_type'],
                 'mime_type': metadata['mime_type'],
                 'file_size': metadata['file_size'],
-                'manipulation_confidence': 0.0
+                'manipulation_confidence': 0.0,
+                'known_status': known_status,
+                'hash_set': hash_set
             }
 
             # Perform type-specific analysis
@@ -560,6 +626,36 @@ class EnhancedFileAnalyzer:
             self.logger.error(f"Error storing analysis results: {str(e)}")
             raise
 
+    def analyze_pending(self, limit=None):
+        """Analyze files queued in analysis_queue; returns (done, failed)"""
+        query = """
+            SELECT q.file_id, fm.file_path FROM analysis_queue q
+            JOIN file_metadata fm ON fm.id = q.file_id
+            WHERE q.status = 'pending'
+            ORDER BY q.file_id
+        """
+        params = ()
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (limit,)
+
+        done = failed = 0
+        for file_id, file_path in self.conn.execute(query, params).fetchall():
+            try:
+                result = self.analyze_file(file_path)
+                status = 'skipped' if result.get('skipped') else 'done'
+                done += 1
+            except Exception:
+                status = 'failed'
+                failed += 1
+            self.conn.execute(
+                "UPDATE analysis_queue SET status = ? WHERE file_id = ?", (status, file_id)
+            )
+            self.conn.commit()
+
+        self.logger.info(f"Analysis queue: {done} analyzed, {failed} failed")
+        return done, failed
+
     def get_file_id(self, file_path):
         """Get file_id from file_metadata table"""
         cursor = self.conn.cursor()
@@ -572,5 +668,6 @@ class EnhancedFileAnalyzer:
 
     def close(self):
         """Close database connection"""
+        self.known_files.close()
         self.conn.close()
         logging.info("Enhanced File Analyzer closed")
\ No newline at end of file
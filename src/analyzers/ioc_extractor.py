@@ -0,0 +1,344 @@
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import sqlite3
+from datetime import datetime
+from multiprocessing import Pool
+
+from src.memory_analysis.dump_format import CHUNK_ZERO, DumpReader, is_dump_container
+
+EVIDENCE_DB = "src/database/evidence.db"
+
+# Bytes of a raw file each worker task owns
+SCAN_CHUNK_SIZE = 64 * 1024 * 1024
+# Context scanned on each side of a chunk so matches crossing a boundary
+# are found whole; also the longest match reported
+SCAN_OVERLAP = 4096
+# Memory dump container chunks handed to a worker per task
+DUMP_CHUNKS_PER_TASK = 256
+
+# Common TLDs only: bare domain matching against binaries is otherwise
+# swamped by file names such as "libc.so"
+DOMAIN_TLDS = (
+    'com', 'net', 'org', 'edu', 'gov', 'mil', 'int', 'info', 'biz', 'io', 'co', 'me', 'tv',
+    'xyz', 'top', 'online', 'site', 'club', 'app', 'dev', 'cloud', 'onion', 'us', 'uk',
+    'de', 'fr', 'nl', 'ru', 'cn', 'jp', 'kr', 'in', 'br', 'au', 'ca', 'es', 'it', 'pl',
+    'ir', 'ua', 'tk', 'su', 'cc', 'ws', 'to', 'pw'
+)
+
+IOC_PATTERNS = (
+    ('url', rb'(?:https?|ftp)://[!#-;=?-~]{3,2000}'),
+    ('email', rb'[A-Za-z0-9._%+-]{1,64}@(?:[A-Za-z0-9-]{1,63}\.){1,8}[A-Za-z]{2,24}\b'),
+    ('ipv4', rb'(?<![\d.])(?:(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.){3}'
+             rb'(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)(?![\d.])'),
+    ('eth_address', rb'\b0x[0-9a-fA-F]{40}\b'),
+    ('btc_address', rb'\b(?:bc1[ac-hj-np-z02-9]{11,71}|[13][a-km-zA-HJ-NP-Z1-9]{25,34})\b'),
+    ('domain', rb'\b(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.){1,8}(?:'
+               + b'|'.join(tld.encode() for tld in DOMAIN_TLDS) + rb')\b'),
+)
+
+# Every IOC is printable ASCII of at least this many bytes ("x.io").
+# The combined matcher only runs over such text runs: a single-class
+# scan skips binary data far faster than the alternation can.
+MIN_IOC_LENGTH = 4
+ASCII_RUN = re.compile(rb'[\x20-\x7e]{%d,}' % MIN_IOC_LENGTH)
+# UTF-16LE text made of printable ASCII characters
+UTF16_RUN = re.compile(rb'(?:[\x20-\x7e]\x00){%d,}' % MIN_IOC_LENGTH)
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+logger = logging.getLogger(__name__)
+
+
+def build_matcher():
+    """Compile every IOC pattern into one alternation.
+
+    The group that matched (match.lastgroup) names the IOC type.
+    """
+    return re.compile(b'|'.join(b'(?P<' + name.encode() + b'>' + pattern + b')'
+                                for name, pattern in IOC_PATTERNS))
+
+
+def build_keyword_matcher(keywords):
+    """Compile keywords, as UTF-8 and as UTF-16LE, into one alternation.
+
+    Keywords may be any length and contain any characters, so unlike the
+    IOC patterns they are matched over the raw data rather than text
+    runs. Case is ignored for ASCII letters only. Returns None without
+    keywords.
+    """
+    if not keywords:
+        return None
+    encoded = {'utf8': [], 'utf16': []}
+    for keyword in keywords:
+        if not keyword:
+            raise ValueError("Empty IOC keyword")
+        utf16 = keyword.encode('utf-16-le')
+        # Longer keywords could cross a chunk boundary unseen
+        if len(utf16) > SCAN_OVERLAP:
+            raise ValueError(f"IOC keyword longer than {SCAN_OVERLAP // 2} characters: {keyword[:40]}...")
+        encoded['utf8'].append(re.escape(keyword.encode('utf-8')))
+        encoded['utf16'].append(re.escape(utf16))
+    return re.compile(b'|'.join(b'(?P<' + name.encode() + b'>' + b'|'.join(alternatives) + b')'
+                                for name, alternatives in encoded.items()),
+                      re.IGNORECASE)
+
+
+def valid_base58check(address):
+    """Verify the checksum of a legacy (base58) Bitcoin address."""
+    number = 0
+    for char in address:
+        number = number * 58 + BASE58_ALPHABET.index(char)
+    raw = number.to_bytes(25, 'big') if number.bit_length() <= 200 else None
+    if raw is None:
+        return False
+    return hashlib.sha256(hashlib.sha256(raw[:-4]).digest()).digest()[:4] == raw[-4:]
+
+
+def validate_hit(ioc_type, value):
+    if ioc_type == 'btc_address' and not value.startswith('bc1'):
+        return valid_base58check(value)
+    return True
+
+
+def scan_window(matcher, data, base, own_start, own_end, keyword_matcher=None):
+    """Match one buffer; return hits whose offset lies in [own_start, own_end).
+
+    base is the offset (or virtual address) of data[0]. Printable ASCII
+    runs and UTF-16LE runs are found first and only they are matched;
+    UTF-16LE runs are narrowed to ASCII and use the same matcher, with
+    offsets mapped back. Keywords are matched over the whole buffer.
+    """
+    hits = []
+    if keyword_matcher is not None:
+        for match in keyword_matcher.finditer(data):
+            offset = base + match.start()
+            if own_start <= offset < own_end:
+                if match.lastgroup == 'utf16':
+                    value, encoding = match.group().decode('utf-16-le', errors='replace'), 'utf-16le'
+                else:
+                    value = match.group().decode('utf-8', errors='replace')
+                    encoding = 'ascii' if value.isascii() else 'utf-8'
+                hits.append(('keyword', value, offset, encoding))
+    for run in ASCII_RUN.finditer(data):
+        for match in matcher.finditer(run.group()):
+            offset = base + run.start() + match.start()
+            if own_start <= offset < own_end:
+                value = match.group().decode('ascii', errors='replace')
+                if validate_hit(match.lastgroup, value):
+                    hits.append((match.lastgroup, value, offset, 'ascii'))
+    for run in UTF16_RUN.finditer(data):
+        text = run.group()[::2]
+        for match in matcher.finditer(text):
+            offset = base + run.start() + match.start() * 2
+            if own_start <= offset < own_end:
+                value = match.group().decode('ascii', errors='replace')
+                if validate_hit(match.lastgroup, value):
+                    hits.append((match.lastgroup, value, offset, 'utf-16le'))
+    return hits
+
+
+# Per-process matchers, compiled once by init_worker
+worker_matcher = None
+worker_keyword_matcher = None
+
+
+def init_worker(keywords):
+    global worker_matcher, worker_keyword_matcher
+    worker_matcher = build_matcher()
+    worker_keyword_matcher = build_keyword_matcher(keywords)
+
+
+def scan_file_range(task):
+    """Worker: scan [start, end) of a raw file through mmap."""
+    path, start, end = task
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        window_start = max(0, start - SCAN_OVERLAP)
+        window_end = min(len(mm), end + SCAN_OVERLAP)
+        return scan_window(worker_matcher, mm[window_start:window_end], window_start, start, end,
+                           worker_keyword_matcher)
+
+
+def scan_dump_chunks(task):
+    """Worker: scan container chunks [first, last), with neighbours as context.
+
+    Offsets are virtual addresses. Context from an adjacent chunk is only
+    used when it is contiguous in the address space.
+    """
+    path, first, last = task
+    hits = []
+    with DumpReader(path) as reader:
+        chunks = reader.chunks
+        loaded = {}
+
+        def chunk(position):
+            if position not in loaded:
+                loaded[position] = reader.chunk_data(position)
+            return loaded[position]
+
+        for position in range(first, last):
+            address, _, _, length, flags = chunks[position]
+            # Keep only the previous chunk as context
+            for old in [p for p in loaded if p < position - 1]:
+                del loaded[old]
+            if flags & CHUNK_ZERO:
+                continue
+            window = chunk(position)
+            window_address = address
+            if position > 0:
+                previous_address, _, _, previous_length, previous_flags = chunks[position - 1]
+                if previous_address + previous_length == address and not previous_flags & CHUNK_ZERO:
+                    tail = chunk(position - 1)[-SCAN_OVERLAP:]
+                    window = tail + window
+                    window_address -= len(tail)
+            if position + 1 < len(chunks):
+                next_address, _, _, _, next_flags = chunks[position + 1]
+                if next_address == address + length and not next_flags & CHUNK_ZERO:
+                    window = window + chunk(position + 1)[:SCAN_OVERLAP]
+            hits.extend(scan_window(worker_matcher, window, window_address,
+                                    address, address + length, worker_keyword_matcher))
+    return hits
+
+
+def setup_ioc_tables(conn):
+    """Create ioc_hits and its lookup indexes"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS ioc_hits (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        file_id INTEGER,
+        source_path TEXT NOT NULL,
+        ioc_type TEXT NOT NULL,
+        value TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        encoding TEXT,
+        scan_timestamp TEXT,
+        FOREIGN KEY (file_id) REFERENCES file_metadata(id)
+    )""")
+    # Pivot from an indicator to every place it was seen
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_ioc_hits_value
+    ON ioc_hits (value, ioc_type)""")
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_ioc_hits_source
+    ON ioc_hits (source_path, offset)""")
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_ioc_hits_file_id
+    ON ioc_hits (file_id, ioc_type)""")
+    conn.commit()
+
+
+class IOCExtractor:
+    """Extract IOCs (URLs, IPs, emails, domains, wallets, keywords) from evidence.
+
+    Raw files are memory-mapped and split into SCAN_CHUNK_SIZE ranges;
+    memory dump containers are split into runs of chunks. A process pool
+    scans the pieces with one combined matcher each. Neighbouring data
+    is scanned as overlap so matches crossing a split are found once.
+    Hits are stored in ioc_hits with their offset (the virtual address
+    for memory dumps), replacing earlier hits for the same source.
+    """
+
+    def __init__(self, db_path=EVIDENCE_DB, workers=None, keywords=()):
+        self.db_path = db_path
+        self.workers = workers or os.cpu_count() or 1
+        self.keywords = tuple(keywords)
+        # Rejects unusable keywords before any scan starts
+        build_keyword_matcher(self.keywords)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.setup_database()
+
+    def setup_database(self):
+        """Create the ioc_hits table if it doesn't exist"""
+        setup_ioc_tables(self.conn)
+
+    def build_tasks(self, path):
+        if is_dump_container(path):
+            with DumpReader(path) as reader:
+                count = len(reader.chunks)
+            return scan_dump_chunks, [
+                (path, first, min(first + DUMP_CHUNKS_PER_TASK, count))
+                for first in range(0, count, DUMP_CHUNKS_PER_TASK)
+            ]
+        size = os.path.getsize(path)
+        return scan_file_range, [
+            (path, start, min(start + SCAN_CHUNK_SIZE, size))
+            for start in range(0, size, SCAN_CHUNK_SIZE)
+        ]
+
+    def scan(self, path, file_id=None):
+        """Scan one file or dump; returns hit counts by IOC type.
+
+        Hits are staged in a temp table while the scan runs (which takes
+        no lock on evidence.db) and replace the source's earlier hits in
+        one transaction at the end, so a failed scan keeps the old ones.
+        """
+        worker, tasks = self.build_tasks(path)
+        timestamp = datetime.now().isoformat()
+        counts = {}
+        self.conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS ioc_scan_hits (
+            ioc_type TEXT NOT NULL,
+            value TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            encoding TEXT
+        )""")
+        self.conn.execute("DELETE FROM ioc_scan_hits")
+        try:
+            with Pool(self.workers, initializer=init_worker, initargs=(self.keywords,)) as pool:
+                for hits in pool.imap_unordered(worker, tasks):
+                    if not hits:
+                        continue
+                    self.conn.executemany("""
+                        INSERT INTO ioc_scan_hits (ioc_type, value, offset, encoding) VALUES (?, ?, ?, ?)
+                    """, hits)
+                    for hit in hits:
+                        counts[hit[0]] = counts.get(hit[0], 0) + 1
+        except Exception:
+            self.conn.rollback()
+            raise
+        with self.conn:
+            self.conn.execute("DELETE FROM ioc_hits WHERE source_path = ?", (path,))
+            self.conn.execute("""
+                INSERT INTO ioc_hits (file_id, source_path, ioc_type, value, offset,
+                                      encoding, scan_timestamp)
+                SELECT ?, ?, ioc_type, value, offset, encoding, ? FROM ioc_scan_hits
+                ORDER BY offset
+            """, (file_id, path, timestamp))
+            self.conn.execute("DELETE FROM ioc_scan_hits")
+        logger.info(f"IOC scan of {path}: {sum(counts.values())} hits in {len(tasks)} tasks")
+        return counts
+
+    def scan_evidence(self, file_id):
+        """Scan a file_metadata entry (evidence file or memory dump)."""
+        row = self.conn.execute(
+            "SELECT file_path FROM file_metadata WHERE id = ?", (file_id,)
+        ).fetchone()
+        if not row:
+            raise Exception(f"Evidence {file_id} not found")
+        return self.scan(row[0], file_id)
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.analyzers.ioc_extractor PATH [PATH ...] [--keyword K ...] [--workers N]
+    parser = argparse.ArgumentParser(description="Extract IOCs from files and memory dumps")
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--keyword', action='append', default=[])
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    extractor = IOCExtractor(workers=args.workers, keywords=args.keyword)
+    try:
+        for path in args.paths:
+            print(path, json.dumps(extractor.scan(path), indent=2))
+    finally:
+        extractor.close()
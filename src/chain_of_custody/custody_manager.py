@@ -5,6 +5,14 @@ import logging
 import os
 from contextlib import contextmanager
 
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """SHA-256 of a file read in chunks, so large evidence (e.g. memory dumps) is never loaded whole"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
 class CustodyManager:
     def __init__(self, db_path="src/database/evidence.db"):
         self.db_path = db_path
@@ -39,16 +47,19 @@ class CustodyManager:
         )""")
         self.conn.commit()
 
-    def log_action(self, evidence_id, evidence_type, action_type, handler, location, file_path=None, notes=None):
-        """Log an action in the chain of custody"""
+    def log_action(self, evidence_id, evidence_type, action_type, handler, location, file_path=None, notes=None,
+                   file_hash=None):
+        """Log an action in the chain of custody
+
+        Pass file_hash when the caller already hashed the file while writing it.
+        """
         try:
             timestamp = datetime.now().isoformat()
             hash_before = self.get_latest_hash(evidence_id)  # Get previous hash
-            hash_after = None
+            hash_after = file_hash
 
-            if file_path and os.path.exists(file_path):
-                with open(file_path, 'rb') as f:
-                    hash_after = hashlib.sha256(f.read()).hexdigest()
+            if hash_after is None and file_path and os.path.exists(file_path):
+                hash_after = hash_file(file_path)
 
             cursor = self.conn.cursor()
             cursor.execute("""
@@ -69,6 +80,36 @@ class CustodyManager:
             self.logger.error(f"Error logging custody action: {str(e)}")
             raise
 
+    def log_actions(self, actions, commit=True):
+        """Log several custody actions with one executemany.
+
+        actions are dicts of log_action's keyword arguments. With
+        commit=False the rows join the caller's open transaction on
+        self.conn, e.g. alongside the evidence rows they describe.
+        """
+        timestamp = datetime.now().isoformat()
+        rows = []
+        for action in actions:
+            hash_after = action.get('file_hash')
+            file_path = action.get('file_path')
+            if hash_after is None and file_path and os.path.exists(file_path):
+                hash_after = hash_file(file_path)
+            rows.append((
+                int(action['evidence_id']), action['evidence_type'], action['action_type'], timestamp,
+                action['handler'], action['location'], self.get_latest_hash(action['evidence_id']),
+                hash_after, action.get('notes')
+            ))
+        self.conn.executemany("""
+            INSERT INTO custody_chain (
+                evidence_id, evidence_type, action_type, action_timestamp,
+                handler, location, hash_before, hash_after, notes
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        if commit:
+            self.conn.commit()
+        self.logger.info(f"Custody actions logged for {len(rows)} evidence items")
+        return len(rows)
+
     def get_custody_chain(self, evidence_id):
         """Get all custody records for an evidence item"""
         try:
@@ -112,8 +153,7 @@ class CustodyManager:
         """Verify file integrity by comparing current hash with last recorded hash"""
         current_hash = None
         if file_path:
-            with open(file_path, 'rb') as f:
-                current_hash = hashlib.sha256(f.read()).hexdigest()
+            current_hash = hash_file(file_path)
         
         last_hash = self.get_latest_hash(evidence_id)
         return current_hash == last_hash if last_hash else False
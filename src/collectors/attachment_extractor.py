@@ -0,0 +1,363 @@
+import binascii
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+from datetime import datetime
+from email.parser import BytesHeaderParser
+from email import policy
+
+from src.collectors.email_collector import DB_NAME as EMAIL_DB_NAME
+from src.collectors.message_store import MessageStore
+
+# Under the web app's evidence folder, independent of the working directory
+EVIDENCE_ROOT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'web_app', 'evidence'
+)
+ATTACHMENT_DIR = os.path.join(EVIDENCE_ROOT, 'attachments')
+EVIDENCE_DB = "src/database/evidence.db"
+
+logger = logging.getLogger(__name__)
+
+
+class Base64Decoder:
+    """Incremental base64 decoder; input may be split at any line."""
+
+    def __init__(self):
+        self.leftover = b''
+
+    def decode(self, line):
+        data = self.leftover + re.sub(rb'[^A-Za-z0-9+/=]', b'', line)
+        usable = len(data) - len(data) % 4
+        self.leftover = data[usable:]
+        return binascii.a2b_base64(data[:usable]) if usable else b''
+
+    def finish(self):
+        if not self.leftover:
+            return b''
+        # Tolerate truncated input by padding the final quantum
+        padded = self.leftover + b'=' * (-len(self.leftover) % 4)
+        self.leftover = b''
+        try:
+            return binascii.a2b_base64(padded)
+        except binascii.Error:
+            return b''
+
+
+class QuotedPrintableDecoder:
+    def decode(self, line):
+        return binascii.a2b_qp(line)
+
+    def finish(self):
+        return b''
+
+
+class IdentityDecoder:
+    def decode(self, line):
+        return line
+
+    def finish(self):
+        return b''
+
+
+def make_decoder(transfer_encoding):
+    encoding = (transfer_encoding or '').strip().lower()
+    if encoding == 'base64':
+        return Base64Decoder()
+    if encoding == 'quoted-printable':
+        return QuotedPrintableDecoder()
+    return IdentityDecoder()
+
+
+class StreamingMimeWalker:
+    """Walk a MIME message line by line without building it in memory.
+
+    Only the header block of each part is parsed as a whole; bodies are
+    passed to on_part one decoded chunk at a time (or skipped), so memory
+    use is bounded by the longest line rather than the message size.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.header_parser = BytesHeaderParser(policy=policy.default)
+
+    def walk(self, on_part):
+        """Call on_part(headers) for every leaf part.
+
+        on_part returns a sink with write(bytes) and close() to receive
+        the decoded body, or None to skip the part.
+        """
+        self._parse_entity([], on_part)
+
+    def _read_headers(self):
+        lines = []
+        while True:
+            line = self.stream.readline()
+            if not line or line in (b'\r\n', b'\n'):
+                break
+            lines.append(line)
+        return self.header_parser.parsebytes(b''.join(lines))
+
+    @staticmethod
+    def _match_boundary(line, boundaries):
+        """Return (boundary, is_close) if line delimits one of boundaries."""
+        if not line.startswith(b'--'):
+            return None
+        stripped = line.rstrip()
+        for boundary in reversed(boundaries):
+            if stripped == b'--' + boundary:
+                return boundary, False
+            if stripped == b'--' + boundary + b'--':
+                return boundary, True
+        return None
+
+    def _parse_entity(self, boundaries, on_part):
+        """Parse one entity; return the delimiter line that ended it (or None)."""
+        headers = self._read_headers()
+        if headers.get_content_maintype() == 'multipart' and headers.get_boundary():
+            return self._parse_multipart(headers.get_boundary().encode(), boundaries, on_part)
+        return self._read_leaf(headers, boundaries, on_part(headers))
+
+    def _parse_multipart(self, boundary, boundaries, on_part):
+        inner = boundaries + [boundary]
+        # Skip the preamble up to the first delimiter
+        line = self._skip_to_boundary(inner)
+        while line is not None:
+            match = self._match_boundary(line, inner)
+            if match[0] != boundary:
+                return line  # An enclosing multipart ended first
+            if match[1]:
+                # Closing delimiter: skip the epilogue
+                return self._skip_to_boundary(boundaries)
+            line = self._parse_entity(inner, on_part)
+        return None
+
+    def _skip_to_boundary(self, boundaries):
+        while True:
+            line = self.stream.readline()
+            if not line or self._match_boundary(line, boundaries):
+                return line or None
+
+    def _read_leaf(self, headers, boundaries, sink):
+        decoder = make_decoder(headers.get('Content-Transfer-Encoding')) if sink else None
+        previous = None
+        while True:
+            line = self.stream.readline()
+            end = not line or self._match_boundary(line, boundaries)
+            if sink and previous is not None:
+                if end and line:
+                    # The line break before a delimiter belongs to the delimiter
+                    previous = previous.rstrip(b'\r\n')
+                sink.write(decoder.decode(previous))
+            if end:
+                break
+            previous = line
+        if sink:
+            sink.write(decoder.finish())
+            sink.close()
+        return line or None
+
+
+class HashingFileSink:
+    """Write decoded bytes to a temporary file while hashing them."""
+
+    def __init__(self, directory, headers):
+        self.headers = headers
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        fd, self.temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        self.file = os.fdopen(fd, 'wb')
+
+    def write(self, data):
+        if data:
+            self.hasher.update(data)
+            self.file.write(data)
+            self.size += len(data)
+
+    def close(self):
+        self.file.close()
+
+    @property
+    def sha256(self):
+        return self.hasher.hexdigest()
+
+
+def setup_analysis_queue(conn):
+    """Create analysis_queue, the files waiting for the file analyzers"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS analysis_queue (
+        file_id INTEGER PRIMARY KEY,
+        source TEXT,
+        queued_at TEXT,
+        status TEXT DEFAULT 'pending',
+        FOREIGN KEY (file_id) REFERENCES file_metadata(id)
+    )""")
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_analysis_queue_status
+    ON analysis_queue (status)""")
+
+
+def safe_file_name(name):
+    """Reduce an attachment filename to a safe basename."""
+    name = os.path.basename((name or '').replace('\\', '/'))
+    name = re.sub(r'[^\w.\- ]', '_', name).strip(' .')
+    return name[:200] or 'attachment'
+
+
+class AttachmentExtractor:
+    """Extract email attachments into the evidence store.
+
+    Attachments are decoded from a stream, hashed while written, and
+    deduplicated by SHA-256 against file_metadata, so one copy is kept no
+    matter how many messages carry it. Each attachment is linked to its
+    message in email_attachments and queued in analysis_queue for the
+    file analyzers.
+    """
+
+    def __init__(self, attachment_dir=ATTACHMENT_DIR, db_path=EVIDENCE_DB):
+        self.attachment_dir = attachment_dir
+        os.makedirs(attachment_dir, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.setup_database()
+
+    def setup_database(self):
+        """Create attachment link and analysis queue tables"""
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS email_attachments (
+            message_sha256 TEXT NOT NULL,
+            file_id INTEGER NOT NULL,
+            file_name TEXT,
+            content_type TEXT,
+            PRIMARY KEY (message_sha256, file_id, file_name),
+            FOREIGN KEY (file_id) REFERENCES file_metadata(id)
+        )""")
+        self.conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_email_attachments_file_id
+        ON email_attachments (file_id)""")
+        setup_analysis_queue(self.conn)
+        self.conn.commit()
+
+    def extract_from_stream(self, stream, message_sha256):
+        """Extract every attachment of one message; returns their records."""
+        sinks = []
+
+        def on_part(headers):
+            if headers.get_content_disposition() != 'attachment':
+                return None
+            sink = HashingFileSink(self.attachment_dir, headers)
+            sinks.append(sink)
+            return sink
+
+        created = []
+        try:
+            StreamingMimeWalker(stream).walk(on_part)
+            try:
+                with self.conn:
+                    return [self.store_attachment(sink, message_sha256, created) for sink in sinks]
+            except Exception:
+                # Rolled back: no row points at the files moved into place
+                for file_path in created:
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+                raise
+        finally:
+            for sink in sinks:
+                if not sink.file.closed:
+                    sink.close()
+                if os.path.exists(sink.temp_path):
+                    os.remove(sink.temp_path)
+
+    def store_attachment(self, sink, message_sha256, created):
+        """Move a decoded attachment into place (or drop it as a duplicate).
+
+        Paths of files this call created are appended to created, so the
+        caller can remove them if the transaction rolls back.
+        """
+        file_name = safe_file_name(sink.headers.get_filename())
+        sha256 = sink.sha256
+        row = self.conn.execute(
+            "SELECT id, file_path FROM file_metadata WHERE hash_sha256 = ?", (sha256,)
+        ).fetchone()
+
+        if row:
+            file_id, file_path = row
+            duplicate = True
+        else:
+            file_path = os.path.join(self.attachment_dir, sha256[:2], f"{sha256}_{file_name}")
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            if not os.path.exists(file_path):
+                created.append(file_path)
+            os.replace(sink.temp_path, file_path)
+            cursor = self.conn.execute("""
+                INSERT INTO file_metadata (file_name, file_path, file_size, hash_sha256, last_modified)
+                VALUES (?, ?, ?, ?, ?)
+            """, (file_name, file_path, sink.size, sha256, datetime.now().isoformat()))
+            file_id = cursor.lastrowid
+            self.conn.execute("""
+                INSERT OR IGNORE INTO analysis_queue (file_id, source, queued_at)
+                VALUES (?, 'email_attachment', ?)
+            """, (file_id, datetime.now().isoformat()))
+            duplicate = False
+
+        self.conn.execute("""
+            INSERT OR IGNORE INTO email_attachments (message_sha256, file_id, file_name, content_type)
+            VALUES (?, ?, ?, ?)
+        """, (message_sha256, file_id, file_name, sink.headers.get_content_type()))
+
+        return {
+            'file_id': file_id,
+            'file_name': file_name,
+            'file_path': file_path,
+            'size': sink.size,
+            'sha256': sha256,
+            'duplicate': duplicate
+        }
+
+    def extract_pending(self, limit=None, email_db=EMAIL_DB_NAME):
+        """Extract attachments of stored emails not yet processed.
+
+        Messages are streamed out of the MessageStore, so only the
+        compressed copy and one line are held in memory at a time.
+        Returns (messages processed, attachments extracted).
+        """
+        email_conn = sqlite3.connect(email_db, timeout=30)
+        store = MessageStore()
+        messages = extracted = 0
+        try:
+            query = """
+                SELECT id, raw_sha256 FROM email_metadata
+                WHERE has_attachments = 1 AND attachments_extracted = 0
+                  AND raw_sha256 IS NOT NULL
+                ORDER BY id
+            """
+            params = ()
+            if limit is not None:
+                query += " LIMIT ?"
+                params = (limit,)
+            for email_id, raw_sha256 in email_conn.execute(query, params).fetchall():
+                try:
+                    stream = store.open_stream(raw_sha256)
+                    if stream is None:
+                        continue
+                    with stream:
+                        extracted += len(self.extract_from_stream(stream, raw_sha256))
+                    with email_conn:
+                        email_conn.execute(
+                            "UPDATE email_metadata SET attachments_extracted = 1 WHERE id = ?",
+                            (email_id,)
+                        )
+                    messages += 1
+                except Exception as e:
+                    logger.error(f"Attachment extraction failed for email {email_id}: {str(e)}")
+            logger.info(f"Extracted {extracted} attachments from {messages} emails")
+            return messages, extracted
+        finally:
+            store.close()
+            email_conn.close()
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,217 @@
+import logging
+from email.parser import HeaderParser
+
+# Per-mechanism results and domains stored alongside spf/dkim/dmarc_pass
+AUTH_COLUMNS = (
+    'spf_result', 'spf_domain', 'dkim_result', 'dkim_domain',
+    'dmarc_result', 'dmarc_domain'
+)
+
+AUTH_METHODS = ('spf', 'dkim', 'dmarc')
+
+# RFC 8601 result for "no result"; stored instead of NULL so NULL means
+# the row has not been scored yet
+NO_RESULT = 'none'
+
+logger = logging.getLogger(__name__)
+
+
+def split_header_value(value, separator=';'):
+    """Split a structured header value on separator, dropping comments.
+
+    Parenthesised comments (which may nest) are removed and separators
+    inside quoted strings are ignored.
+    """
+    segments = []
+    current = []
+    depth = 0
+    quoted = False
+    escaped = False
+    for char in value:
+        if escaped:
+            escaped = False
+            if depth == 0:
+                current.append(char)
+            continue
+        if char == '\\':
+            escaped = True
+            if depth == 0:
+                current.append(char)
+        elif quoted:
+            current.append(char)
+            if char == '"':
+                quoted = False
+        elif char == '(':
+            depth += 1
+        elif char == ')' and depth:
+            depth -= 1
+        elif depth:
+            continue
+        elif char == '"':
+            quoted = True
+            current.append(char)
+        elif char == separator:
+            segments.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    segments.append(''.join(current).strip())
+    return [segment for segment in segments if segment]
+
+
+def parse_key_values(segment):
+    """Return [(key, value)] for the key=value tokens of one segment."""
+    pairs = []
+    for token in segment.split():
+        key, sep, value = token.partition('=')
+        if sep:
+            pairs.append((key.strip().lower(), value.strip().strip('"')))
+    return pairs
+
+
+def address_domain(value):
+    """Return the domain of an address or identity ("user@domain", "@domain", "domain")."""
+    if not value:
+        return None
+    return value.rsplit('@', 1)[-1].strip('<>').lower() or None
+
+
+def parse_authentication_results(value):
+    """Parse an Authentication-Results header (RFC 8601).
+
+    Returns [(method, result, {ptype.property: value})] in header order;
+    the authserv-id is skipped.
+    """
+    results = []
+    for segment in split_header_value(value)[1:]:
+        pairs = parse_key_values(segment)
+        if not pairs:
+            continue
+        method, result = pairs[0]
+        # Methods may carry a version, e.g. "dkim/1"
+        method = method.split('/', 1)[0]
+        results.append((method, result.lower(), dict(pairs[1:])))
+    return results
+
+
+def parse_received_spf(value):
+    """Parse a Received-SPF header (RFC 7208); returns (result, domain)."""
+    value = value.strip()
+    if not value:
+        return None, None
+    result = value.split(None, 1)[0].lower()
+    properties = {}
+    # Key/value pairs follow the result and its optional comment
+    for segment in split_header_value(value[len(result):]):
+        properties.update(parse_key_values(segment))
+    domain = address_domain(properties.get('envelope-from')) or properties.get('helo')
+    return result, domain
+
+
+def parse_dkim_signature(value):
+    """Return (signing domain, selector) from a DKIM-Signature header."""
+    tags = {}
+    for segment in value.split(';'):
+        tag, sep, tag_value = segment.partition('=')
+        if sep:
+            tags[tag.strip().lower()] = ''.join(tag_value.split())
+    return (tags.get('d') or '').lower() or None, tags.get('s')
+
+
+def choose_result(results):
+    """Pick the result to record when a method reports several (e.g. two DKIM signatures)."""
+    for result in results:
+        if result[0] == 'pass':
+            return result
+    return results[0]
+
+
+def analyze_auth_headers(headers):
+    """Score SPF, DKIM and DMARC from a message's header fields only.
+
+    headers is an iterable of (name, value) pairs, e.g. msg.items(). Only
+    Authentication-Results, Received-SPF and DKIM-Signature are read, so
+    the cost does not depend on the body and body text cannot produce a
+    pass. For each method the topmost Authentication-Results header that
+    reports it wins, since that is the one added by the receiving server.
+    Returns (spf_pass, dkim_pass, dmarc_pass) followed by AUTH_COLUMNS.
+    """
+    reported = {}
+    received_spf = None
+    signature_domain = None
+
+    for name, value in headers:
+        name = name.lower()
+        value = str(value)
+        if name == 'authentication-results':
+            found = {}
+            for method, result, properties in parse_authentication_results(value):
+                if method in AUTH_METHODS and method not in reported:
+                    if method == 'spf':
+                        domain = address_domain(properties.get('smtp.mailfrom')) \
+                            or address_domain(properties.get('smtp.helo'))
+                    elif method == 'dkim':
+                        domain = (properties.get('header.d') or '').lower() \
+                            or address_domain(properties.get('header.i'))
+                    else:
+                        domain = address_domain(properties.get('header.from'))
+                    found.setdefault(method, []).append((result, domain))
+            for method, results in found.items():
+                reported[method] = choose_result(results)
+        elif name == 'received-spf' and received_spf is None:
+            received_spf = parse_received_spf(value)
+        elif name == 'dkim-signature' and signature_domain is None:
+            signature_domain = parse_dkim_signature(value)[0]
+
+    if 'spf' not in reported and received_spf and received_spf[0]:
+        reported['spf'] = received_spf
+
+    spf_result, spf_domain = reported.get('spf', (NO_RESULT, None))
+    dkim_result, dkim_domain = reported.get('dkim', (NO_RESULT, None))
+    dmarc_result, dmarc_domain = reported.get('dmarc', (NO_RESULT, None))
+    # An unverified signature still names the claimed signing domain
+    dkim_domain = dkim_domain or signature_domain
+
+    return (
+        int(spf_result == 'pass'), int(dkim_result == 'pass'), int(dmarc_result == 'pass'),
+        spf_result, spf_domain, dkim_result, dkim_domain, dmarc_result, dmarc_domain
+    )
+
+
+def rescore_emails(conn, only_unscored=False, batch_size=1000):
+    """Re-run analyze_auth_headers over stored header blocks.
+
+    Rows are read in id order and updated with executemany, one
+    transaction per batch. With only_unscored=True only rows that have
+    never been scored (spf_result IS NULL) are processed. Returns the
+    number of rows updated.
+    """
+    parser = HeaderParser()
+    condition = "AND spf_result IS NULL" if only_unscored else ""
+    last_id = 0
+    updated = 0
+    while True:
+        rows = conn.execute(f"""
+            SELECT id, headers FROM email_metadata
+            WHERE id > ? {condition}
+            ORDER BY id LIMIT ?
+        """, (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, headers in rows:
+            scores = analyze_auth_headers(parser.parsestr(headers or '', headersonly=True).items())
+            updates.append(scores + (row_id,))
+        with conn:
+            conn.executemany("""
+                UPDATE email_metadata SET
+                    spf_pass = ?, dkim_pass = ?, dmarc_pass = ?,
+                    spf_result = ?, spf_domain = ?, dkim_result = ?, dkim_domain = ?,
+                    dmarc_result = ?, dmarc_domain = ?
+                WHERE id = ?
+            """, updates)
+        updated += len(updates)
+        last_id = rows[-1][0]
+    if updated:
+        logger.info(f"Re-scored authentication results for {updated} emails")
+    return updated
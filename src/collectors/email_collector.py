@@ -2,10 +2,21 @@ import imaplib
 import email
 import sqlite3
 import os
+import re
+import queue
+import threading
 import logging
 from email.header import decode_header
-from datetime import datetime
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
 from contextlib import contextmanager
+from src.collectors.email_auth import analyze_auth_headers, rescore_emails
+from src.collectors.email_threads import (
+    backfill_thread_index, extract_thread_headers, index_thread_entries, parse_message_ids,
+    setup_thread_tables
+)
+from src.collectors.message_store import MessageStore
+from src.database.change_feed import paused_change_log
 
 # Database setup
 DB_NAME = "src/database/emails.db"
@@ -17,14 +28,585 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Messages requested per UID FETCH command
+FETCH_BATCH_SIZE = 200
+
+# Columns added to email_metadata after its first release, in order.
+# The imap_* columns locate the message on the server so a header-only
+# acquisition can fetch the full body later; body_fetched is 0 until then.
+# raw_sha256 references the full message in the MessageStore.
+EMAIL_ADDED_COLUMNS = (
+    ('fetch_timestamp', 'TEXT'),
+    ('date_sort', 'TEXT'),
+    ('imap_server', 'TEXT'),
+    ('imap_user', 'TEXT'),
+    ('imap_folder', 'TEXT'),
+    ('imap_uidvalidity', 'INTEGER'),
+    ('imap_uid', 'INTEGER'),
+    ('body_fetched', 'INTEGER DEFAULT 1'),
+    ('raw_sha256', 'TEXT'),
+    ('attachments_extracted', 'INTEGER DEFAULT 0'),
+    ('spf_result', 'TEXT'),
+    ('spf_domain', 'TEXT'),
+    ('dkim_result', 'TEXT'),
+    ('dkim_domain', 'TEXT'),
+    ('dmarc_result', 'TEXT'),
+    ('dmarc_domain', 'TEXT'),
+    ('in_reply_to', 'TEXT'),
+    ('thread_references', 'TEXT')
+)
+
+# FETCH items for full and header-only acquisition. BODY.PEEK leaves the
+# \Seen flag untouched, unlike RFC822, so collection does not alter the mailbox.
+FULL_FETCH_ITEMS = "(UID BODY.PEEK[])"
+HEADER_FETCH_ITEMS = "(UID BODY.PEEK[HEADER] BODYSTRUCTURE)"
+
+# Column order of rows built by build_email_row
+EMAIL_INSERT_COLUMNS = (
+    'sender', 'recipient', 'subject', 'date', 'message_id', 'headers',
+    'has_attachments', 'spf_pass', 'dkim_pass', 'dmarc_pass',
+    'spf_result', 'spf_domain', 'dkim_result', 'dkim_domain', 'dmarc_result', 'dmarc_domain',
+    'in_reply_to', 'thread_references',
+    'fetch_timestamp', 'date_sort', 'imap_server', 'imap_user', 'imap_folder',
+    'imap_uidvalidity', 'imap_uid', 'body_fetched', 'raw_sha256'
+)
+
+EMAIL_INSERT_QUERY = f"""
+INSERT INTO email_metadata ({', '.join(EMAIL_INSERT_COLUMNS)})
+VALUES ({', '.join('?' for _ in EMAIL_INSERT_COLUMNS)})
+"""
+
+EMAIL_INSERT_OR_IGNORE_QUERY = EMAIL_INSERT_QUERY.replace("INSERT INTO", "INSERT OR IGNORE INTO", 1)
+
+SYNC_STATE_UPSERT_QUERY = """
+INSERT INTO imap_sync_state (server, username, folder, uidvalidity, last_uid, last_sync)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (server, username, folder) DO UPDATE SET
+    uidvalidity = excluded.uidvalidity,
+    last_uid = excluded.last_uid,
+    last_sync = excluded.last_sync
+"""
+
+# A message already stored from this folder under an older UIDVALIDITY
+# (a resync) moves to its new UID so fetch_full_message can find it
+LOCATION_UPDATE_QUERY = """
+UPDATE email_metadata SET imap_uidvalidity = ?, imap_uid = ?
+WHERE message_id = ? AND imap_server IS ? AND imap_user IS ? AND imap_folder IS ?
+  AND imap_uidvalidity IS NOT ?
+"""
+
+# Messages that could not be fetched or parsed, retried by later syncs
+FAILED_UID_UPSERT_QUERY = """
+INSERT INTO imap_failed_uids (server, username, folder, uidvalidity, uid, error, attempts, failed_at)
+VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+ON CONFLICT (server, username, folder, uidvalidity, uid) DO UPDATE SET
+    error = excluded.error,
+    attempts = attempts + 1,
+    failed_at = excluded.failed_at
+"""
+FAILED_UID_DELETE_QUERY = """
+DELETE FROM imap_failed_uids
+WHERE server = ? AND username = ? AND folder = ? AND uidvalidity = ? AND uid = ?
+"""
+# Failed messages are retried this many times, then left recorded
+MAX_FETCH_ATTEMPTS = 5
+
+# Columns returned by list views; excludes the large headers column
+EMAIL_LIST_COLUMNS = (
+    'id', 'sender', 'recipient', 'subject', 'date', 'message_id',
+    'has_attachments', 'spf_pass', 'dkim_pass', 'dmarc_pass', 'fetch_timestamp',
+    'body_fetched', 'spf_result', 'dkim_result', 'dkim_domain', 'dmarc_result'
+)
+
+
+def email_sort_key(date_header):
+    """Convert an RFC 2822 Date header into a sortable UTC ISO string.
+
+    Unparseable or missing dates map to '' so they sort last (oldest).
+    """
+    if not date_header:
+        return ''
+    try:
+        parsed = parsedate_to_datetime(date_header)
+    except (TypeError, ValueError, IndexError):
+        return ''
+    if parsed is None:
+        return ''
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def migrate_email_database(conn):
+    """Create or migrate the emails.db schema on an open connection.
+
+    Schema changes are cheap and idempotent and run every time; backfills
+    over existing rows run once per database (see run_data_migrations).
+    """
+    cursor = conn.cursor()
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS email_metadata (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sender TEXT,
+        recipient TEXT,
+        subject TEXT,
+        date TEXT,
+        message_id TEXT UNIQUE,
+        headers TEXT,
+        has_attachments INTEGER,
+        spf_pass INTEGER,
+        dkim_pass INTEGER,
+        dmarc_pass INTEGER,
+        fetch_timestamp TEXT
+    )
+    """)
+
+    cursor.execute('PRAGMA table_info(email_metadata)')
+    columns = [col[1] for col in cursor.fetchall()]
+
+    for column, column_type in EMAIL_ADDED_COLUMNS:
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE email_metadata ADD COLUMN {column} {column_type}")
+            logger.info(f"Added {column} column")
+
+    setup_thread_tables(cursor)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_email_metadata_date_sort
+        ON email_metadata (date_sort, id)
+    """)
+    # Links email_attachments rows (keyed by message hash) back to emails
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_email_metadata_raw_sha256
+        ON email_metadata (raw_sha256)
+    """)
+    # Authentication lookups: by signing/sending domain and by verdict
+    for column in ('spf_domain', 'dkim_domain', 'dmarc_domain'):
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_email_metadata_{column}
+            ON email_metadata ({column})
+        """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_email_metadata_auth_results
+        ON email_metadata (dmarc_result, dkim_result, spf_result)
+    """)
+    # Small partial index over emails still waiting for attachment extraction
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_email_metadata_attachments_pending
+        ON email_metadata (id)
+        WHERE has_attachments = 1 AND attachments_extracted = 0
+    """)
+
+    # Row counter maintained by triggers so list views never run COUNT(*)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS table_counts (
+            table_name TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        INSERT OR IGNORE INTO table_counts (table_name, row_count)
+        SELECT 'email_metadata', COUNT(*) FROM email_metadata
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS email_metadata_count_insert
+        AFTER INSERT ON email_metadata
+        BEGIN
+            UPDATE table_counts SET row_count = row_count + 1
+            WHERE table_name = 'email_metadata';
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS email_metadata_count_delete
+        AFTER DELETE ON email_metadata
+        BEGIN
+            UPDATE table_counts SET row_count = row_count - 1
+            WHERE table_name = 'email_metadata';
+        END
+    """)
+
+    # Per-folder IMAP sync position: messages with uid <= last_uid have been
+    # collected, valid only while the server's UIDVALIDITY is unchanged
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS imap_sync_state (
+            server TEXT NOT NULL,
+            username TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            uidvalidity INTEGER,
+            last_uid INTEGER NOT NULL DEFAULT 0,
+            last_sync TEXT,
+            PRIMARY KEY (server, username, folder)
+        )
+    """)
+    # Messages at or below last_uid that still have to be collected
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS imap_failed_uids (
+            server TEXT NOT NULL,
+            username TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            uidvalidity INTEGER NOT NULL,
+            uid INTEGER NOT NULL,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 1,
+            failed_at TEXT,
+            PRIMARY KEY (server, username, folder, uidvalidity, uid)
+        )
+    """)
+
+    conn.commit()
+    run_data_migrations(conn)
+
+
+def header_block(msg):
+    """Serialize only the header section of a parsed message."""
+    return ''.join(f"{name}: {value}\n" for name, value in msg.items())
+
+
+def externalize_raw_messages(conn, batch_size=500):
+    """Move full messages stored in email_metadata.headers to the MessageStore.
+
+    Rows collected before the store existed hold the whole serialized
+    message in headers. Each is written to the store, referenced through
+    raw_sha256, and headers is cut down to the header section. Run VACUUM
+    afterwards to return the freed pages to the filesystem.
+    """
+    store = None
+    moved = 0
+    last_id = 0
+    try:
+        while True:
+            rows = conn.execute("""
+                SELECT id, headers FROM email_metadata
+                WHERE id > ? AND raw_sha256 IS NULL AND body_fetched = 1
+                  AND headers IS NOT NULL
+                ORDER BY id LIMIT ?
+            """, (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            if store is None:
+                store = MessageStore()
+            raw_messages = [headers.encode('utf-8', errors='surrogateescape') for _, headers in rows]
+            hashes = store.put_many(raw_messages)
+            updates = [
+                (header_block(email.message_from_bytes(raw)), sha256, row_id)
+                for (row_id, _), raw, sha256 in zip(rows, raw_messages, hashes)
+            ]
+            with conn:
+                conn.executemany(
+                    "UPDATE email_metadata SET headers = ?, raw_sha256 = ? WHERE id = ?",
+                    updates
+                )
+            moved += len(rows)
+            last_id = rows[-1][0]
+    finally:
+        if store:
+            store.close()
+    if moved:
+        logger.info(f"Moved {moved} raw messages from email_metadata to the message store")
+
+
+def backfill_date_sort(conn):
+    """Compute sort keys for rows stored before date_sort existed."""
+    rows = conn.execute("SELECT id, date FROM email_metadata WHERE date_sort IS NULL").fetchall()
+    if rows:
+        with conn:
+            conn.executemany("UPDATE email_metadata SET date_sort = ? WHERE id = ?",
+                             [(email_sort_key(date), row_id) for row_id, date in rows])
+        logger.info(f"Backfilled date_sort for {len(rows)} emails")
+
+
+def rescore_unscored_emails(conn):
+    """Score rows stored before per-mechanism results were recorded."""
+    rescore_emails(conn, only_unscored=True)
+
+
+# Backfills over existing rows, each applied once per database in order;
+# PRAGMA user_version holds the number of the last one applied
+EMAIL_DATA_MIGRATIONS = (
+    (1, backfill_date_sort),
+    (2, externalize_raw_messages),
+    (3, rescore_unscored_emails),
+    (4, backfill_thread_index),
+)
+
+
+def run_data_migrations(conn):
+    """Apply the EMAIL_DATA_MIGRATIONS this database has not had yet."""
+    applied = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, migration in EMAIL_DATA_MIGRATIONS:
+        if version <= applied:
+            continue
+        # Backfills touch every old row; feed readers just reload
+        with paused_change_log(conn, 'email'):
+            migration(conn)
+        # Recorded after the migration commits, so an interrupted one reruns
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+
+
+def get_email_count(conn):
+    """Return the maintained email_metadata row count."""
+    row = conn.execute(
+        "SELECT row_count FROM table_counts WHERE table_name = 'email_metadata'"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def parse_email_cursor(value):
+    """Split a 'date_sort|id' cursor into its keyset parts"""
+    date_sort, _, row_id = value.rpartition('|')
+    return date_sort, int(row_id)
+
+
+def get_email_page(conn, limit, cursor=None, columns=EMAIL_LIST_COLUMNS + ('date_sort',)):
+    """Return (rows, next_cursor) for one page of emails, newest first.
+
+    Pages are keyset-based on (date_sort, id), so deep pages cost the same
+    as the first. next_cursor is None on the last page; a malformed
+    cursor raises ValueError.
+    """
+    select = f"SELECT {', '.join(columns)} FROM email_metadata"
+    if cursor:
+        date_sort, last_id = parse_email_cursor(cursor)
+        rows = conn.execute(f"""
+            {select}
+            WHERE (date_sort, id) < (?, ?)
+            ORDER BY date_sort DESC, id DESC
+            LIMIT ?
+        """, (date_sort, last_id, limit)).fetchall()
+    else:
+        rows = conn.execute(f"""
+            {select}
+            ORDER BY date_sort DESC, id DESC
+            LIMIT ?
+        """, (limit,)).fetchall()
+    next_cursor = None
+    if len(rows) == limit:
+        last = dict(zip(columns, rows[-1]))
+        next_cursor = f"{last['date_sort'] or ''}|{last['id']}"
+    return rows, next_cursor
+
+
+def compress_uid_set(uids):
+    """Render sorted UIDs as a compact IMAP set, e.g. [1, 2, 3, 7] -> '1:3,7'."""
+    ranges = []
+    start = prev = uids[0]
+    for uid in uids[1:]:
+        if uid != prev + 1:
+            ranges.append(f"{start}:{prev}" if start != prev else str(start))
+            start = uid
+        prev = uid
+    ranges.append(f"{start}:{prev}" if start != prev else str(start))
+    return ','.join(ranges)
+
+
+def parse_fetch_response(data):
+    """Extract (uid, literal) pairs from an imaplib FETCH response."""
+    messages = []
+    for response_part in data:
+        if isinstance(response_part, tuple):
+            match = re.search(rb'UID (\d+)', response_part[0])
+            uid = int(match.group(1)) if match else None
+            messages.append((uid, response_part[1]))
+    return messages
+
+
+def parse_header_fetch_response(data):
+    """Extract (uid, header_bytes, has_attachments) from a header-only FETCH.
+
+    Servers may return BODYSTRUCTURE before or after the header literal,
+    so the text on both sides of the literal is searched.
+    """
+    messages = []
+    for index, response_part in enumerate(data):
+        if not isinstance(response_part, tuple):
+            continue
+        meta = response_part[0]
+        if index + 1 < len(data) and isinstance(data[index + 1], bytes):
+            meta += data[index + 1]
+        match = re.search(rb'UID (\d+)', meta)
+        uid = int(match.group(1)) if match else None
+        messages.append((uid, response_part[1], bodystructure_has_attachments(meta)))
+    return messages
+
+
+def bodystructure_has_attachments(bodystructure):
+    """True if any part in a BODYSTRUCTURE has an attachment disposition."""
+    return int(re.search(rb'\(\s*"attachment"', bodystructure, re.IGNORECASE) is not None)
+
+
+def prefetch(iterable, depth=2):
+    """Run an iterator on a background thread, buffering up to depth items.
+
+    Used to overlap IMAP network I/O with parsing and database writes.
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                buffer.put((item, None))
+        except Exception as e:
+            buffer.put((None, e))
+        finally:
+            buffer.put((done, None))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is done:
+                break
+            yield item
+    finally:
+        # Unblock the producer if the consumer stopped early
+        stop.set()
+        while producer.is_alive():
+            try:
+                buffer.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def imap_quote(mailbox):
+    """Quote a mailbox name for use as an IMAP command argument."""
+    return '"' + mailbox.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+THREAD_ENTRY_COLUMNS = tuple(EMAIL_INSERT_COLUMNS.index(column) for column in (
+    'message_id', 'in_reply_to', 'thread_references'
+))
+LOCATION_COLUMNS = tuple(EMAIL_INSERT_COLUMNS.index(column) for column in (
+    'imap_server', 'imap_user', 'imap_folder', 'imap_uidvalidity', 'imap_uid', 'raw_sha256'
+))
+
+
+def thread_entries(rows):
+    """Return index_thread_entries input for email_metadata rows."""
+    return [
+        tuple(row[i] for i in THREAD_ENTRY_COLUMNS) + (tuple(row[i] for i in LOCATION_COLUMNS),)
+        for row in rows
+    ]
+
+
+def refresh_locations(conn, rows):
+    """Move duplicates of rows re-collected under a new UIDVALIDITY to their new UID.
+
+    Runs inside the caller's transaction.
+    """
+    updates = []
+    for row in rows:
+        server, user, folder, uidvalidity, uid = (row[i] for i in LOCATION_COLUMNS[:5])
+        if uid is not None:
+            message_id = row[THREAD_ENTRY_COLUMNS[0]]
+            updates.append((uidvalidity, uid, message_id, server, user, folder, uidvalidity))
+    if updates:
+        conn.executemany(LOCATION_UPDATE_QUERY, updates)
+
+
+class EmailBatchWriter:
+    """Buffer email rows and write them with executemany.
+
+    Rows are flushed with INSERT OR IGNORE in one transaction per batch,
+    so a batch costs one commit and duplicates (same message_id) are
+    counted rather than raised. A sync-state update is written in the same
+    transaction as the rows (and failed-UID records) buffered before it.
+    """
+
+    def __init__(self, conn, batch_size=500):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.pending = []
+        self.failed = []
+        self.recovered = []
+        self.inserted = 0
+        self.duplicates = 0
+
+    def submit_email(self, values):
+        self.pending.append(values)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def submit_failed_uid(self, values):
+        """Record a message to retry (FAILED_UID_UPSERT_QUERY parameters)"""
+        self.failed.append(values)
+
+    def submit_recovered_uid(self, values):
+        """Forget a retried message (FAILED_UID_DELETE_QUERY parameters)"""
+        self.recovered.append(values)
+
+    def submit_sync_state(self, values):
+        self.flush(sync_state=values)
+
+    def flush(self, sync_state=None):
+        """Write buffered rows (and an optional sync state) in one transaction."""
+        if not (self.pending or self.failed or self.recovered) and sync_state is None:
+            return
+        rows, self.pending = self.pending, []
+        failed, self.failed = self.failed, []
+        recovered, self.recovered = self.recovered, []
+        with self.conn:
+            inserted = 0
+            if rows:
+                cursor = self.conn.executemany(EMAIL_INSERT_OR_IGNORE_QUERY, rows)
+                # rowcount excludes the table_counts trigger updates
+                inserted = cursor.rowcount
+                if inserted < len(rows):
+                    refresh_locations(self.conn, rows)
+                # Duplicates are still recorded as copies of the stored message
+                index_thread_entries(self.conn, thread_entries(rows))
+            if recovered:
+                self.conn.executemany(FAILED_UID_DELETE_QUERY, recovered)
+            if failed:
+                self.conn.executemany(FAILED_UID_UPSERT_QUERY, failed)
+            if sync_state is not None:
+                self.conn.execute(SYNC_STATE_UPSERT_QUERY, sync_state)
+        self.inserted += inserted
+        self.duplicates += len(rows) - inserted
+        if rows:
+            logger.info(f"✅ Stored {inserted} emails ({len(rows) - inserted} duplicates)")
+
+
+def parse_list_response(data):
+    """Return selectable mailbox names from an imaplib LIST response."""
+    folders = []
+    for line in data:
+        literal_name = None
+        if isinstance(line, tuple):
+            line, literal_name = line
+        if not line:
+            continue
+        match = re.match(rb'\((?P<flags>[^)]*)\) (?P<delim>NIL|"(?:[^"\\]|\\.)*") ?(?P<name>.*)', line)
+        if not match or b'\\noselect' in match.group('flags').lower():
+            continue
+        name = literal_name if literal_name is not None else match.group('name')
+        if name.startswith(b'"') and name.endswith(b'"'):
+            name = re.sub(rb'\\(.)', rb'\1', name[1:-1])
+        folders.append(name.decode('utf-8', errors='replace'))
+    return folders
+
+
 class EmailMetadataExtractor:
-    def __init__(self, imap_server, email_user, email_pass, folder="INBOX"):
+    def __init__(self, imap_server, email_user, email_pass, folder="INBOX", writer=None):
         self.imap_server = imap_server
         self.email_user = email_user
         self.email_pass = email_pass
         self.folder = folder
+        # Optional shared writer (see email_coordinator.EmailWriterThread);
+        # when set, rows are queued to it instead of written on self.conn
+        self.writer = writer
         self.mail = None
         self.conn = None
+        self.message_store = None
         self.setup_connections()
 
     def setup_connections(self):
@@ -33,60 +615,36 @@ class EmailMetadataExtractor:
             # Setup IMAP
             self.mail = imaplib.IMAP4_SSL(self.imap_server)
             self.mail.login(self.email_user, self.email_pass)
-            self.mail.select(self.folder)
+            self.select_folder(self.folder)
             logger.info("Successfully connected to IMAP server")
             
             # Setup Database
-            self.conn = sqlite3.connect(DB_NAME)
-            self.migrate_database()
+            self.conn = sqlite3.connect(DB_NAME, timeout=30)
+            if self.writer is None:
+                # The coordinator migrates once before starting sessions
+                self.migrate_database()
             logger.info("Successfully connected to database")
         except Exception as e:
             self.cleanup()
             raise Exception(f"Connection setup failed: {str(e)}")
 
+    def select_folder(self, folder):
+        """Open a folder read-only (EXAMINE) so flags are never modified."""
+        status, data = self.mail.select(imap_quote(folder), readonly=True)
+        if status != 'OK':
+            raise Exception(f"Failed to select folder {folder}: {data}")
+        self.folder = folder
+
+    def list_folders(self):
+        """Enumerate selectable folders on the server via LIST."""
+        status, data = self.mail.list()
+        if status != 'OK':
+            raise Exception("Failed to list folders")
+        return parse_list_response(data)
+
     def migrate_database(self):
         """Handle database creation and migrations."""
-        cursor = self.conn.cursor()
-        
-        # Check if table exists
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='email_metadata'
-        """)
-        
-        if not cursor.fetchone():
-            # Create new table
-            cursor.execute("""
-            CREATE TABLE email_metadata (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sender TEXT,
-                recipient TEXT,
-                subject TEXT,
-                date TEXT,
-                message_id TEXT UNIQUE,
-                headers TEXT,
-                has_attachments INTEGER,
-                spf_pass INTEGER,
-                dkim_pass INTEGER,
-                dmarc_pass INTEGER,
-                fetch_timestamp TEXT
-            )
-            """)
-            self.conn.commit()
-            logger.info("Created email_metadata table")
-            return
-
-        # Check for fetch_timestamp column
-        cursor.execute('PRAGMA table_info(email_metadata)')
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'fetch_timestamp' not in columns:
-            cursor.execute("""
-                ALTER TABLE email_metadata
-                ADD COLUMN fetch_timestamp TEXT
-            """)
-            self.conn.commit()
-            logger.info("Added fetch_timestamp column")
+        migrate_email_database(self.conn)
 
     def cleanup(self):
         """Clean up connections safely"""
@@ -107,8 +665,16 @@ class EmailMetadataExtractor:
             finally:
                 self.conn = None
 
-    def extract_email_metadata(self, msg):
-        """Extract email metadata including headers, attachments, and security indicators."""
+        if getattr(self, 'message_store', None):
+            self.message_store.close()
+            self.message_store = None
+
+    def extract_email_metadata(self, msg, has_attachments=None):
+        """Extract email metadata including headers, attachments, and security indicators.
+
+        For header-only messages pass has_attachments (from BODYSTRUCTURE),
+        since the parts are not available to walk.
+        """
         try:
             # Basic metadata
             sender = msg.get("From", "")
@@ -124,59 +690,69 @@ class EmailMetadataExtractor:
                 subject = ""
                 
             date = msg.get("Date", "")
-            message_id = msg.get("Message-ID", "").strip('<>')
-            headers = str(msg)
+            message_ids = parse_message_ids(msg.get("Message-ID"))
+            message_id = message_ids[0] if message_ids else msg.get("Message-ID", "").strip().strip('<>')
+            # Only the header section; the full message lives in the MessageStore
+            headers = header_block(msg)
 
             # Check for attachments
-            has_attachments = int(any(
-                part.get_content_disposition() == "attachment" 
-                for part in msg.walk()
-            ))
+            if has_attachments is None:
+                has_attachments = int(any(
+                    part.get_content_disposition() == "attachment" 
+                    for part in msg.walk()
+                ))
 
             # Security checks
-            spf_pass, dkim_pass, dmarc_pass = self.analyze_security(headers)
+            security = self.analyze_security(msg)
 
             return (
                 sender, recipient, subject, date, message_id, 
-                headers, has_attachments, spf_pass, dkim_pass, dmarc_pass
-            )
+                headers, has_attachments
+            ) + security + extract_thread_headers(msg)
         except Exception as e:
             logger.error(f"Metadata extraction failed: {str(e)}")
             raise
 
-    def analyze_security(self, headers):
-        """Enhanced security header analysis."""
-        headers_lower = headers.lower()
-        
-        # SPF Check
-        spf_pass = int(
-            any(indicator in headers_lower 
-                for indicator in ["spf=pass", "spf=softpass"])
+    def analyze_security(self, msg):
+        """Score SPF, DKIM and DMARC from the message's authentication headers.
+
+        Returns (spf_pass, dkim_pass, dmarc_pass) followed by the
+        per-mechanism results and domains in AUTH_COLUMNS order.
+        """
+        return analyze_auth_headers(msg.items())
+
+    def build_email_row(self, metadata, location=None, body_fetched=1, raw_sha256=None):
+        """Return the EMAIL_INSERT_QUERY parameters for extracted metadata.
+
+        location is an optional (uidvalidity, uid) pair recording where the
+        message lives in the current folder; raw_sha256 references the full
+        message in the MessageStore.
+        """
+        current_time = datetime.now().isoformat()
+        uidvalidity, uid = location or (None, None)
+        return metadata + (
+            current_time, email_sort_key(metadata[3]),
+            self.imap_server, self.email_user, self.folder, uidvalidity, uid,
+            body_fetched, raw_sha256
         )
-        
-        # DKIM Check
-        dkim_pass = int("dkim=pass" in headers_lower)
-        
-        # DMARC Check
-        dmarc_pass = int("dmarc=pass" in headers_lower)
-        
-        return spf_pass, dkim_pass, dmarc_pass
-
-    def store_email_metadata(self, metadata):
+
+    def store_email_metadata(self, metadata, location=None, body_fetched=1, raw_sha256=None):
         """Store extracted metadata in SQLite database."""
-        query = """
-        INSERT INTO email_metadata (
-            sender, recipient, subject, date, message_id, headers,
-            has_attachments, spf_pass, dkim_pass, dmarc_pass, fetch_timestamp
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
         try:
-            current_time = datetime.now().isoformat()
-            values = metadata + (current_time,)
+            values = self.build_email_row(metadata, location, body_fetched, raw_sha256)
+            if self.writer is not None:
+                self.writer.submit_email(values)
+                return True
             
             with self.conn:
-                self.conn.execute(query, values)
+                cursor = self.conn.execute(EMAIL_INSERT_OR_IGNORE_QUERY, values)
+                if not cursor.rowcount:
+                    refresh_locations(self.conn, [values])
+                # Duplicates are still recorded as copies of the stored message
+                index_thread_entries(self.conn, thread_entries([values]))
+            if not cursor.rowcount:
+                logger.warning(f"⚠️ Email {metadata[4]} already exists in database")
+                return False
             logger.info(f"✅ Stored email: {metadata[2][:50]}... from {metadata[0]}")
             return True
         except sqlite3.IntegrityError:
@@ -186,6 +762,246 @@ class EmailMetadataExtractor:
             logger.error(f"Failed to store email: {str(e)}")
             return False
 
+    def get_sync_state(self):
+        """Return (uidvalidity, last_uid) stored for this account and folder."""
+        row = self.conn.execute("""
+            SELECT uidvalidity, last_uid FROM imap_sync_state
+            WHERE server = ? AND username = ? AND folder = ?
+        """, (self.imap_server, self.email_user, self.folder)).fetchone()
+        return (row[0], row[1]) if row else (None, 0)
+
+    def sync_state_row(self, uidvalidity, last_uid):
+        """Return the SYNC_STATE_UPSERT_QUERY parameters for this folder."""
+        return (self.imap_server, self.email_user, self.folder,
+                uidvalidity, last_uid, datetime.now().isoformat())
+
+    def save_sync_state(self, uidvalidity, last_uid):
+        """Record the UID high-water mark for this account and folder."""
+        values = self.sync_state_row(uidvalidity, last_uid)
+        if self.writer is not None:
+            # Queued behind this batch's rows, so it is never saved before them
+            self.writer.submit_sync_state(values)
+            return
+        with self.conn:
+            self.conn.execute(SYNC_STATE_UPSERT_QUERY, values)
+
+    def get_failed_uids(self, uidvalidity):
+        """UIDs of this folder whose earlier fetch or parse failed, ascending."""
+        rows = self.conn.execute("""
+            SELECT uid FROM imap_failed_uids
+            WHERE server = ? AND username = ? AND folder = ? AND uidvalidity = ? AND attempts < ?
+            ORDER BY uid
+        """, (self.imap_server, self.email_user, self.folder, uidvalidity,
+              MAX_FETCH_ATTEMPTS)).fetchall()
+        return [row[0] for row in rows]
+
+    def failed_uid_row(self, uidvalidity, uid, error):
+        """Return the FAILED_UID_UPSERT_QUERY parameters for a message of this folder."""
+        return (self.imap_server, self.email_user, self.folder, uidvalidity, uid,
+                error, datetime.now().isoformat())
+
+    def get_uidvalidity(self):
+        """Ask the server for the selected folder's current UIDVALIDITY."""
+        status, data = self.mail.status(imap_quote(self.folder), "(UIDVALIDITY)")
+        if status != 'OK':
+            raise Exception(f"Failed to get UIDVALIDITY for {self.folder}")
+        match = re.search(rb'UIDVALIDITY (\d+)', data[0])
+        if not match:
+            raise Exception(f"Server returned no UIDVALIDITY for {self.folder}")
+        return int(match.group(1))
+
+    def search_new_uids(self, last_uid):
+        """Return UIDs above last_uid in ascending order."""
+        status, data = self.mail.uid('SEARCH', None, f'UID {last_uid + 1}:*')
+        if status != 'OK':
+            raise Exception("Failed to search emails")
+        # "n:*" always matches the highest UID, even when it is below n
+        uids = sorted(int(uid) for uid in data[0].split())
+        return [uid for uid in uids if uid > last_uid]
+
+    def fetch_uid_batches(self, uids, batch_size=FETCH_BATCH_SIZE, headers_only=False):
+        """Yield (batch_uids, messages) per UID FETCH command.
+
+        Each batch is requested as one compact UID set, so a batch costs a
+        single round trip regardless of how many messages it holds.
+        messages holds (uid, raw_message) pairs, or (uid, raw_headers,
+        has_attachments) triples when headers_only is set; it is None when
+        the FETCH failed.
+        """
+        items = HEADER_FETCH_ITEMS if headers_only else FULL_FETCH_ITEMS
+        parse = parse_header_fetch_response if headers_only else parse_fetch_response
+        for start in range(0, len(uids), batch_size):
+            batch = uids[start:start + batch_size]
+            status, data = self.mail.uid('FETCH', compress_uid_set(batch), items)
+            if status != 'OK':
+                logger.warning(f"Failed to fetch UIDs {batch[0]}-{batch[-1]}")
+                yield batch, None
+                continue
+            yield batch, parse(data)
+
+    def parse_message(self, raw_message, location=None, has_attachments=None, body_fetched=1,
+                      raw_sha256=None):
+        """Parse a raw message (or header block) into an email_metadata row."""
+        msg = email.message_from_bytes(raw_message)
+        metadata = self.extract_email_metadata(msg, has_attachments=has_attachments)
+        return self.build_email_row(metadata, location, body_fetched, raw_sha256)
+
+    def process_raw_message(self, raw_message, location=None):
+        """Parse and store one raw RFC822 message; True if newly stored."""
+        msg = email.message_from_bytes(raw_message)
+        metadata = self.extract_email_metadata(msg)
+        raw_sha256 = self.get_message_store().put(raw_message)
+        return self.store_email_metadata(metadata, location, raw_sha256=raw_sha256)
+
+    def get_message_store(self):
+        """Open this extractor's MessageStore connection on first use."""
+        if self.message_store is None:
+            self.message_store = MessageStore()
+        return self.message_store
+
+    def sync_emails(self, batch_size=FETCH_BATCH_SIZE, max_messages=None, headers_only=False,
+                    close=True):
+        """Incrementally collect messages not seen by a previous sync.
+
+        Only UIDs above the stored high-water mark are fetched, plus those
+        recorded in imap_failed_uids by an earlier sync whose fetch or
+        parse failed (so the high-water mark can pass them without losing
+        them). If the folder's UIDVALIDITY changed, the stored position is
+        discarded and the folder is re-synced (message_id uniqueness drops
+        duplicates, which are moved to their new UID). Batches are fetched on a background thread while the previous
+        batch is parsed, each batch is written in one transaction together
+        with the new position, so an interrupted sync resumes where it
+        stopped. Returns the number of new emails stored (or, with a
+        shared writer, the number queued to it).
+
+        With headers_only=True only the header block and BODYSTRUCTURE are
+        transferred (without setting \\Seen); use fetch_full_message to
+        retrieve a body later. Pass close=False to keep the IMAP session
+        open for syncing further folders.
+        """
+        try:
+            if not self.mail:
+                self.setup_connections()
+
+            uidvalidity = self.get_uidvalidity()
+            stored_validity, last_uid = self.get_sync_state()
+            if stored_validity != uidvalidity:
+                if stored_validity is not None:
+                    logger.warning(
+                        f"UIDVALIDITY changed for {self.folder} "
+                        f"({stored_validity} -> {uidvalidity}), resyncing folder"
+                    )
+                last_uid = 0
+
+            retry_uids = self.get_failed_uids(uidvalidity)
+            uids = self.search_new_uids(last_uid)
+            if max_messages is not None:
+                uids = uids[:max_messages]
+            logger.info(f"{len(uids)} new messages in {self.folder} above UID {last_uid}"
+                        + (f", retrying {len(retry_uids)}" if retry_uids else ""))
+
+            # Rows go to the shared writer thread if there is one, otherwise
+            # to a local batch writer that commits once per fetched batch
+            writer = self.writer or EmailBatchWriter(self.conn, batch_size)
+            parsed_count = 0
+            retrying = set(retry_uids)
+            position = last_uid
+            # Retried UIDs are all below last_uid, so the list stays ascending
+            batches = self.fetch_uid_batches(retry_uids + uids, batch_size, headers_only)
+            for batch, messages in prefetch(batches):
+                if messages is None:
+                    for uid in batch:
+                        writer.submit_failed_uid(self.failed_uid_row(uidvalidity, uid, "FETCH failed"))
+                    messages = []
+                else:
+                    # Retried messages the server no longer has are not retried again
+                    returned = {message[0] for message in messages}
+                    for uid in retrying.intersection(batch).difference(returned):
+                        writer.submit_recovered_uid(
+                            (self.imap_server, self.email_user, self.folder, uidvalidity, uid))
+                if not headers_only and messages:
+                    # One store transaction per batch; hashes line up with messages
+                    hashes = self.get_message_store().put_many([m[1] for m in messages])
+                for index, message in enumerate(messages):
+                    uid = message[0]
+                    try:
+                        if headers_only:
+                            row = self.parse_message(message[1], (uidvalidity, uid),
+                                                     has_attachments=message[2], body_fetched=0)
+                        else:
+                            row = self.parse_message(message[1], (uidvalidity, uid),
+                                                     raw_sha256=hashes[index])
+                        writer.submit_email(row)
+                        parsed_count += 1
+                    except Exception as e:
+                        logger.error(f"Error processing email UID {uid}: {str(e)}")
+                        writer.submit_failed_uid(self.failed_uid_row(uidvalidity, uid, str(e)))
+                        continue
+                    if uid in retrying:
+                        writer.submit_recovered_uid(
+                            (self.imap_server, self.email_user, self.folder, uidvalidity, uid))
+                position = max(position, batch[-1])
+                writer.submit_sync_state(self.sync_state_row(uidvalidity, position))
+
+            if not uids:
+                writer.submit_sync_state(self.sync_state_row(uidvalidity, last_uid))
+
+            if writer is self.writer:
+                # Inserts happen asynchronously; the writer reports the totals
+                return parsed_count
+            return writer.inserted
+
+        except Exception as e:
+            logger.error(f"Email sync failed: {str(e)}")
+            raise
+        finally:
+            if close:
+                self.cleanup()
+
+    def fetch_full_message(self, email_id):
+        """Fetch the full RFC822 message for a stored email from the server.
+
+        The message must have been collected from this extractor's account
+        and folder, and the folder's UIDVALIDITY must not have changed.
+        The message is added to the MessageStore, and the row is marked
+        body_fetched with has_attachments refreshed.
+        """
+        if not self.mail:
+            self.setup_connections()
+
+        row = self.conn.execute("""
+            SELECT imap_server, imap_user, imap_folder, imap_uidvalidity, imap_uid
+            FROM email_metadata WHERE id = ?
+        """, (email_id,)).fetchone()
+        if not row:
+            raise Exception(f"Email {email_id} not found")
+        server, user, folder, uidvalidity, uid = row
+        if uid is None:
+            raise Exception(f"Email {email_id} has no recorded IMAP location")
+        if (server, user, folder) != (self.imap_server, self.email_user, self.folder):
+            raise Exception(f"Email {email_id} belongs to {user}@{server}/{folder}")
+        if uidvalidity != self.get_uidvalidity():
+            raise Exception(f"UIDVALIDITY of {folder} changed; UID {uid} is no longer valid")
+
+        status, data = self.mail.uid('FETCH', str(uid), FULL_FETCH_ITEMS)
+        messages = parse_fetch_response(data) if status == 'OK' else []
+        if not messages:
+            raise Exception(f"Message UID {uid} no longer exists in {folder}")
+        raw_message = messages[0][1]
+
+        msg = email.message_from_bytes(raw_message)
+        has_attachments = int(any(
+            part.get_content_disposition() == "attachment"
+            for part in msg.walk()
+        ))
+        raw_sha256 = self.get_message_store().put(raw_message)
+        with self.conn:
+            self.conn.execute("""
+                UPDATE email_metadata SET body_fetched = 1, has_attachments = ?, raw_sha256 = ?
+                WHERE id = ?
+            """, (has_attachments, raw_sha256, email_id))
+        return raw_message
+
     def fetch_emails(self, limit=10):
         """Fetch and process emails."""
         try:
@@ -199,25 +1015,31 @@ class EmailMetadataExtractor:
 
             email_ids = email_ids[0].split()[-limit:]
             new_emails_count = 0
+            if not email_ids:
+                return new_emails_count
 
-            for e_id in email_ids:
-                try:
-                    status, msg_data = self.mail.fetch(e_id, "(RFC822)")
-                    if status != 'OK':
-                        logger.warning(f"Failed to fetch email ID {e_id}")
-                        continue
+            # One FETCH for the whole sequence set instead of one per message
+            status, msg_data = self.mail.fetch(b','.join(email_ids).decode(), "(BODY.PEEK[])")
+            if status != 'OK':
+                raise Exception("Failed to fetch emails")
 
-                    for response_part in msg_data:
-                        if isinstance(response_part, tuple):
-                            msg = email.message_from_bytes(response_part[1])
-                            metadata = self.extract_email_metadata(msg)
-                            if self.store_email_metadata(metadata):
-                                new_emails_count += 1
-                except Exception as e:
-                    logger.error(f"Error processing email {e_id}: {str(e)}")
-                    continue
+            writer = self.writer or EmailBatchWriter(self.conn)
+            raw_messages = [part[1] for part in msg_data if isinstance(part, tuple)]
+            hashes = dict(zip(raw_messages, self.get_message_store().put_many(raw_messages)))
+            for response_part in msg_data:
+                if isinstance(response_part, tuple):
+                    try:
+                        writer.submit_email(self.parse_message(
+                            response_part[1], raw_sha256=hashes[response_part[1]]))
+                        new_emails_count += 1
+                    except Exception as e:
+                        logger.error(f"Error processing email {response_part[0][:20]}: {str(e)}")
+                        continue
 
-            return new_emails_count
+            if writer is self.writer:
+                return new_emails_count
+            writer.flush()
+            return writer.inserted
 
         except Exception as e:
             logger.error(f"Email fetch failed: {str(e)}")
@@ -239,7 +1061,7 @@ if __name__ == "__main__":
 
     try:
         extractor = EmailMetadataExtractor(IMAP_SERVER, EMAIL_USER, EMAIL_PASS)
-        num_fetched = extractor.fetch_emails(limit=10)
+        num_fetched = extractor.sync_emails()
         print(f"Successfully fetched {num_fetched} new emails")
     except Exception as e:
         print(f"Error: {str(e)}")
\ No newline at end of file
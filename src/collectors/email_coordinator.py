@@ -0,0 +1,215 @@
+import json
+import logging
+import queue
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.collectors.attachment_extractor import AttachmentExtractor
+from src.collectors.email_collector import (
+    DB_NAME, FETCH_BATCH_SIZE, EmailBatchWriter, EmailMetadataExtractor,
+    migrate_email_database
+)
+
+logger = logging.getLogger(__name__)
+
+
+class EmailWriterThread(threading.Thread):
+    """Single writer for emails.db shared by concurrent IMAP sessions.
+
+    Sessions queue rows and sync-state updates; the thread drains whatever
+    is waiting (up to flush_size operations) and writes it through an
+    EmailBatchWriter, one transaction per drain and per sync-state
+    update. Operations from one session are applied in submission
+    order, so a folder's sync state is never saved ahead of its messages.
+    """
+
+    def __init__(self, db_path=DB_NAME, flush_size=500):
+        super().__init__(name="email-writer", daemon=True)
+        self.db_path = db_path
+        self.flush_size = flush_size
+        self.queue = queue.Queue(maxsize=flush_size * 4)
+        self.batch_writer = None
+        self.error = None
+
+    @property
+    def inserted(self):
+        return self.batch_writer.inserted if self.batch_writer else 0
+
+    @property
+    def duplicates(self):
+        return self.batch_writer.duplicates if self.batch_writer else 0
+
+    def submit_email(self, values):
+        self.queue.put(('email', values))
+
+    def submit_failed_uid(self, values):
+        self.queue.put(('failed_uid', values))
+
+    def submit_recovered_uid(self, values):
+        self.queue.put(('recovered_uid', values))
+
+    def submit_sync_state(self, values):
+        self.queue.put(('sync_state', values))
+
+    def close(self):
+        """Flush everything queued so far and stop the thread.
+
+        Returns the write error, or None if everything was stored.
+        """
+        self.queue.put(None)
+        self.join()
+        return self.error
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        # flush_size bounds the drain below, so the batch writer only
+        # flushes on sync-state updates and at the end of each drain
+        self.batch_writer = EmailBatchWriter(conn, batch_size=self.flush_size + 1)
+        try:
+            stopping = False
+            while not stopping:
+                ops = [self.queue.get()]
+                while len(ops) < self.flush_size:
+                    try:
+                        ops.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if None in ops:
+                    stopping = True
+                    ops = [op for op in ops if op is not None]
+                # After a failure keep draining so sessions never block,
+                # but write nothing (including sync state) past the error
+                if ops and not self.error:
+                    try:
+                        self.apply(ops)
+                    except Exception as e:
+                        logger.error(f"Email writer failed: {str(e)}")
+                        self.error = str(e)
+        finally:
+            conn.close()
+
+    def apply(self, ops):
+        for kind, values in ops:
+            if kind == 'email':
+                self.batch_writer.submit_email(values)
+            elif kind == 'failed_uid':
+                self.batch_writer.submit_failed_uid(values)
+            elif kind == 'recovered_uid':
+                self.batch_writer.submit_recovered_uid(values)
+            else:
+                self.batch_writer.submit_sync_state(values)
+        self.batch_writer.flush()
+
+
+class EmailCollectionCoordinator:
+    """Collect every folder of many IMAP accounts concurrently.
+
+    Each account gets one IMAP session that is reused for all of its
+    folders; at most max_sessions accounts are collected at once. All
+    sessions write through a single EmailWriterThread.
+    """
+
+    def __init__(self, accounts, max_sessions=4, folders=None, headers_only=False,
+                 batch_size=FETCH_BATCH_SIZE, extract_attachments=False):
+        # accounts: [{'server': ..., 'user': ..., 'password': ...}, ...]
+        self.accounts = accounts
+        self.max_sessions = max_sessions
+        # None means every selectable folder reported by LIST
+        self.folders = folders
+        self.headers_only = headers_only
+        self.batch_size = batch_size
+        # Feed attachments of newly stored messages into the evidence store
+        self.extract_attachments = extract_attachments
+
+    def collect(self):
+        """Run the sweep and return per-account, per-folder results."""
+        conn = sqlite3.connect(DB_NAME, timeout=30)
+        try:
+            migrate_email_database(conn)
+        finally:
+            conn.close()
+
+        writer = EmailWriterThread()
+        writer.start()
+        results = []
+        writer_error = None
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_sessions) as pool:
+                futures = [pool.submit(self.collect_account, account, writer)
+                           for account in self.accounts]
+                for future in as_completed(futures):
+                    results.append(future.result())
+        finally:
+            # Never raises, so an error from a session is not masked
+            writer_error = writer.close()
+
+        logger.info(f"Email sweep finished: {writer.inserted} new, {writer.duplicates} duplicates")
+        summary = {
+            'accounts': results,
+            'inserted': writer.inserted,
+            'duplicates': writer.duplicates,
+            # Nothing was written after this error, sync state included
+            'writer_error': writer_error
+        }
+        if self.extract_attachments:
+            attachment_extractor = AttachmentExtractor()
+            try:
+                summary['attachment_emails'], summary['attachments'] = \
+                    attachment_extractor.extract_pending()
+            finally:
+                attachment_extractor.close()
+        return summary
+
+    def collect_account(self, account, writer):
+        """Sync all requested folders of one account over one session."""
+        result = {
+            'server': account['server'],
+            'user': account['user'],
+            'folders': {},
+            'errors': {}
+        }
+        extractor = None
+        try:
+            extractor = EmailMetadataExtractor(
+                account['server'], account['user'], account['password'], writer=writer
+            )
+            folders = self.folders or extractor.list_folders()
+            for folder in folders:
+                try:
+                    if not extractor.mail:
+                        # The previous folder failed and dropped the session
+                        extractor.setup_connections()
+                    extractor.select_folder(folder)
+                    result['folders'][folder] = extractor.sync_emails(
+                        batch_size=self.batch_size,
+                        headers_only=self.headers_only,
+                        close=False
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to sync {account['user']}/{folder}: {str(e)}")
+                    result['errors'][folder] = str(e)
+                    extractor.cleanup()
+        except Exception as e:
+            logger.error(f"Failed to collect {account['user']}@{account['server']}: {str(e)}")
+            result['errors']['*'] = str(e)
+        finally:
+            if extractor:
+                extractor.cleanup()
+        return result
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.collectors.email_coordinator accounts.json [max_sessions]
+    if len(sys.argv) < 2:
+        print("Usage: python -m src.collectors.email_coordinator accounts.json [max_sessions]")
+        exit(1)
+
+    with open(sys.argv[1]) as f:
+        accounts = json.load(f)
+    max_sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    coordinator = EmailCollectionCoordinator(accounts, max_sessions=max_sessions)
+    summary = coordinator.collect()
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,200 @@
+import logging
+import re
+from datetime import datetime
+from email.parser import HeaderParser
+
+MESSAGE_ID_PATTERN = re.compile(r'<([^<>\s]+)>')
+
+# Every conversation member reachable from a Message-ID through
+# email_references, walked in both directions. UNION (not UNION ALL)
+# drops revisited ids, so reference cycles terminate.
+THREAD_QUERY = """
+WITH RECURSIVE thread(message_id) AS (
+    SELECT ?
+    UNION
+    SELECT r.referenced_id FROM email_references r
+    JOIN thread t ON r.message_id = t.message_id
+    UNION
+    SELECT r.message_id FROM email_references r
+    JOIN thread t ON r.referenced_id = t.message_id
+)
+SELECT {columns},
+       (SELECT COUNT(*) FROM email_copies c WHERE c.message_id = e.message_id) AS copies
+FROM thread
+JOIN email_metadata e ON e.message_id = thread.message_id
+ORDER BY e.date_sort, e.id
+"""
+
+COPY_INSERT_QUERY = """
+INSERT OR IGNORE INTO email_copies (
+    message_id, imap_server, imap_user, imap_folder, imap_uidvalidity, imap_uid,
+    raw_sha256, seen_timestamp
+)
+VALUES (?, IFNULL(?, ''), IFNULL(?, ''), IFNULL(?, ''), IFNULL(?, 0), IFNULL(?, 0), ?, ?)
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def parse_message_ids(value):
+    """Return the Message-IDs in a header value, without angle brackets."""
+    return MESSAGE_ID_PATTERN.findall(str(value or ''))
+
+
+def extract_thread_headers(msg):
+    """Return (in_reply_to, references) for storage on email_metadata.
+
+    references is the space-separated References list, oldest first.
+    """
+    in_reply_to = parse_message_ids(msg.get('In-Reply-To'))
+    references = parse_message_ids(msg.get('References'))
+    return (in_reply_to[0] if in_reply_to else None), ' '.join(references)
+
+
+def reference_edges(message_id, in_reply_to, references):
+    """Return email_references rows for one message.
+
+    The direct parent is In-Reply-To, or the last References entry when
+    In-Reply-To is missing.
+    """
+    if not message_id:
+        return []
+    referenced = (references or '').split()
+    parent = in_reply_to or (referenced[-1] if referenced else None)
+    if parent and parent not in referenced:
+        referenced.append(parent)
+    return [
+        (message_id, referenced_id, position, int(referenced_id == parent))
+        for position, referenced_id in enumerate(referenced)
+        if referenced_id != message_id
+    ]
+
+
+def setup_thread_tables(cursor):
+    """Create the reference adjacency and duplicate-copy tables."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS email_references (
+            message_id TEXT NOT NULL,
+            referenced_id TEXT NOT NULL,
+            position INTEGER,
+            is_parent INTEGER,
+            PRIMARY KEY (message_id, referenced_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_email_references_referenced
+        ON email_references (referenced_id, message_id)
+    """)
+    # One row per place a message was seen; email_metadata keeps one row
+    # per Message-ID, so copies in other folders or accounts land here
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS email_copies (
+            message_id TEXT NOT NULL,
+            imap_server TEXT NOT NULL,
+            imap_user TEXT NOT NULL,
+            imap_folder TEXT NOT NULL,
+            imap_uidvalidity INTEGER NOT NULL,
+            imap_uid INTEGER NOT NULL,
+            raw_sha256 TEXT,
+            seen_timestamp TEXT,
+            PRIMARY KEY (message_id, imap_server, imap_user, imap_folder,
+                         imap_uidvalidity, imap_uid)
+        ) WITHOUT ROWID
+    """)
+
+
+def index_thread_entries(conn, entries):
+    """Record reference edges and copy locations for stored messages.
+
+    entries are (message_id, in_reply_to, references, location) where
+    location is (server, user, folder, uidvalidity, uid, raw_sha256). Runs
+    inside the caller's transaction.
+    """
+    edges = []
+    copies = []
+    now = datetime.now().isoformat()
+    for message_id, in_reply_to, references, location in entries:
+        if not message_id:
+            continue
+        edges.extend(reference_edges(message_id, in_reply_to, references))
+        copies.append((message_id,) + tuple(location) + (now,))
+    if edges:
+        conn.executemany("""
+            INSERT OR IGNORE INTO email_references (message_id, referenced_id, position, is_parent)
+            VALUES (?, ?, ?, ?)
+        """, edges)
+    if copies:
+        conn.executemany(COPY_INSERT_QUERY, copies)
+
+
+def backfill_thread_index(conn, batch_size=1000):
+    """Extract threading headers for rows stored before they were recorded.
+
+    Rows with thread_references IS NULL are parsed from their stored
+    header block and indexed, one transaction per batch.
+    """
+    parser = HeaderParser()
+    backfilled = 0
+    while True:
+        rows = conn.execute("""
+            SELECT id, message_id, headers, imap_server, imap_user, imap_folder,
+                   imap_uidvalidity, imap_uid, raw_sha256
+            FROM email_metadata WHERE thread_references IS NULL
+            ORDER BY id LIMIT ?
+        """, (batch_size,)).fetchall()
+        if not rows:
+            break
+        updates = []
+        entries = []
+        for row in rows:
+            msg = parser.parsestr(row[2] or '', headersonly=True)
+            in_reply_to, references = extract_thread_headers(msg)
+            updates.append((in_reply_to, references, row[0]))
+            entries.append((row[1], in_reply_to, references, row[3:]))
+        with conn:
+            conn.executemany("""
+                UPDATE email_metadata SET in_reply_to = ?, thread_references = ?
+                WHERE id = ?
+            """, updates)
+            index_thread_entries(conn, entries)
+        backfilled += len(rows)
+    if backfilled:
+        logger.info(f"Indexed threading headers for {backfilled} emails")
+    return backfilled
+
+
+def get_thread(conn, message_id, columns):
+    """Return every stored message in message_id's conversation, oldest first.
+
+    Each row holds the requested email_metadata columns followed by the
+    number of copies seen across folders and accounts.
+    """
+    query = THREAD_QUERY.format(columns=', '.join(f'e.{column}' for column in columns))
+    return conn.execute(query, (message_id,)).fetchall()
+
+
+def get_copies(conn, message_id):
+    """Return every recorded location of a message."""
+    return conn.execute("""
+        SELECT imap_server, imap_user, imap_folder, imap_uidvalidity, imap_uid,
+               raw_sha256, seen_timestamp
+        FROM email_copies WHERE message_id = ?
+        ORDER BY seen_timestamp
+    """, (message_id,)).fetchall()
+
+
+def delete_emails(conn, email_ids):
+    """Delete emails with their copies and outgoing reference edges.
+
+    email_metadata holds one row per Message-ID, so everything recorded
+    under a deleted row's Message-ID goes with it, in one transaction.
+    Edges other messages hold to it stay: they describe those messages.
+    Returns the number of emails deleted.
+    """
+    placeholders = ','.join('?' for _ in email_ids)
+    message_ids = f"SELECT message_id FROM email_metadata WHERE id IN ({placeholders})"
+    with conn:
+        conn.execute(f"DELETE FROM email_copies WHERE message_id IN ({message_ids})", email_ids)
+        conn.execute(f"DELETE FROM email_references WHERE message_id IN ({message_ids})", email_ids)
+        cursor = conn.execute(f"DELETE FROM email_metadata WHERE id IN ({placeholders})", email_ids)
+    return cursor.rowcount
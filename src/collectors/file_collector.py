@@ -2,6 +2,9 @@ import os
 import hashlib
 import sqlite3
 from datetime import datetime
+from src.collectors.hash_sets import (
+    KNOWN_BAD, KNOWN_GOOD, KnownFileFilter, file_digests, setup_known_file_columns
+)
 
 class LocalFileExtractor:
     def __init__(self, base_path):
@@ -9,6 +12,9 @@ class LocalFileExtractor:
         self.db_name = "src/database/evidence.db"
         self.conn = sqlite3.connect(self.db_name)
         self.setup_database()
+        # Known-good/known-bad hash sets checked as each file is hashed
+        self.known_files = KnownFileFilter(self.db_name)
+        self.counts = {'files': 0, KNOWN_GOOD: 0, KNOWN_BAD: 0}
 
     def setup_database(self):
         """Create table for storing local file metadata."""
@@ -24,6 +30,7 @@ class LocalFileExtractor:
         """
         cursor = self.conn.cursor()
         cursor.execute(query)
+        setup_known_file_columns(self.conn)
         self.conn.commit()
 
     def get_file_hash(self, file_path):
@@ -35,7 +42,7 @@ class LocalFileExtractor:
         return hasher.hexdigest()
 
     def collect_files(self, specific_file=None):
-        """Collect metadata for files"""
+        """Collect metadata for files; returns file and known-file counts"""
         try:
             cursor = self.conn.cursor()
             
@@ -51,6 +58,7 @@ class LocalFileExtractor:
                         self._process_file(file_path, cursor)
             
             self.conn.commit()
+            return dict(self.counts)
             
         except Exception as e:
             self.conn.rollback()
@@ -60,25 +68,40 @@ class LocalFileExtractor:
         """Process a single file and store its metadata."""
         file_name = os.path.basename(file_path)
         file_size = os.path.getsize(file_path)
-        file_hash = self.get_file_hash(file_path)
+        # One read computes SHA-256 plus any digest a loaded hash set needs
+        digests = file_digests(file_path, self.known_files.algorithms)
+        known_status, hash_set = self.known_files.lookup(digests)
         last_modified = datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
 
-        self.store_metadata(file_name, file_path, file_size, file_hash, last_modified, cursor)
+        self.counts['files'] += 1
+        if known_status:
+            self.counts[known_status] += 1
+        self.store_metadata(file_name, file_path, file_size, digests['sha256'], last_modified, cursor,
+                            known_status, hash_set)
 
-    def store_metadata(self, file_name, file_path, file_size, file_hash, last_modified, cursor):
+    def store_metadata(self, file_name, file_path, file_size, file_hash, last_modified, cursor,
+                       known_status=None, hash_set=None):
         """Store file metadata in SQLite database."""
         query = """
-        INSERT INTO file_metadata (file_name, file_path, file_size, hash_sha256, last_modified)
-        VALUES (?, ?, ?, ?, ?)
+        INSERT INTO file_metadata (file_name, file_path, file_size, hash_sha256, last_modified,
+                                   known_status, hash_set)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
         """
         try:
-            cursor.execute(query, (file_name, file_path, file_size, file_hash, last_modified))
-            print(f"✅ Stored: {file_name} ({file_size} bytes)")
+            cursor.execute(query, (file_name, file_path, file_size, file_hash, last_modified,
+                                   known_status, hash_set))
+            if known_status == KNOWN_BAD:
+                print(f"🚩 Stored: {file_name} ({file_size} bytes) - known bad ({hash_set})")
+            elif known_status == KNOWN_GOOD:
+                print(f"✅ Stored: {file_name} ({file_size} bytes) - known good ({hash_set}), analysis skipped")
+            else:
+                print(f"✅ Stored: {file_name} ({file_size} bytes)")
         except sqlite3.IntegrityError:
             print(f"⚠️ File {file_name} already exists in the database.")
 
     def close(self):
         """Close database connection."""
+        self.known_files.close()
         self.conn.close()
 
 # Example usage
@@ -0,0 +1,358 @@
+import argparse
+import bisect
+import hashlib
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+from array import array
+from datetime import datetime
+
+EVIDENCE_DB = "src/database/evidence.db"
+HASH_SET_DIR = "src/database/hash_sets"
+
+KNOWN_GOOD = 'known_good'
+KNOWN_BAD = 'known_bad'
+HASH_SET_STATUSES = (KNOWN_GOOD, KNOWN_BAD)
+
+# Hex digest length of each supported list algorithm
+HASH_ALGORITHMS = {'md5': 32, 'sha1': 40, 'sha256': 64}
+
+INDEX_MAGIC = b'KHSX'
+FORMAT_VERSION = 1
+# magic, version, byte order ('<' or '>'), algorithm, entry count
+INDEX_HEADER = struct.Struct('<4sHc8sQ')
+# Keys are the first 8 bytes of each digest as an unsigned integer.
+# FANOUT_BITS of the key select a bucket; the fanout table holds the
+# cumulative entry count before each bucket (as in a git pack index),
+# so a lookup only bisects the entries sharing its top bits.
+FANOUT_BITS = 16
+FANOUT_SHIFT = 64 - FANOUT_BITS
+FANOUT_SIZE = 1 << FANOUT_BITS
+
+SQLITE_MAGIC = b'SQLite format 3\x00'
+
+# Match result recorded on file_metadata by the collector
+KNOWN_FILE_COLUMNS = (
+    ('known_status', 'TEXT'),
+    ('hash_set', 'TEXT'),
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HashSetError(Exception):
+    pass
+
+
+def hash_key(hex_digest):
+    """Return the index key (first 64 bits) of a hex digest."""
+    return int(hex_digest[:16], 16)
+
+
+def is_hex_digest(value, algorithm):
+    if len(value) != HASH_ALGORITHMS[algorithm]:
+        return False
+    try:
+        int(value, 16)
+    except ValueError:
+        return False
+    return True
+
+
+def iter_hash_list(path, algorithm):
+    """Yield the hex digests of one hash list.
+
+    Accepts an NSRL RDS v3 SQLite database (FILE table), CSV exports with
+    a header naming the algorithm column (e.g. NSRLFile.txt's "SHA-1"), or
+    plain text with one digest per line. Lines without a valid digest are
+    skipped.
+    """
+    with open(path, 'rb') as f:
+        is_sqlite = f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    if is_sqlite:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for (digest,) in conn.execute(f"SELECT {algorithm} FROM FILE"):
+                if digest and is_hex_digest(digest, algorithm):
+                    yield digest.lower()
+        finally:
+            conn.close()
+        return
+
+    column = None
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line_number, line in enumerate(f):
+            fields = [field.strip().strip('"') for field in line.split(',')]
+            if line_number == 0:
+                names = [field.lower().replace('-', '') for field in fields]
+                if algorithm in names:
+                    column = names.index(algorithm)
+                    continue
+            if column is not None:
+                digest = fields[column] if column < len(fields) else ''
+            else:
+                digest = fields[0].split()[0] if fields[0] else ''
+            if is_hex_digest(digest, algorithm):
+                yield digest.lower()
+
+
+def build_index(sources, index_path, algorithm):
+    """Compile hash lists into a sorted, deduplicated key index.
+
+    Keys are partitioned into FANOUT_SIZE arrays while reading, then each
+    bucket is sorted on its own, so memory stays near 8 bytes per entry
+    and no list of tens of millions of ints is ever built. Returns the
+    number of distinct entries written.
+    """
+    if algorithm not in HASH_ALGORITHMS:
+        raise HashSetError(f"Unsupported hash algorithm: {algorithm}")
+    buckets = [array('Q') for _ in range(FANOUT_SIZE)]
+    read = 0
+    for source in sources:
+        for digest in iter_hash_list(source, algorithm):
+            key = hash_key(digest)
+            buckets[key >> FANOUT_SHIFT].append(key)
+            read += 1
+
+    fanout = array('Q', [0])
+    keys = array('Q')
+    for position in range(FANOUT_SIZE):
+        bucket = buckets[position]
+        if bucket:
+            keys.extend(sorted(set(bucket)))
+            buckets[position] = None
+        fanout.append(len(keys))
+
+    temp_path = index_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, FORMAT_VERSION,
+                                  b'<' if sys.byteorder == 'little' else b'>',
+                                  algorithm.encode(), len(keys)))
+        fanout.tofile(f)
+        keys.tofile(f)
+    os.replace(temp_path, index_path)
+    logger.info(f"Indexed {len(keys)} distinct {algorithm} hashes ({read} read) into {index_path}")
+    return len(keys)
+
+
+class HashSetIndex:
+    """Memory-mapped membership test over a compiled hash set.
+
+    The index file is mapped read-only, so opening it costs nothing
+    whatever the set size and the pages are shared through the OS cache.
+    Matches compare the first 64 bits of the digest; with tens of
+    millions of entries the chance of a false match stays below 1e-11
+    per lookup.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byte_order, algorithm, count = INDEX_HEADER.unpack_from(self.map)
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise HashSetError(f"{path} is not a hash set index")
+        if version > FORMAT_VERSION:
+            self.close()
+            raise HashSetError(f"Unsupported hash set index version {version}")
+        if byte_order != (b'<' if sys.byteorder == 'little' else b'>'):
+            self.close()
+            raise HashSetError(f"{path} was built on a host with another byte order; rebuild it")
+        self.algorithm = algorithm.rstrip(b'\x00').decode()
+        self.count = count
+        fanout_end = INDEX_HEADER.size + (FANOUT_SIZE + 1) * 8
+        view = memoryview(self.map)
+        self.fanout = view[INDEX_HEADER.size:fanout_end].cast('Q')
+        self.keys = view[fanout_end:fanout_end + count * 8].cast('Q')
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, hex_digest):
+        key = hash_key(hex_digest)
+        bucket = key >> FANOUT_SHIFT
+        low, high = self.fanout[bucket], self.fanout[bucket + 1]
+        position = bisect.bisect_left(self.keys, key, low, high)
+        return position < high and self.keys[position] == key
+
+    def close(self):
+        if getattr(self, 'keys', None) is not None:
+            self.fanout.release()
+            self.keys.release()
+            self.keys = None
+        if not self.map.closed:
+            self.map.close()
+        self.file.close()
+
+
+def setup_hash_set_tables(conn):
+    """Create the hash_sets registry"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS hash_sets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        status TEXT NOT NULL,
+        algorithm TEXT NOT NULL,
+        source TEXT,
+        index_path TEXT NOT NULL,
+        entries INTEGER,
+        loaded_at TEXT
+    )""")
+    conn.commit()
+
+
+def setup_known_file_columns(conn):
+    """Add the known-file match columns to file_metadata if it exists"""
+    columns = [col[1] for col in conn.execute('PRAGMA table_info(file_metadata)')]
+    if not columns:
+        return
+    for column, column_type in KNOWN_FILE_COLUMNS:
+        if column not in columns:
+            conn.execute(f"ALTER TABLE file_metadata ADD COLUMN {column} {column_type}")
+            logger.info(f"Added file_metadata.{column} column")
+
+
+def file_digests(file_path, algorithms=('sha256',), chunk_size=1024 * 1024):
+    """Hash a file once for several algorithms; returns {algorithm: hex digest}"""
+    hashers = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            for hasher in hashers.values():
+                hasher.update(chunk)
+    return {algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()}
+
+
+class KnownFileFilter:
+    """Check file digests against every registered known-good/known-bad set.
+
+    Sets are registered in the hash_sets table of the evidence database
+    and compiled into index files under HASH_SET_DIR. A known-bad match
+    wins over a known-good one.
+    """
+
+    def __init__(self, db_path=EVIDENCE_DB, index_dir=HASH_SET_DIR):
+        self.db_path = db_path
+        self.index_dir = index_dir
+        self.conn = sqlite3.connect(db_path)
+        setup_hash_set_tables(self.conn)
+        self.sets = []
+        self.load()
+
+    def load(self):
+        """(Re)open the index of every registered set"""
+        self.close_indexes()
+        rows = self.conn.execute("""
+            SELECT name, status, index_path FROM hash_sets
+            ORDER BY status = 'known_bad' DESC, id
+        """).fetchall()
+        for name, status, index_path in rows:
+            try:
+                self.sets.append((name, status, HashSetIndex(index_path)))
+            except (OSError, HashSetError) as e:
+                logger.error(f"Hash set {name} unavailable: {str(e)}")
+
+    @property
+    def algorithms(self):
+        """Digest algorithms the registered sets need, sha256 first"""
+        needed = {index.algorithm for _, _, index in self.sets}
+        return ('sha256',) + tuple(sorted(needed - {'sha256'}))
+
+    def __bool__(self):
+        return bool(self.sets)
+
+    def lookup(self, digests):
+        """Return (status, set name) for the first matching set, or (None, None).
+
+        digests maps algorithm to hex digest; sets whose algorithm is
+        missing from digests are not consulted.
+        """
+        for name, status, index in self.sets:
+            digest = digests.get(index.algorithm)
+            if digest and digest.lower() in index:
+                return status, name
+        return None, None
+
+    def add_hash_set(self, name, status, sources, algorithm='sha256'):
+        """Compile hash lists into an index and register them under name."""
+        if status not in HASH_SET_STATUSES:
+            raise HashSetError(f"Status must be one of {', '.join(HASH_SET_STATUSES)}")
+        os.makedirs(self.index_dir, exist_ok=True)
+        index_path = os.path.join(self.index_dir, f"{name}.{algorithm}.khsx")
+        entries = build_index(sources, index_path, algorithm)
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO hash_sets (name, status, algorithm, source, index_path, entries, loaded_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    status = excluded.status, algorithm = excluded.algorithm,
+                    source = excluded.source, index_path = excluded.index_path,
+                    entries = excluded.entries, loaded_at = excluded.loaded_at
+            """, (name, status, algorithm, ';'.join(sources), index_path, entries,
+                  datetime.now().isoformat()))
+        self.load()
+        return entries
+
+    def remove_hash_set(self, name):
+        row = self.conn.execute(
+            "SELECT index_path FROM hash_sets WHERE name = ?", (name,)
+        ).fetchone()
+        if not row:
+            raise HashSetError(f"Hash set {name} not found")
+        with self.conn:
+            self.conn.execute("DELETE FROM hash_sets WHERE name = ?", (name,))
+        self.load()
+        if os.path.exists(row[0]):
+            os.remove(row[0])
+
+    def list_hash_sets(self):
+        return self.conn.execute("""
+            SELECT name, status, algorithm, entries, source, loaded_at
+            FROM hash_sets ORDER BY id
+        """).fetchall()
+
+    def close_indexes(self):
+        for _, _, index in self.sets:
+            index.close()
+        self.sets = []
+
+    def close(self):
+        self.close_indexes()
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+
+if __name__ == "__main__":
+    # Usage:
+    #   python -m src.collectors.hash_sets add NAME --status known_good [--algorithm sha1] LIST [LIST ...]
+    #   python -m src.collectors.hash_sets list
+    #   python -m src.collectors.hash_sets remove NAME
+    parser = argparse.ArgumentParser(description="Manage known-file hash sets")
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add')
+    add.add_argument('name')
+    add.add_argument('sources', nargs='+')
+    add.add_argument('--status', choices=HASH_SET_STATUSES, required=True)
+    add.add_argument('--algorithm', choices=sorted(HASH_ALGORITHMS), default='sha256')
+    commands.add_parser('list')
+    remove = commands.add_parser('remove')
+    remove.add_argument('name')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    known_files = KnownFileFilter()
+    try:
+        if args.command == 'add':
+            entries = known_files.add_hash_set(args.name, args.status, args.sources, args.algorithm)
+            print(f"{args.name}: {entries} hashes")
+        elif args.command == 'remove':
+            known_files.remove_hash_set(args.name)
+        else:
+            for row in known_files.list_hash_sets():
+                print(*row, sep='\t')
+    finally:
+        known_files.close()
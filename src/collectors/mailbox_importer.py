@@ -0,0 +1,240 @@
+import argparse
+import json
+import logging
+import mmap
+import os
+import re
+import sqlite3
+from multiprocessing import Pool
+
+from src.collectors.email_collector import (
+    DB_NAME, EmailBatchWriter, EmailMetadataExtractor, migrate_email_database
+)
+from src.collectors.message_store import MESSAGE_STORE_DB, MessageStore, compress_message
+
+# Recorded in email_metadata.imap_server for messages imported from files
+OFFLINE_SERVER = "offline-import"
+# mbox files are split into ranges of about this size, one per worker task
+MBOX_RANGE_SIZE = 32 * 1024 * 1024
+# Maildir/EML files handed to a worker per task
+FILE_GROUP_SIZE = 200
+
+MBOX_SEPARATOR = b'\nFrom '
+# mboxo/mboxrd escape body lines starting with "From " as ">From "
+MBOX_ESCAPED_FROM = re.compile(rb'^>(>*From )', re.MULTILINE)
+
+logger = logging.getLogger(__name__)
+
+
+class OfflineMetadataExtractor(EmailMetadataExtractor):
+    """EmailMetadataExtractor for messages read from files instead of IMAP.
+
+    The folder column records the source file or mailbox path and the
+    user column the custodian, so imported rows keep their provenance.
+    """
+
+    def __init__(self, source, custodian=None):
+        super().__init__(OFFLINE_SERVER, custodian, None, folder=source)
+
+    def setup_connections(self):
+        # Nothing to connect to: workers only parse, the importer writes
+        pass
+
+
+# Per-process extractor and message store, created by init_worker
+worker_extractor = None
+worker_store = None
+
+
+def init_worker(custodian, store_path):
+    global worker_extractor, worker_store
+    logging.disable(logging.INFO)
+    worker_extractor = OfflineMetadataExtractor(None, custodian)
+    worker_store = MessageStore(store_path)
+
+
+def parse_raw(raw_message, source):
+    """Return (email row, raw_messages row) for one message."""
+    store_row = compress_message(raw_message)
+    worker_extractor.folder = source
+    row = worker_extractor.parse_message(raw_message, raw_sha256=store_row[0])
+    return row, store_row
+
+
+def store_parsed(parsed):
+    """Store the raw messages of one task; returns just the email rows.
+
+    Rows reference their message by raw_sha256, so only the rows go
+    back to the parent and the messages are stored before them.
+    """
+    if parsed:
+        worker_store.put_compressed([store_row for _, store_row in parsed])
+    return [row for row, _ in parsed]
+
+
+def find_mbox_ranges(path, range_size=MBOX_RANGE_SIZE):
+    """Split an mbox file into (start, end) byte ranges on message boundaries."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        ranges = []
+        start = 0
+        while start < size:
+            boundary = mm.find(MBOX_SEPARATOR, min(start + range_size, size))
+            end = size if boundary == -1 else boundary + 1
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+
+def iter_mbox_messages(mm, start, end):
+    """Yield (offset, raw message) in mm[start:end], which begins at a "From " line."""
+    position = start
+    while position < end:
+        boundary = mm.find(MBOX_SEPARATOR, position, end)
+        message_end = end if boundary == -1 else boundary + 1
+        if mm[position:position + 5] == b'From ':
+            # Drop the envelope line; mbox puts a blank line before the next one
+            body_start = mm.find(b'\n', position, message_end)
+            if body_start != -1:
+                raw = mm[body_start + 1:message_end]
+                if raw.endswith(b'\n\n'):
+                    raw = raw[:-1]
+                yield position, MBOX_ESCAPED_FROM.sub(rb'\1', raw)
+        position = message_end
+
+
+def parse_mbox_range(task):
+    """Worker: parse every message in one mbox range."""
+    path, start, end = task
+    parsed = []
+    errors = 0
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for offset, raw_message in iter_mbox_messages(mm, start, end):
+            try:
+                parsed.append(parse_raw(raw_message, path))
+            except Exception as e:
+                logger.error(f"Failed to parse message at offset {offset} of {path}: {str(e)}")
+                errors += 1
+    return store_parsed(parsed), errors
+
+
+def parse_message_files(paths):
+    """Worker: parse a group of single-message (Maildir/EML) files."""
+    parsed = []
+    errors = 0
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                parsed.append(parse_raw(f.read(), path))
+        except Exception as e:
+            logger.error(f"Failed to parse message file {path}: {str(e)}")
+            errors += 1
+    return store_parsed(parsed), errors
+
+
+def is_mbox(path):
+    with open(path, 'rb') as f:
+        return f.read(5) == b'From '
+
+
+def walk_message_files(directory):
+    """Yield message files under a Maildir or a tree of .eml files."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        # Maildir keeps delivered messages in cur/ and new/; tmp/ is in flight
+        if os.path.basename(root) == 'tmp' and {'cur', 'new'} <= set(os.listdir(os.path.dirname(root))):
+            continue
+        in_maildir = os.path.basename(root) in ('cur', 'new')
+        for name in sorted(files):
+            if in_maildir or name.lower().endswith('.eml'):
+                yield os.path.join(root, name)
+
+
+class MailboxImporter:
+    """Bulk import exported mailboxes (mbox, Maildir, EML) into emails.db.
+
+    mbox files are memory-mapped and split on message boundaries into
+    ranges that worker processes parse in parallel; Maildir and EML files
+    are handed out in groups. Workers reuse EmailMetadataExtractor's
+    parsing and store each task's raw messages in the MessageStore
+    themselves, so only the parsed rows travel back to the parent, which
+    writes them through EmailBatchWriter, one transaction per task result.
+    """
+
+    def __init__(self, db_path=DB_NAME, workers=None, custodian=None, batch_size=500,
+                 store_path=MESSAGE_STORE_DB):
+        self.db_path = db_path
+        self.store_path = store_path
+        self.workers = workers or os.cpu_count() or 1
+        self.custodian = custodian
+        self.batch_size = batch_size
+
+    def build_tasks(self, paths):
+        """Return (mbox range tasks, file group tasks) for the given paths."""
+        mbox_tasks = []
+        message_files = []
+        for path in paths:
+            if os.path.isdir(path):
+                message_files.extend(walk_message_files(path))
+            elif path.lower().endswith('.eml') or not is_mbox(path):
+                message_files.append(path)
+            else:
+                mbox_tasks.extend((path, start, end) for start, end in find_mbox_ranges(path))
+        file_tasks = [message_files[i:i + FILE_GROUP_SIZE]
+                      for i in range(0, len(message_files), FILE_GROUP_SIZE)]
+        return mbox_tasks, file_tasks
+
+    def import_paths(self, paths):
+        """Import every message found under paths; returns a summary dict."""
+        mbox_tasks, file_tasks = self.build_tasks(paths)
+        logger.info(f"Importing {len(mbox_tasks)} mbox ranges and "
+                    f"{sum(len(group) for group in file_tasks)} message files "
+                    f"with {self.workers} workers")
+
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        # Creates raw_messages once before the workers open the store
+        MessageStore(self.store_path).close()
+        writer = EmailBatchWriter(conn, self.batch_size)
+        parsed = errors = 0
+        try:
+            migrate_email_database(conn)
+            with Pool(self.workers, initializer=init_worker,
+                      initargs=(self.custodian, self.store_path)) as pool:
+                results = [pool.imap_unordered(parse_mbox_range, mbox_tasks),
+                           pool.imap_unordered(parse_message_files, file_tasks)]
+                for result_iter in results:
+                    for rows, task_errors in result_iter:
+                        errors += task_errors
+                        if not rows:
+                            continue
+                        for row in rows:
+                            writer.submit_email(row)
+                        writer.flush()
+                        parsed += len(rows)
+        finally:
+            writer.flush()
+            conn.close()
+
+        logger.info(f"Imported {writer.inserted} emails ({writer.duplicates} duplicates, "
+                    f"{errors} unparseable)")
+        return {
+            'parsed': parsed,
+            'inserted': writer.inserted,
+            'duplicates': writer.duplicates,
+            'errors': errors
+        }
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.collectors.mailbox_importer PATH [PATH ...] [--workers N]
+    parser = argparse.ArgumentParser(description="Import mbox files, Maildirs and EML trees")
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--custodian', default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    importer = MailboxImporter(workers=args.workers, custodian=args.custodian)
+    print(json.dumps(importer.import_paths(args.paths), indent=2))
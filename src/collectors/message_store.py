@@ -0,0 +1,146 @@
+import hashlib
+import io
+import logging
+import sqlite3
+import zlib
+
+# Raw messages live outside emails.db so list queries never page them in
+MESSAGE_STORE_DB = "src/database/messages.db"
+
+logger = logging.getLogger(__name__)
+
+
+class DecompressingReader(io.RawIOBase):
+    """Raw reader that inflates a zlib blob incrementally."""
+
+    def __init__(self, compressed, chunk_size=64 * 1024):
+        self.compressed = compressed
+        self.chunk_size = chunk_size
+        self.position = 0
+        self.decompressor = zlib.decompressobj()
+        self.pending = b''
+        self.offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self.offset >= len(self.pending):
+            # Cap each step's output so a highly compressible message never
+            # inflates more than chunk_size bytes at once
+            if self.decompressor.unconsumed_tail:
+                data = self.decompressor.unconsumed_tail
+            elif self.position < len(self.compressed):
+                data = self.compressed[self.position:self.position + self.chunk_size]
+                self.position += self.chunk_size
+            else:
+                return 0
+            self.pending = self.decompressor.decompress(data, self.chunk_size)
+            self.offset = 0
+        count = min(len(buffer), len(self.pending) - self.offset)
+        buffer[:count] = self.pending[self.offset:self.offset + count]
+        self.offset += count
+        return count
+
+
+def compress_message(raw_message, compression_level=6):
+    """Return the raw_messages row (sha256, size, compressed_size, data) for a message."""
+    sha256 = hashlib.sha256(raw_message).hexdigest()
+    data = zlib.compress(raw_message, compression_level)
+    return sha256, len(raw_message), len(data), data
+
+
+class MessageStore:
+    """Content-addressed store of raw RFC822 messages.
+
+    Each message is zlib-compressed and stored once under the SHA-256 of
+    its raw bytes, so copies of a message collected from several folders
+    or accounts share one blob. Lookups are by primary key.
+    """
+
+    def __init__(self, db_path=MESSAGE_STORE_DB, compression_level=6):
+        self.db_path = db_path
+        self.compression_level = compression_level
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.setup_database()
+
+    def setup_database(self):
+        """Create the raw_messages table if it doesn't exist"""
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS raw_messages (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            compressed_size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        ) WITHOUT ROWID""")
+        self.conn.commit()
+
+    def put(self, raw_message):
+        """Store one message and return its SHA-256."""
+        return self.put_many([raw_message])[0]
+
+    def put_many(self, raw_messages):
+        """Store messages in one transaction; returns their SHA-256s in order."""
+        rows = [compress_message(raw, self.compression_level) for raw in raw_messages]
+        return self.put_compressed(rows)
+
+    def put_compressed(self, rows):
+        """Store rows built by compress_message (e.g. in worker processes)."""
+        with self.conn:
+            self.conn.executemany("""
+                INSERT OR IGNORE INTO raw_messages (sha256, size, compressed_size, data)
+                VALUES (?, ?, ?, ?)
+            """, rows)
+        return [row[0] for row in rows]
+
+    def get(self, sha256):
+        """Return the raw message bytes, or None if not stored."""
+        row = self.conn.execute(
+            "SELECT data FROM raw_messages WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+        return zlib.decompress(row[0]) if row else None
+
+    def read_range(self, sha256, offset, length):
+        """Return length bytes of a message starting at offset.
+
+        Decompression stops as soon as the range is covered, so reading the
+        headers of a large message does not inflate its attachments.
+        """
+        row = self.conn.execute(
+            "SELECT data FROM raw_messages WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+        if not row:
+            return None
+        decompressor = zlib.decompressobj()
+        compressed = row[0]
+        output = b''
+        position = 0
+        chunk_size = 64 * 1024
+        while len(output) < offset + length and position < len(compressed):
+            output += decompressor.decompress(compressed[position:position + chunk_size])
+            position += chunk_size
+        return output[offset:offset + length]
+
+    def open_stream(self, sha256):
+        """Return a buffered binary reader over a message, or None if not stored.
+
+        The message is inflated as it is read, so readline() over a large
+        message never holds more than one chunk of it uncompressed.
+        """
+        row = self.conn.execute(
+            "SELECT data FROM raw_messages WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+        if not row:
+            return None
+        return io.BufferedReader(DecompressingReader(row[0]))
+
+    def exists(self, sha256):
+        return self.conn.execute(
+            "SELECT 1 FROM raw_messages WHERE sha256 = ?", (sha256,)
+        ).fetchone() is not None
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
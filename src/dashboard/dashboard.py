@@ -1,9 +1,55 @@
 import tkinter as tk
 from tkinter import ttk
+import codecs
 import sqlite3
 from datetime import datetime
 import os
 
+from src.collectors.email_collector import get_email_count
+from src.dashboard.virtual_tree import BackgroundLoader, RowSource, VirtualTree
+from src.database.change_feed import ChangeFeed
+
+# Emails newest first, over idx_email_metadata_date_sort
+EMAIL_SOURCE = RowSource(
+    'email',
+    "SELECT id FROM email_metadata ORDER BY date_sort DESC, id DESC",
+    """
+        SELECT id, sender, subject, date,
+               CASE 
+                   WHEN spf_pass + dkim_pass + dmarc_pass = 3 THEN 'Secure'
+                   WHEN spf_pass + dkim_pass + dmarc_pass >= 1 THEN 'Partial'
+                   ELSE 'Unsecure'
+               END as security
+        FROM email_metadata WHERE id IN ({keys})
+    """,
+    sort_sql="SELECT COALESCE(date_sort, ''), id FROM email_metadata WHERE id = ?",
+    descending=True
+)
+# Latest analysis' file type per file, over idx_file_analysis_file_id
+FILE_ROWS_SQL = """
+    SELECT fm.id, fm.file_name,
+           (SELECT fa.file_type FROM file_analysis fa
+            WHERE fa.file_id = fm.id ORDER BY fa.id DESC LIMIT 1),
+           fm.file_size, fm.last_modified
+    FROM file_metadata fm WHERE fm.id IN ({keys})
+"""
+FILE_SOURCE = RowSource('evidence', "SELECT id FROM file_metadata ORDER BY id", FILE_ROWS_SQL,
+                        sort_sql="SELECT id FROM file_metadata WHERE id = ?")
+# Files whose name or any extracted text contains a keyword
+FILE_SEARCH_FILTER = """
+    (fm.file_name LIKE ? OR EXISTS (
+        SELECT 1 FROM file_analysis fa
+        WHERE fa.file_id = fm.id AND fa.extracted_text LIKE ?
+    ))
+"""
+
+# Characters of each long field shown when a file is selected
+DETAIL_PREVIEW_CHARS = 2000
+# Bytes of extracted text read per page when the full text is requested
+TEXT_PAGE_BYTES = 256 * 1024
+# Milliseconds between change feed checks
+CHANGE_POLL_INTERVAL = 2000
+
 
 class ForensicsDashboard:
     def __init__(self, root):
@@ -12,11 +58,20 @@ class ForensicsDashboard:
 
         # Set up database paths
         db_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
-        self.email_db = sqlite3.connect(os.path.join(db_dir, "emails.db"))
-        self.evidence_db = sqlite3.connect(os.path.join(db_dir, "evidence.db"))
+
+        # All queries run off the UI thread
+        self.loader = BackgroundLoader(root, {
+            'email': os.path.join(db_dir, "emails.db"),
+            'evidence': os.path.join(db_dir, "evidence.db")
+        })
 
         self.setup_ui()
 
+        # Created and used on the loader thread only
+        self.change_feed = None
+        self.change_seq = None
+        self.root.after(CHANGE_POLL_INTERVAL, self.poll_changes)
+
     def setup_ui(self):
         # Create notebook for tabbed interface
         notebook = ttk.Notebook(self.root)
@@ -40,16 +95,29 @@ class ForensicsDashboard:
     def setup_overview_tab(self, parent):
         stats_frame = ttk.LabelFrame(parent, text="Evidence Statistics")
         stats_frame.pack(pady=10, padx=10, fill="x")
-        ttk.Label(stats_frame, text=f"Total Emails: {self.get_email_count()}").pack(pady=5)
-        ttk.Label(stats_frame, text=f"Total Files: {self.get_file_count()}").pack(pady=5)
+        self.email_count_label = ttk.Label(stats_frame, text="Total Emails: ...")
+        self.email_count_label.pack(pady=5)
+        self.file_count_label = ttk.Label(stats_frame, text="Total Files: ...")
+        self.file_count_label.pack(pady=5)
+        self.refresh_email_count()
+        self.refresh_file_count()
+
+    def refresh_email_count(self):
+        self.loader.submit(self.get_email_count,
+                           lambda count: self.email_count_label.config(text=f"Total Emails: {count}"))
+
+    def refresh_file_count(self):
+        self.loader.submit(self.get_file_count,
+                           lambda count: self.file_count_label.config(text=f"Total Files: {count}"))
 
     def setup_email_tab(self, parent):
-        tree = ttk.Treeview(parent, columns=("Sender", "Subject", "Date", "Security"), show="headings")
+        tree = VirtualTree(parent, self.loader, ("Sender", "Subject", "Date", "Security"))
         tree.heading("Sender", text="Sender")
         tree.heading("Subject", text="Subject")
         tree.heading("Date", text="Date")
         tree.heading("Security", text="Security Status")
         tree.pack(pady=10, padx=10, fill="both", expand=True)
+        self.email_tree = tree
         self.populate_email_tree(tree)
 
     def setup_file_tab(self, parent):
@@ -67,16 +135,23 @@ class ForensicsDashboard:
         search_entry.pack(side="left", fill="x", expand=True, padx=5)
         ttk.Button(search_frame, text="Search", command=lambda: self.search_files(self.file_tree)).pack(side="left")
 
-        self.file_tree = ttk.Treeview(list_frame, columns=("Filename", "Type", "Size", "Modified"), show="headings")
+        self.file_tree = VirtualTree(list_frame, self.loader, ("Filename", "Type", "Size", "Modified"))
         for col in ("Filename", "Type", "Size", "Modified"):
             self.file_tree.heading(col, text=col)
         self.file_tree.pack(fill="both", expand=True, padx=5, pady=5)
-        self.file_tree.bind('<<TreeviewSelect>>', self.on_file_select)
+        self.file_tree.bind_select(self.on_file_select)
+        self.file_tree.bind_keys(self.on_file_keys)
 
         details_frame = ttk.LabelFrame(main_frame, text="File Details")
         details_frame.pack(side="right", fill="both", expand=True, padx=5, pady=5)
         self.details_text = tk.Text(details_frame, wrap=tk.WORD, width=40)
         self.details_text.pack(fill="both", expand=True, padx=5, pady=5)
+        self.full_text_button = ttk.Button(details_frame, text="Load Full Text",
+                                           command=self.load_full_text, state="disabled")
+        self.full_text_button.pack(pady=5)
+        self.detail_key = None
+        self.detail = None
+        self.text_stream = None
         self.populate_file_tree(self.file_tree)
 
     def setup_custody_tab(self, parent):
@@ -86,91 +161,234 @@ class ForensicsDashboard:
         self.custody_text.pack(pady=5, padx=5, fill="both", expand=True)
         ttk.Button(custody_frame, text="Add Custody Entry", command=self.add_custody_entry).pack(pady=5)
 
-    def get_email_count(self):
+    def get_email_count(self, connections):
+        # The trigger-maintained counter, not a scan of every row
         try:
-            cursor = self.email_db.cursor()
-            cursor.execute("SELECT COUNT(*) FROM email_metadata")
-            return cursor.fetchone()[0]
+            return get_email_count(connections['email'])
         except sqlite3.OperationalError:
             return 0
 
-    def get_file_count(self):
+    def get_file_count(self, connections):
         try:
-            cursor = self.evidence_db.cursor()
+            cursor = connections['evidence'].cursor()
             cursor.execute("SELECT COUNT(*) FROM file_metadata")
             return cursor.fetchone()[0]
         except sqlite3.OperationalError:
             return 0
 
     def populate_email_tree(self, tree):
-        try:
-            cursor = self.email_db.cursor()
-            cursor.execute("""
-                SELECT sender, subject, date, 
-                       CASE 
-                           WHEN spf_pass + dkim_pass + dmarc_pass = 3 THEN 'Secure'
-                           WHEN spf_pass + dkim_pass + dmarc_pass >= 1 THEN 'Partial'
-                           ELSE 'Unsecure'
-                       END as security
-                FROM email_metadata
-            """)
-            for row in cursor.fetchall():
-                tree.insert("", "end", values=row)
-        except sqlite3.OperationalError:
-            pass
+        tree.set_source(EMAIL_SOURCE)
 
     def populate_file_tree(self, tree):
-        try:
-            cursor = self.evidence_db.cursor()
-            cursor.execute("SELECT file_name, file_size, hash_sha256, last_modified FROM file_metadata")
-            for row in cursor.fetchall():
-                tree.insert("", "end", values=row)
-        except sqlite3.OperationalError:
-            pass
+        tree.set_source(FILE_SOURCE)
+
+    def poll_changes(self):
+        self.loader.submit(self.read_changes, self.apply_changes)
+
+    def read_changes(self, connections):
+        """Changes since the last poll; the first poll only sets the start"""
+        if self.change_feed is None:
+            self.change_feed = ChangeFeed(self.loader.db_paths['evidence'], self.loader.db_paths['email'])
+        if self.change_seq is None:
+            self.change_seq = self.change_feed.latest()
+            return None
+        delta = self.change_feed.changes(self.change_seq)
+        self.change_seq = delta['seq']
+        return delta
+
+    def apply_changes(self, delta):
+        # Each poll is scheduled once the previous one was applied, right
+        # away while more pages are waiting
+        self.root.after(1 if delta and delta['more'] else CHANGE_POLL_INTERVAL, self.poll_changes)
+        if not delta:
+            return
+        if delta['reset']:
+            self.email_tree.reload()
+            self.file_tree.reload()
+            self.refresh_email_count()
+            if self.file_tree.source is not FILE_SOURCE:
+                self.refresh_file_count()
+            self.show_changed_details()
+            return
+        changed = {'email': set(), 'evidence': set()}
+        inserted = {'email': set(), 'evidence': set()}
+        deleted = {'email': set(), 'evidence': set()}
+        reset = set()
+        for change in delta['changes']:
+            source = change['source']
+            if source not in changed:
+                continue
+            changed[source].add(change['id'])
+            # Deleted keys are dropped before inserted ones are placed,
+            # so a later delete cancels an insert but not the other way
+            if change['operation'] == 'insert':
+                inserted[source].add(change['id'])
+            elif change['operation'] == 'delete':
+                deleted[source].add(change['id'])
+                inserted[source].discard(change['id'])
+            elif change['operation'] == 'reset':
+                reset.add(source)
+        # Only a bulk change reads every key again; new and deleted rows
+        # are placed in the shown keys, which also refetches the window
+        for source, tree in (('email', self.email_tree), ('evidence', self.file_tree)):
+            if source in reset:
+                tree.reload()
+            elif inserted[source] or deleted[source]:
+                tree.update_keys(inserted[source], deleted[source])
+            else:
+                tree.refresh(changed[source])
+        if 'email' in reset or inserted['email'] or deleted['email']:
+            self.refresh_email_count()
+        # The file count follows the file tree's keys, unless a search is shown
+        if ('evidence' in reset or inserted['evidence'] or deleted['evidence']) \
+                and self.file_tree.source is not FILE_SOURCE:
+            self.refresh_file_count()
+        # A reset change (id None) may have touched any file
+        if self.detail_key in changed['evidence'] or None in changed['evidence']:
+            self.show_changed_details()
+
+    def on_file_keys(self):
+        # The unfiltered tree holds a key per file, so no count query is needed
+        if self.file_tree.source is FILE_SOURCE:
+            self.file_count_label.config(text=f"Total Files: {len(self.file_tree.keys)}")
+
+    def show_changed_details(self):
+        # A full text being streamed is left alone
+        if self.detail_key is not None and self.text_stream is None:
+            self.show_file(self.detail_key)
 
     def on_file_select(self, event):
-        selection = self.file_tree.selection()
-        if not selection:
+        file_id = self.file_tree.selected()
+        if file_id is None or file_id == self.detail_key:
             return
-        item = self.file_tree.item(selection[0])
-        file_name = item['values'][0]
-        cursor = self.evidence_db.cursor()
+        self.show_file(file_id)
+
+    def show_file(self, file_id):
+        self.detail_key = file_id
+        self.detail = None
+        self.text_stream = None
+        self.full_text_button.config(text="Load Full Text", state="disabled")
+        self.details_text.delete(1.0, tk.END)
+        self.details_text.insert(1.0, "Loading...")
+        self.loader.submit(lambda connections: self.load_file_details(connections, file_id),
+                           lambda detail: self.show_file_details(file_id, detail))
+
+    def load_file_details(self, connections, file_id):
+        """Details of one file with each long field cut to DETAIL_PREVIEW_CHARS"""
+        cursor = connections['evidence'].cursor()
         cursor.execute("""
-            SELECT fm.*, fa.file_type, fa.mime_type, fa.content_preview, fa.extracted_text, im.exif_data
+            SELECT fm.file_name, fm.file_size, fm.last_modified, fa.id, fa.file_type, fa.mime_type,
+                   substr(fa.content_preview, 1, ?), substr(fa.extracted_text, 1, ?),
+                   length(fa.extracted_text), length(CAST(fa.extracted_text AS BLOB)),
+                   substr(im.exif_data, 1, ?)
             FROM file_metadata fm
-            LEFT JOIN file_analysis fa ON fm.id = fa.file_id
+            LEFT JOIN file_analysis fa ON fa.id = (
+                SELECT MAX(id) FROM file_analysis WHERE file_id = fm.id
+            )
             LEFT JOIN image_metadata im ON fm.id = im.file_id
-            WHERE fm.file_name = ?
-        """, (file_name,))
-        result = cursor.fetchone()
-        if result:
-            self.details_text.delete(1.0, tk.END)
-            details = f"""File: {result[1]}
-Type: {result[6]}
-MIME Type: {result[7]}
-Size: {result[3]} bytes
-Last Modified: {result[5]}
+            WHERE fm.id = ?
+        """, (DETAIL_PREVIEW_CHARS, DETAIL_PREVIEW_CHARS, DETAIL_PREVIEW_CHARS, file_id))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        keys = ('file_name', 'file_size', 'last_modified', 'analysis_id', 'file_type', 'mime_type',
+                'content_preview', 'extracted_text', 'text_length', 'text_bytes', 'exif_data')
+        return dict(zip(keys, row))
+
+    def show_file_details(self, file_id, detail):
+        # A later selection may have replaced this one
+        if file_id != self.detail_key:
+            return
+        self.detail = detail
+        self.details_text.delete(1.0, tk.END)
+        if not detail:
+            self.details_text.insert(1.0, "File not found")
+            return
+        text_length = detail['text_length'] or 0
+        truncated = text_length > DETAIL_PREVIEW_CHARS
+        self.details_text.insert(tk.END, f"""File: {detail['file_name']}
+Type: {detail['file_type']}
+MIME Type: {detail['mime_type']}
+Size: {detail['file_size']} bytes
+Last Modified: {detail['last_modified']}
 Content Preview:
-{result[8] if result[8] else 'No preview available'}
+{detail['content_preview'] if detail['content_preview'] else 'No preview available'}
 Extracted Text:
-{result[9] if result[9] else 'No text extracted'}
+""")
+        # Streamed pages replace the preview between these marks
+        self.details_text.mark_set("text_start", tk.END + "-1c")
+        self.details_text.mark_gravity("text_start", tk.LEFT)
+        self.details_text.insert(tk.END, detail['extracted_text'] if detail['extracted_text'] else 'No text extracted')
+        if truncated:
+            self.details_text.insert(tk.END, f"... [{text_length - DETAIL_PREVIEW_CHARS} more characters]")
+        self.details_text.mark_set("text_end", tk.END + "-1c")
+        self.details_text.mark_gravity("text_end", tk.LEFT)
+        self.details_text.insert(tk.END, f"""
 Image Metadata:
-{result[10] if result[10] else 'No image metadata'}"""
-            self.details_text.insert(1.0, details)
+{detail['exif_data'] if detail['exif_data'] else 'No image metadata'}""")
+        # Pages inserted at text_end then land after each other
+        self.details_text.mark_gravity("text_end", tk.RIGHT)
+        if truncated:
+            self.full_text_button.config(text=f"Load Full Text ({text_length} characters)", state="normal")
+
+    def load_full_text(self):
+        """Replace the text preview with the full text, one page at a time"""
+        detail = self.detail
+        if not detail or not detail['analysis_id']:
+            return
+        self.text_stream = (self.detail_key, codecs.getincrementaldecoder('utf-8')('replace'))
+        self.details_text.delete("text_start", "text_end")
+        self.full_text_button.config(text="Loading Full Text...", state="disabled")
+        self.request_text_page(self.text_stream, detail['analysis_id'], 0)
+
+    def request_text_page(self, stream, analysis_id, offset):
+        self.loader.submit(
+            lambda connections: self.read_text_page(connections, analysis_id, offset),
+            lambda page: self.append_text_page(stream, analysis_id, offset, page)
+        )
+
+    def read_text_page(self, connections, analysis_id, offset):
+        """TEXT_PAGE_BYTES of a file's extracted text from a byte offset"""
+        conn = connections['evidence']
+        if hasattr(conn, 'blobopen'):
+            # Incremental blob I/O reads just this page, not the whole value
+            with conn.blobopen('file_analysis', 'extracted_text', analysis_id, readonly=True) as blob:
+                blob.seek(offset)
+                return blob.read(TEXT_PAGE_BYTES)
+        row = conn.execute("""
+            SELECT substr(CAST(extracted_text AS BLOB), ?, ?) FROM file_analysis WHERE id = ?
+        """, (offset + 1, TEXT_PAGE_BYTES, analysis_id)).fetchone()
+        return row[0] if row else b''
+
+    def append_text_page(self, stream, analysis_id, offset, page):
+        # Stop when another file was selected or the page could not be read
+        if stream is not self.text_stream:
+            return
+        decoder = stream[1]
+        final = page is None or len(page) < TEXT_PAGE_BYTES
+        self.details_text.insert("text_end", decoder.decode(page or b'', final=final))
+        offset += len(page or b'')
+        if final:
+            self.text_stream = None
+            self.full_text_button.config(text="Full Text Loaded")
+            return
+        total = self.detail['text_bytes'] or offset
+        self.full_text_button.config(text=f"Loading Full Text... {min(100, offset * 100 // total)}%")
+        self.request_text_page(stream, analysis_id, offset)
 
     def search_files(self, tree):
         keyword = self.search_var.get()
-        for item in tree.get_children():
-            tree.delete(item)
-        cursor = self.evidence_db.cursor()
-        cursor.execute("""
-            SELECT fm.file_name, fa.file_type, fm.file_size, fm.last_modified
-            FROM file_metadata fm
-            JOIN file_analysis fa ON fm.id = fa.file_id
-            WHERE fm.file_name LIKE ? OR fa.extracted_text LIKE ?
-        """, (f'%{keyword}%', f'%{keyword}%'))
-        for row in cursor.fetchall():
-            tree.insert("", "end", values=row)
+        if not keyword:
+            tree.set_source(FILE_SOURCE)
+            return
+        # The LIKE scan runs on the loader thread; only the window is fetched
+        tree.set_source(RowSource(
+            'evidence',
+            f"SELECT fm.id FROM file_metadata fm WHERE {FILE_SEARCH_FILTER} ORDER BY fm.id",
+            FILE_ROWS_SQL,
+            (f'%{keyword}%', f'%{keyword}%'),
+            sort_sql=f"SELECT fm.id FROM file_metadata fm WHERE fm.id = ? AND {FILE_SEARCH_FILTER}"
+        ))
 
     def add_custody_entry(self):
         timestamp = datetime.now().isoformat()
@@ -0,0 +1,394 @@
+import logging
+import queue
+import sqlite3
+import threading
+from array import array
+from tkinter import ttk
+
+# Milliseconds between checks for finished background work
+POLL_INTERVAL = 50
+# Fallback Treeview row height in pixels when the theme does not say
+ROW_HEIGHT = 20
+# Rows scrolled per mouse wheel notch
+WHEEL_ROWS = 3
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoader:
+    """Run database work on one thread and hand results back to Tk.
+
+    The worker thread owns its own sqlite connections (one per name in
+    db_paths), since connections cannot be shared across threads. Work
+    functions receive that dict; their results are queued and delivered
+    to callbacks from the Tk event loop, the only thread allowed to
+    touch widgets.
+    """
+
+    def __init__(self, root, db_paths):
+        self.root = root
+        self.db_paths = db_paths
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='dashboard-loader', daemon=True)
+        self.thread.start()
+        self.root.after(POLL_INTERVAL, self._poll)
+
+    def submit(self, work, callback):
+        """Run work(connections) in the background, then callback(result) on Tk.
+
+        callback gets None if work raised.
+        """
+        self.jobs.put((work, callback))
+
+    def close(self):
+        self.jobs.put(None)
+
+    def _run(self):
+        connections = {name: sqlite3.connect(path) for name, path in self.db_paths.items()}
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    return
+                work, callback = job
+                try:
+                    result = work(connections)
+                except Exception as e:
+                    # Callbacks still run (with None) so no view waits forever
+                    logger.error(f"Dashboard query failed: {str(e)}")
+                    result = None
+                self.results.put((callback, result))
+        finally:
+            for conn in connections.values():
+                conn.close()
+
+    def _poll(self):
+        while True:
+            try:
+                callback, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            callback(result)
+        self.root.after(POLL_INTERVAL, self._poll)
+
+
+class RowSource:
+    """Rows of one query in a fixed order, addressed by primary key.
+
+    key_sql selects the ordered keys of every row (an index scan of
+    integers); row_sql selects the displayed columns of a window of rows,
+    with the key first, and contains a {keys} placeholder for the
+    window's keys. Missing tables give an empty list.
+
+    sort_sql, if given, selects the ORDER BY columns of the one row whose
+    key is its first parameter (params follow), and nothing if that row
+    is not in the source; descending says the order is reversed. With it
+    new keys are placed by binary search instead of reading every key.
+    """
+
+    def __init__(self, db, key_sql, row_sql, params=(), sort_sql=None, descending=False):
+        self.db = db
+        self.key_sql = key_sql
+        self.row_sql = row_sql
+        self.params = tuple(params)
+        self.sort_sql = sort_sql
+        self.descending = descending
+
+    def keys(self, connections):
+        try:
+            cursor = connections[self.db].execute(self.key_sql, self.params)
+            return array('q', (row[0] for row in cursor))
+        except sqlite3.OperationalError:
+            return array('q')
+
+    def rows(self, connections, keys):
+        if not keys:
+            return []
+        sql = self.row_sql.format(keys=", ".join("?" * len(keys)))
+        try:
+            return connections[self.db].execute(sql, list(keys)).fetchall()
+        except sqlite3.OperationalError:
+            return []
+
+    def position(self, connections, keys, key):
+        """Index in keys where key's row belongs, or None if it is not in the source.
+
+        Raises LookupError if a row of keys probed on the way has gone.
+        """
+        conn = connections[self.db]
+
+        def sort_value(key):
+            return conn.execute(self.sort_sql, (key,) + self.params).fetchone()
+
+        value = sort_value(key)
+        if value is None:
+            return None
+        low, high = 0, len(keys)
+        while low < high:
+            mid = (low + high) // 2
+            other = sort_value(keys[mid])
+            if other is None:
+                raise LookupError(keys[mid])
+            if (other > value) if self.descending else (other < value):
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def merge_keys(self, connections, keys, first, inserted, deleted):
+        """Return keys with deleted removed and inserted at their place.
+
+        first (the top shown index) comes back moved so the same row stays
+        on top, unless it was 0. keys itself is left alone, as the Tk
+        thread may still be showing it. Every key is read again if a row
+        changed under the search.
+        """
+        if deleted:
+            gone = set(deleted)
+            first -= sum(1 for key in keys[:first] if key in gone)
+            keys = array('q', (key for key in keys if key not in gone))
+        else:
+            keys = array('q', keys)
+        try:
+            for key in inserted:
+                position = self.position(connections, keys, key)
+                # Gone again, not matched, or already read with the keys
+                if position is None or (position < len(keys) and keys[position] == key):
+                    continue
+                keys.insert(position, key)
+                if 0 < first and position <= first:
+                    first += 1
+        except LookupError:
+            return self.keys(connections), first
+        return keys, first
+
+
+class VirtualTree(ttk.Frame):
+    """A Treeview that only ever holds the rows on screen.
+
+    The source's keys are loaded once in the background; the scrollbar
+    and keyboard move over that key list, and each window of rows (the
+    visible rows plus one screen above and below) is fetched by key when
+    it is first shown. Item ids are the row keys, so selection survives
+    scrolling and is independent of the displayed values.
+    """
+
+    def __init__(self, parent, loader, columns, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.loader = loader
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.source = None
+        self.generation = 0
+        self.keys = array('q')
+        self.first = 0
+        self.visible = 1
+        self.cache_start = 0
+        self.cache_rows = []
+        self.loading = False
+        self.loading_keys = False
+        self.keys_callback = None
+        self.selected_key = None
+        self.selected_index = None
+
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select, add='+')
+        self.tree.bind('<MouseWheel>', self.on_mousewheel)
+        self.tree.bind('<Button-4>', self.on_mousewheel)
+        self.tree.bind('<Button-5>', self.on_mousewheel)
+        self.tree.bind('<Up>', lambda event: self.move_selection(-1))
+        self.tree.bind('<Down>', lambda event: self.move_selection(1))
+        self.tree.bind('<Prior>', lambda event: self.move_selection(-self.visible))
+        self.tree.bind('<Next>', lambda event: self.move_selection(self.visible))
+        self.tree.bind('<Home>', lambda event: self.select_index(0))
+        self.tree.bind('<End>', lambda event: self.select_index(len(self.keys) - 1))
+
+    def heading(self, column, **kwargs):
+        self.tree.heading(column, **kwargs)
+
+    def bind_select(self, callback):
+        self.tree.bind('<<TreeviewSelect>>', callback, add='+')
+
+    def bind_keys(self, callback):
+        """Call callback() whenever a new key list is shown"""
+        self.keys_callback = callback
+
+    def set_source(self, source):
+        """Show a new source from the top"""
+        self.source = source
+        self.first = 0
+        self.selected_key = None
+        self.selected_index = None
+        self.reload()
+
+    def reload(self):
+        """Reload the keys of the current source, keeping the scroll position"""
+        self.generation += 1
+        generation = self.generation
+        self.loading_keys = True
+        self.loader.submit(self.source.keys, lambda keys: self._keys_loaded(generation, keys))
+
+    def update_keys(self, inserted, deleted):
+        """Add inserted keys at their place and drop deleted ones.
+
+        Only the new rows' places are looked up; sources without a
+        sort_sql, and changes arriving while keys are loading, reload.
+        """
+        if self.loading_keys or self.source.sort_sql is None:
+            self.reload()
+            return
+        self.generation += 1
+        generation = self.generation
+        self.loading_keys = True
+        source = self.source
+        keys = self.keys
+        first = self.first
+        inserted = list(inserted)
+        deleted = list(deleted)
+        self.loader.submit(lambda connections: source.merge_keys(connections, keys, first, inserted, deleted),
+                           lambda merged: self._keys_merged(generation, merged))
+
+    def _keys_merged(self, generation, merged):
+        if generation != self.generation:
+            return
+        if merged is None:
+            self.reload()
+            return
+        keys, self.first = merged
+        self._keys_loaded(generation, keys)
+
+    def _keys_loaded(self, generation, keys):
+        if generation != self.generation:
+            return
+        self.loading_keys = False
+        self.keys = keys if keys is not None else array('q')
+        keys = self.keys
+        self.cache_rows = []
+        self.first = max(0, min(self.first, len(keys) - self.visible))
+        if self.selected_key is not None:
+            # The selected row may have moved or gone
+            try:
+                self.selected_index = keys.index(self.selected_key)
+            except ValueError:
+                self.selected_key = self.selected_index = None
+        self._show()
+        if self.keys_callback is not None:
+            self.keys_callback()
+
+    def refresh(self, keys):
+        """Refetch the shown rows if any of keys is among them"""
+        if any(key in keys for key, values in self.cache_rows):
+            self.cache_rows = []
+            self._show()
+
+    def _show(self):
+        total = len(self.keys)
+        if total:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        end = min(total, self.first + self.visible)
+        if self.cache_start <= self.first and end <= self.cache_start + len(self.cache_rows):
+            self._render()
+        elif total:
+            self._request()
+        else:
+            self._render()
+
+    def _request(self):
+        # One fetch at a time; the newest position is fetched when it returns
+        if self.loading:
+            return
+        self.loading = True
+        start = max(0, self.first - self.visible)
+        all_keys = self.keys
+        keys = all_keys[start:self.first + 2 * self.visible]
+        source = self.source
+        self.loader.submit(lambda connections: source.rows(connections, keys),
+                           lambda rows: self._rows_loaded(all_keys, start, keys, rows))
+
+    def _rows_loaded(self, all_keys, start, keys, rows):
+        self.loading = False
+        if all_keys is self.keys:
+            by_key = {row[0]: row[1:] for row in rows or ()}
+            self.cache_start = start
+            # Rows deleted since the keys were loaded stay as blank placeholders
+            self.cache_rows = [(key, by_key.get(key, ())) for key in keys]
+        # Otherwise the keys were reloaded meanwhile; fetch again for them
+        self._show()
+
+    def _render(self):
+        offset = self.first - self.cache_start
+        rows = self.cache_rows[offset:offset + self.visible]
+        self.tree.delete(*self.tree.get_children())
+        for key, values in rows:
+            self.tree.insert("", "end", iid=str(key), values=values)
+        if self.selected_key is not None and self.tree.exists(str(self.selected_key)):
+            iid = str(self.selected_key)
+            if self.tree.selection() != (iid,):
+                self.tree.selection_set(iid)
+            self.tree.focus(iid)
+
+    def scroll_to(self, first):
+        first = max(0, min(first, len(self.keys) - self.visible))
+        if first != self.first:
+            self.first = first
+            self._show()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(amount) * len(self.keys)))
+        elif action == 'scroll':
+            step = int(amount) * (self.visible if unit == 'pages' else 1)
+            self.scroll_to(self.first + step)
+
+    def on_mousewheel(self, event):
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            self.scroll_to(self.first - WHEEL_ROWS)
+        else:
+            self.scroll_to(self.first + WHEEL_ROWS)
+        return 'break'
+
+    def on_resize(self, event):
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or ROW_HEIGHT)
+        # One row's worth of height goes to the headings
+        visible = max(1, event.height // row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.first = max(0, min(self.first, len(self.keys) - visible))
+            self._show()
+
+    def on_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            self.selected_key = int(selection[0])
+            self.selected_index = self.first + self.tree.index(selection[0])
+
+    def move_selection(self, delta):
+        if self.selected_index is None:
+            self.select_index(self.first)
+        else:
+            self.select_index(self.selected_index + delta)
+        return 'break'
+
+    def select_index(self, index):
+        if not self.keys:
+            return 'break'
+        index = max(0, min(index, len(self.keys) - 1))
+        self.selected_index = index
+        self.selected_key = self.keys[index]
+        if index < self.first:
+            self.scroll_to(index)
+        elif index >= self.first + self.visible:
+            self.scroll_to(index - self.visible + 1)
+        else:
+            self._render()
+        return 'break'
+
+    def selected(self):
+        """Key of the selected row, or None"""
+        return self.selected_key
@@ -0,0 +1,247 @@
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import psutil
+
+EVIDENCE_DB = "src/database/evidence.db"
+EMAIL_DB = "src/database/emails.db"
+
+# (feed source, table, column holding the item id, rows are the items,
+# columns whose updates are logged) per logged table. Any write to a
+# table whose rows only describe an item (file_analysis) is an update of
+# that item; custody changes are reported per evidence item. Updates of
+# other columns (hashes, storage locations, bookkeeping flags) are not
+# shown by any view and are not logged; None logs every update.
+EVIDENCE_LOGGED_TABLES = (
+    ('evidence', 'file_metadata', 'id', True,
+     ('file_name', 'file_size', 'last_modified', 'known_status', 'hash_set')),
+    ('evidence', 'file_analysis', 'file_id', False,
+     ('file_type', 'mime_type', 'content_preview', 'extracted_text', 'manipulation_confidence')),
+    ('custody', 'custody_chain', 'evidence_id', True, None),
+)
+EMAIL_LOGGED_TABLES = (
+    ('email', 'email_metadata', 'id', True,
+     ('sender', 'recipient', 'subject', 'date', 'date_sort', 'has_attachments', 'body_fetched',
+      'spf_pass', 'dkim_pass', 'dmarc_pass', 'spf_result', 'dkim_result', 'dkim_domain',
+      'dmarc_result')),
+)
+
+# Entries kept in the feed; clients further behind are told to reload
+CHANGE_LOG_RETENTION = 100000
+CHANGE_PAGE_LIMIT = 500
+
+logger = logging.getLogger(__name__)
+
+
+def setup_change_log(conn, logged_tables):
+    """Create change_log and the triggers that append to it.
+
+    Every insert, delete and logged-column update on a logged table
+    appends one row, so writers in any process are captured without code
+    changes; nothing is appended for a source while its log is paused
+    (see paused_change_log). Triggers are only created for tables that
+    already exist; calling this again later picks up tables created since.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT NOT NULL,
+        item_id INTEGER,
+        operation TEXT NOT NULL,
+        changed_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    )""")
+    # One row per process running bulk maintenance on a source
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS change_log_paused (
+        source TEXT NOT NULL,
+        pid INTEGER NOT NULL,
+        paused_at TEXT,
+        PRIMARY KEY (source, pid)
+    )""")
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for source, table, column, owns_items, update_columns in logged_tables:
+        if table not in existing:
+            continue
+        for operation, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+            event = operation.upper()
+            if operation == 'update' and update_columns:
+                event += f" OF {', '.join(update_columns)}"
+            conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_change_{operation}
+            AFTER {event} ON {table}
+            WHEN NOT EXISTS (SELECT 1 FROM change_log_paused WHERE source = '{source}')
+            BEGIN
+                INSERT INTO change_log (source, item_id, operation)
+                VALUES ('{source}', {row}.{column}, '{operation if owns_items else 'update'}');
+            END""")
+    conn.commit()
+
+
+def change_log_exists(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log_paused'"
+    ).fetchone() is not None
+
+
+def resume_change_log(conn, source, pid):
+    """End a pause, logging one 'reset' entry for the rows it did not log"""
+    with conn:
+        conn.execute("DELETE FROM change_log_paused WHERE source = ? AND pid = ?", (source, pid))
+        conn.execute("INSERT INTO change_log (source, item_id, operation) VALUES (?, NULL, 'reset')",
+                     (source,))
+
+
+@contextmanager
+def paused_change_log(conn, source):
+    """Log one 'reset' entry for source instead of an entry per row written.
+
+    For bulk maintenance (backfills, rescoring) that would otherwise fill
+    the feed with per-row updates. The pause covers writes from every
+    connection; readers reload the source when they see the reset. A
+    pause left by a process that died is ended by the next ChangeFeed
+    ingest. Does nothing on a database without a change log.
+    """
+    if not change_log_exists(conn):
+        yield
+        return
+    pid = os.getpid()
+    with conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO change_log_paused (source, pid, paused_at)
+            VALUES (?, ?, strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+        """, (source, pid))
+    try:
+        yield
+    except BaseException:
+        # Not committed along with the resume below
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        resume_change_log(conn, source, pid)
+
+
+def resume_abandoned_pauses(conn):
+    """End pauses whose process no longer runs"""
+    for source, pid in conn.execute("SELECT source, pid FROM change_log_paused").fetchall():
+        if not psutil.pid_exists(pid):
+            logger.warning(f"Ending change log pause of {source} left by exited process {pid}")
+            resume_change_log(conn, source, pid)
+
+
+class ChangeFeed:
+    """One change sequence over evidence, custody and email writes.
+
+    evidence.db's change_log is the feed. emails.db is a separate file
+    that its triggers cannot reach, so its own change_log is copied into
+    the feed (in seq order, under the feed's sequence) whenever the feed
+    is read; change_feed_state remembers how far it was copied.
+    """
+
+    def __init__(self, evidence_db=EVIDENCE_DB, email_db=EMAIL_DB):
+        self.evidence_conn = sqlite3.connect(evidence_db, timeout=30)
+        self.email_conn = sqlite3.connect(email_db, timeout=30)
+        setup_change_log(self.evidence_conn, EVIDENCE_LOGGED_TABLES)
+        setup_change_log(self.email_conn, EMAIL_LOGGED_TABLES)
+        self.evidence_conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_feed_state (
+            source TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL
+        )""")
+        self.evidence_conn.commit()
+
+    def _copied_seq(self):
+        row = self.evidence_conn.execute(
+            "SELECT last_seq FROM change_feed_state WHERE source = 'email'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def ingest(self):
+        """Copy new emails.db log entries into the feed and prune it; returns how many"""
+        conn = self.evidence_conn
+        resume_abandoned_pauses(conn)
+        resume_abandoned_pauses(self.email_conn)
+        # Only take the write lock when there is something to do
+        pending = self.email_conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM change_log"
+        ).fetchone()[0] > self._copied_seq()
+        oldest, newest = conn.execute("SELECT MIN(seq), MAX(seq) FROM change_log").fetchone()
+        # Pruned in batches rather than on every write
+        overfull = oldest is not None and newest - oldest >= CHANGE_LOG_RETENTION + CHANGE_PAGE_LIMIT
+        if not pending and not overfull:
+            return 0
+
+        # IMMEDIATE: concurrent readers must not copy the same entries twice
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            entries = self.email_conn.execute("""
+                SELECT seq, source, item_id, operation, changed_at FROM change_log
+                WHERE seq > ? ORDER BY seq
+            """, (self._copied_seq(),)).fetchall()
+            if entries:
+                conn.executemany("""
+                    INSERT INTO change_log (source, item_id, operation, changed_at)
+                    VALUES (?, ?, ?, ?)
+                """, [entry[1:] for entry in entries])
+                conn.execute("""
+                    INSERT OR REPLACE INTO change_feed_state (source, last_seq) VALUES ('email', ?)
+                """, (entries[-1][0],))
+            conn.execute("DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?",
+                         (CHANGE_LOG_RETENTION,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if entries:
+            # Copied entries are no longer needed in emails.db
+            self.email_conn.execute("DELETE FROM change_log WHERE seq <= ?", (entries[-1][0],))
+            self.email_conn.commit()
+        return len(entries)
+
+    def latest(self):
+        """The current sequence number; pass it as since to get later changes"""
+        self.ingest()
+        return self.evidence_conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+    def changes(self, since, limit=CHANGE_PAGE_LIMIT):
+        """Changes after since, at most one per item.
+
+        An item's entries merge into its newest one, except that an
+        insert followed by updates is still reported as an insert. A
+        'reset' change (id None) means a source was changed in bulk and
+        should be reloaded.
+
+        Returns seq (pass it as the next since), more (another page is
+        waiting), reset (entries after since were pruned, so the caller
+        must reload everything) and changes, oldest first.
+        """
+        self.ingest()
+        oldest = self.evidence_conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+        entries = self.evidence_conn.execute("""
+            SELECT seq, source, item_id, operation, changed_at FROM change_log
+            WHERE seq > ? ORDER BY seq LIMIT ?
+        """, (since, limit)).fetchall()
+        newest = {}
+        for seq, source, item_id, operation, changed_at in entries:
+            previous = newest.get((source, item_id))
+            if operation == 'update' and previous and previous['operation'] == 'insert':
+                operation = 'insert'
+            newest[(source, item_id)] = {
+                'seq': seq,
+                'source': source,
+                'id': item_id,
+                'operation': operation,
+                'changed_at': changed_at
+            }
+        return {
+            'seq': entries[-1][0] if entries else since,
+            'more': len(entries) == limit,
+            'reset': oldest is not None and since < oldest - 1,
+            'changes': sorted(newest.values(), key=lambda change: change['seq'])
+        }
+
+    def close(self):
+        self.evidence_conn.close()
+        self.email_conn.close()
@@ -0,0 +1,89 @@
+# Output field -> (SQL expression, joined table) for /api/evidence.
+# 'fm' is always present; 'fa' and 'im' are only joined when a selected
+# field or filter needs them.
+EVIDENCE_FIELDS = {
+    'id': ('fm.id', 'fm'),
+    'filename': ('fm.file_name', 'fm'),
+    'size': ('fm.file_size', 'fm'),
+    'hash': ('fm.hash_sha256', 'fm'),
+    'type': ('fa.file_type', 'fa'),
+    'mime': ('fa.mime_type', 'fa'),
+    'manipulation_score': ('fa.manipulation_confidence', 'fa'),
+    'width': ('im.width', 'im'),
+    'height': ('im.height', 'im'),
+    'format': ('im.format', 'im'),
+    'mode': ('im.mode', 'im'),
+    'dpi': ('im.dpi', 'im'),
+    'compression': ('im.compression', 'im'),
+    'image_size_mb': ('im.image_size_mb', 'im'),
+    'aspect_ratio': ('im.aspect_ratio', 'im'),
+    'color_depth': ('im.color_depth', 'im'),
+    'orientation': ('im.orientation', 'im'),
+    'exif_data': ('im.exif_data', 'im')
+}
+# Files analyzed more than once have several rows; only the latest is
+# joined, so every page holds one row per file and the cursor is exact
+EVIDENCE_JOINS = {
+    'fa': 'LEFT JOIN file_analysis fa ON fa.id = '
+          '(SELECT MAX(id) FROM file_analysis WHERE file_id = fm.id)',
+    'im': 'LEFT JOIN image_metadata im ON im.id = '
+          '(SELECT MAX(id) FROM image_metadata WHERE file_id = fm.id)'
+}
+EVIDENCE_DEFAULT_LIMIT = 100
+EVIDENCE_MAX_LIMIT = 1000
+
+def escape_like(value):
+    """Escape LIKE wildcards for use with ESCAPE '\\'"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def build_evidence_query(fields, cursor=None, limit=EVIDENCE_DEFAULT_LIMIT,
+                         mime=None, min_score=None, max_score=None, ids=None, file_id=None):
+    """Build the keyset-paginated evidence query (newest id first)"""
+    tables = {EVIDENCE_FIELDS[f][1] for f in fields}
+    where, params = [], []
+
+    if cursor is not None:
+        where.append('fm.id < ?')
+        params.append(cursor)
+    if file_id is not None:
+        where.append('fm.id = ?')
+        params.append(file_id)
+    if ids is not None:
+        where.append(f"fm.id IN ({', '.join('?' * len(ids))})")
+        params.extend(ids)
+    if mime:
+        tables.add('fa')
+        # Prefix match so 'image/' selects every image type
+        where.append("fa.mime_type LIKE ? ESCAPE '\\'")
+        params.append(escape_like(mime) + '%')
+    if min_score is not None:
+        tables.add('fa')
+        where.append('COALESCE(fa.manipulation_confidence, 0.0) >= ?')
+        params.append(min_score)
+    if max_score is not None:
+        tables.add('fa')
+        where.append('COALESCE(fa.manipulation_confidence, 0.0) <= ?')
+        params.append(max_score)
+
+    # Always select fm.id first so the cursor is available for any projection
+    columns = ['fm.id'] + [EVIDENCE_FIELDS[f][0] for f in fields]
+    query = f"SELECT {', '.join(columns)} FROM file_metadata fm"
+    for table in ('fa', 'im'):
+        if table in tables:
+            query += ' ' + EVIDENCE_JOINS[table]
+    if where:
+        query += ' WHERE ' + ' AND '.join(where)
+    query += ' ORDER BY fm.id DESC LIMIT ?'
+    params.append(limit)
+    return query, params
+
+def format_evidence_row(fields, row):
+    """Map a result row onto the evidence JSON shape"""
+    record = dict(zip(fields, row[1:]))
+    if 'type' in record:
+        record['type'] = record['type'] or 'Unknown'
+    if 'mime' in record:
+        record['mime'] = record['mime'] or 'Unknown'
+    if 'manipulation_score' in record:
+        record['manipulation_score'] = record['manipulation_score'] or 0.0
+    return record
@@ -0,0 +1,268 @@
+"""Compressed, region-indexed memory dump container.
+
+Layout::
+
+    header   MAGIC, version, chunk size
+    chunks   zlib streams, one per non-zero chunk of captured memory
+    index    zlib-compressed JSON: regions, skipped ranges, chunk table
+    trailer  index offset, index length, INDEX_MAGIC
+
+Captured memory is cut into chunk_size pieces aligned to the start of
+each run. All-zero pieces are recorded in the chunk table but not
+stored. Every other piece is compressed on its own, so any address can be
+read by decompressing only the chunks that cover it. The chunk table
+is sorted by virtual address and stored as packed records
+(CHUNK_RECORD) so it stays small for multi-GB dumps.
+"""
+import bisect
+import hashlib
+import json
+import struct
+import zlib
+
+MAGIC = b'FDMP'
+INDEX_MAGIC = b'FDMX'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHI')       # magic, version, flags, chunk size
+TRAILER = struct.Struct('<QQ4s')       # index offset, index length, magic
+# virtual address, file offset, stored length, memory length, flags
+CHUNK_RECORD = struct.Struct('<QQIIB')
+CHUNK_ZERO = 1
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+COMPRESSION_LEVEL = 1
+
+
+class DumpFormatError(Exception):
+    pass
+
+
+class DumpWriter:
+    """Write captured memory into the container, hashing as it goes.
+
+    Call add_region for each mapped region, write(address, data) for the
+    captured bytes in ascending address order, skip() for unreadable
+    ranges and close() to append the index. sha256 is the hash of the
+    captured memory; file_sha256 is the hash of the container file.
+    """
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE, compression_level=COMPRESSION_LEVEL):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.compression_level = compression_level
+        self.file = open(path, 'wb')
+        self.memory_hash = hashlib.sha256()
+        self.file_hash = hashlib.sha256()
+        self.offset = 0
+        self.zero_chunk = bytes(chunk_size)
+        self.regions = []
+        self.skipped = []
+        self.chunks = bytearray()
+        self.chunk_count = 0
+        self.captured = 0
+        self.stored = 0
+        # Data of the chunk being filled and the address it starts at
+        self.pending = bytearray()
+        self.pending_address = None
+        self._write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, chunk_size))
+
+    def _write(self, data):
+        self.file.write(data)
+        self.file_hash.update(data)
+        self.offset += len(data)
+
+    def add_region(self, start, end, perms, path):
+        self.flush_chunk()
+        self.regions.append({'start': start, 'end': end, 'perms': perms, 'path': path})
+
+    def skip(self, entry):
+        """Record an unreadable range (start, end, perms, path, reason)."""
+        self.flush_chunk()
+        self.skipped.append(entry)
+
+    def write(self, address, data):
+        """Append captured bytes that start at a virtual address."""
+        self.memory_hash.update(data)
+        self.captured += len(data)
+        view = memoryview(data)
+        if self.pending_address is not None and \
+                address != self.pending_address + len(self.pending):
+            # Not contiguous with the chunk being filled
+            self.flush_chunk()
+        while view:
+            if self.pending_address is None:
+                self.pending_address = address
+            take = min(self.chunk_size - len(self.pending), len(view))
+            if not self.pending and take == self.chunk_size:
+                # Whole chunk available: skip the copy into pending
+                self._store_chunk(address, view[:take])
+            else:
+                self.pending += view[:take]
+                if len(self.pending) == self.chunk_size:
+                    self.flush_chunk()
+            view = view[take:]
+            address += take
+
+    def flush_chunk(self):
+        if self.pending:
+            self._store_chunk(self.pending_address, self.pending)
+        self.pending = bytearray()
+        self.pending_address = None
+
+    def _store_chunk(self, address, data):
+        length = len(data)
+        # startswith compares with memcmp; == on a memoryview goes item by item
+        if self.zero_chunk.startswith(data):
+            record = CHUNK_RECORD.pack(address, 0, 0, length, CHUNK_ZERO)
+        else:
+            compressed = zlib.compress(data, self.compression_level)
+            record = CHUNK_RECORD.pack(address, self.offset, len(compressed), length, 0)
+            self._write(compressed)
+            self.stored += len(compressed)
+        self.chunks += record
+        self.chunk_count += 1
+        self.pending_address = None
+
+    def close(self):
+        """Append the index and trailer; returns the dump summary."""
+        self.flush_chunk()
+        index = {
+            'version': FORMAT_VERSION,
+            'chunk_size': self.chunk_size,
+            'memory_sha256': self.memory_hash.hexdigest(),
+            'captured': self.captured,
+            'regions': self.regions,
+            'skipped': self.skipped,
+            'chunks': self.chunks.hex()
+        }
+        data = zlib.compress(json.dumps(index).encode('utf-8'))
+        index_offset = self.offset
+        self._write(data)
+        self._write(TRAILER.pack(index_offset, len(data), INDEX_MAGIC))
+        self.file.close()
+        return {
+            'sha256': self.memory_hash.hexdigest(),
+            'file_sha256': self.file_hash.hexdigest(),
+            'captured': self.captured,
+            'size': self.offset,
+            'chunks': self.chunk_count,
+            'regions': len(self.regions),
+            'skipped': len(self.skipped)
+        }
+
+    def abort(self):
+        self.file.close()
+
+
+class DumpReader:
+    """Random access to a dump container through its footer index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self._read_index()
+        except Exception:
+            self.file.close()
+            raise
+        # Last decompressed chunk, for sequential small reads
+        self.cached = (None, None)
+
+    def _read_index(self):
+        header = self.file.read(HEADER.size)
+        if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise DumpFormatError(f"{self.path} is not a memory dump container")
+        _, version, _, self.chunk_size = HEADER.unpack(header)
+        if version > FORMAT_VERSION:
+            raise DumpFormatError(f"Unsupported dump format version {version}")
+        size = self.file.seek(0, 2)
+        if size < HEADER.size + TRAILER.size:
+            raise DumpFormatError(f"{self.path} has no index (capture interrupted?)")
+        self.file.seek(-TRAILER.size, 2)
+        index_offset, index_length, index_magic = TRAILER.unpack(self.file.read(TRAILER.size))
+        if index_magic != INDEX_MAGIC:
+            raise DumpFormatError(f"{self.path} has no index (capture interrupted?)")
+        self.file.seek(index_offset)
+        self.index = json.loads(zlib.decompress(self.file.read(index_length)))
+        chunks = bytes.fromhex(self.index.pop('chunks'))
+        self.chunks = [CHUNK_RECORD.unpack_from(chunks, i)
+                       for i in range(0, len(chunks), CHUNK_RECORD.size)]
+        self.addresses = [chunk[0] for chunk in self.chunks]
+
+    @property
+    def regions(self):
+        return self.index['regions']
+
+    @property
+    def skipped(self):
+        return self.index['skipped']
+
+    def summary(self):
+        return {
+            'version': self.index['version'],
+            'chunk_size': self.chunk_size,
+            'memory_sha256': self.index['memory_sha256'],
+            'captured': self.index['captured'],
+            'stored': sum(chunk[2] for chunk in self.chunks),
+            'chunks': len(self.chunks),
+            'zero_chunks': sum(1 for chunk in self.chunks if chunk[4] & CHUNK_ZERO),
+            'regions': len(self.index['regions']),
+            'skipped': len(self.index['skipped'])
+        }
+
+    def chunk_data(self, position):
+        """Return the memory held by chunk table entry position."""
+        if self.cached[0] == position:
+            return self.cached[1]
+        address, offset, stored, length, flags = self.chunks[position]
+        if flags & CHUNK_ZERO:
+            data = bytes(length)
+        else:
+            self.file.seek(offset)
+            data = zlib.decompress(self.file.read(stored))
+        self.cached = (position, data)
+        return data
+
+    def read(self, address, length):
+        """Return captured memory at [address, address + length).
+
+        Raises ValueError if any part of the range was not captured.
+        """
+        output = bytearray()
+        end = address + length
+        position = bisect.bisect_right(self.addresses, address) - 1
+        while address < end:
+            if position < 0 or position >= len(self.chunks):
+                raise ValueError(f"Address {address:#x} was not captured")
+            chunk_address, _, _, chunk_length, _ = self.chunks[position]
+            if not chunk_address <= address < chunk_address + chunk_length:
+                raise ValueError(f"Address {address:#x} was not captured")
+            data = self.chunk_data(position)
+            start = address - chunk_address
+            piece = data[start:start + (end - address)]
+            output += piece
+            address += len(piece)
+            position += 1
+        return bytes(output)
+
+    def iter_chunks(self):
+        """Yield (address, data) for every captured chunk in address order."""
+        for position in range(len(self.chunks)):
+            yield self.chunks[position][0], self.chunk_data(position)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_dump_container(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
@@ -5,13 +5,156 @@ import logging
 import json
 import time
 import hashlib
+import re
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from src.chain_of_custody.custody_manager import CustodyManager
+from src.memory_analysis.process_memory import ProcessMemoryReader, proc_memory_available
+from src.memory_analysis.process_sampler import get_sampler
+
+# Concurrent captures in a batch; reads and compression release the GIL
+CAPTURE_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+
+# file_metadata names of dumps recorded before memory_dumps existed
+LEGACY_DUMP_NAME = re.compile(r'memory_dump_(\d+)_(.+?)(?:_\d{8}_\d{6})?\.dmp')
+# Dump files written by capture_process_memory; sidecars add '.json'.
+# Names made before the microseconds were added end at the seconds.
+DUMP_FILE_NAME = re.compile(r'proc_(\d+)_(\d{8}_\d{6})(?:_\d{6})?\.dmp')
+
+
+def setup_memory_dump_tables(conn, dump_dir="dumps"):
+    """Create memory_dumps and its indexes, then index any unindexed dumps.
+
+    Each row shares its id with the dump's file_metadata row and carries
+    the process details of the capture, including the full sidecar JSON,
+    so listings and detail views never parse names or read sidecars.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS memory_dumps (
+        id INTEGER PRIMARY KEY,
+        pid INTEGER,
+        process_name TEXT,
+        exe TEXT,
+        captured TEXT,
+        dump_path TEXT,
+        dump_size INTEGER,
+        region_count INTEGER,
+        skipped_count INTEGER,
+        dump_sha256 TEXT,
+        info TEXT,
+        FOREIGN KEY (id) REFERENCES file_metadata(id)
+    )""")
+    for column in ('pid', 'process_name', 'captured', 'dump_size', 'region_count'):
+        conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_memory_dumps_{column}
+        ON memory_dumps ({column})""")
+    backfill_memory_dumps(conn, dump_dir)
+    conn.commit()
+
+
+def read_sidecar(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def backfill_memory_dumps(conn, dump_dir="dumps"):
+    """Index every dump memory_dumps does not know yet; safe to run repeatedly.
+
+    Dumps recorded in file_metadata before memory_dumps existed are
+    indexed under their file_metadata id, with process details from the
+    sidecar JSON in dump_dir when it is there (paths recorded on Windows
+    are matched by file name) and from the legacy file name otherwise.
+    Sidecars in dump_dir with no recorded dump get a file_metadata row as
+    a fresh capture would. Returns the number of rows added.
+    """
+    has_metadata = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'file_metadata'"
+    ).fetchone()
+    if not has_metadata:
+        return 0
+    added = backfill_recorded_dumps(conn, dump_dir) + backfill_sidecar_dumps(conn, dump_dir)
+    if added:
+        logging.getLogger(__name__).info(f"Indexed {added} existing memory dumps")
+    return added
+
+
+def backfill_recorded_dumps(conn, dump_dir):
+    rows = conn.execute("""
+        SELECT f.id, f.file_name, f.file_path, f.file_size, f.hash_sha256, f.last_modified
+        FROM file_metadata f LEFT JOIN memory_dumps m ON m.id = f.id
+        WHERE f.file_name LIKE 'memory_dump_%' AND m.id IS NULL
+    """).fetchall()
+    for file_id, file_name, file_path, file_size, file_hash, last_modified in rows:
+        info = {}
+        sidecar = os.path.join(dump_dir, os.path.basename((file_path or '').replace('\\', '/')) + '.json')
+        if os.path.exists(sidecar):
+            info = read_sidecar(sidecar)
+        match = LEGACY_DUMP_NAME.search(file_name or '')
+        if 'pid' not in info and match:
+            info['pid'] = int(match.group(1))
+        if 'name' not in info and match:
+            info['name'] = match.group(2)
+        insert_memory_dump(conn, file_id, file_path, info, last_modified,
+                           info.get('dump_size', file_size), info.get('dump_sha256', file_hash))
+    return len(rows)
+
+
+def backfill_sidecar_dumps(conn, dump_dir):
+    if not os.path.isdir(dump_dir):
+        return 0
+    indexed = {
+        os.path.basename((dump_path or '').replace('\\', '/'))
+        for dump_path, in conn.execute("SELECT dump_path FROM memory_dumps")
+    }
+    added = 0
+    for entry in sorted(os.scandir(dump_dir), key=lambda entry: entry.name):
+        dump_name = entry.name[:-len('.json')]
+        match = DUMP_FILE_NAME.fullmatch(dump_name)
+        if not entry.name.endswith('.json') or not match or dump_name in indexed:
+            continue
+        info = read_sidecar(entry.path)
+        info.setdefault('pid', int(match.group(1)))
+        dump_path = os.path.join(dump_dir, dump_name)
+        dump_size = info.get('dump_size')
+        if dump_size is None and os.path.exists(dump_path):
+            dump_size = os.path.getsize(dump_path)
+        captured = datetime.strptime(match.group(2), "%Y%m%d_%H%M%S").isoformat()
+        # file_path is unique: a dump recorded under another name keeps its row
+        row = conn.execute("SELECT id FROM file_metadata WHERE file_path = ?", (dump_path,)).fetchone()
+        if row:
+            dump_id = row[0]
+        else:
+            dump_id = conn.execute("""
+                INSERT INTO file_metadata (file_name, file_path, file_size, hash_sha256, last_modified)
+                VALUES (?, ?, ?, ?, ?)
+            """, (f"memory_dump_{info['pid']}_{info.get('name', 'unknown')}_{match.group(2)}.dmp",
+                  dump_path, dump_size, info.get('dump_sha256'), captured)).lastrowid
+        insert_memory_dump(conn, dump_id, dump_path, info, captured, dump_size,
+                           info.get('dump_sha256'))
+        added += 1
+    return added
+
+
+def insert_memory_dump(cursor, dump_id, dump_path, info, captured, dump_size, dump_sha256):
+    cursor.execute("""
+        INSERT OR REPLACE INTO memory_dumps
+        (id, pid, process_name, exe, captured, dump_path, dump_size, region_count,
+         skipped_count, dump_sha256, info)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (dump_id, info.get('pid'), info.get('name'), info.get('exe'), captured, dump_path,
+          dump_size, info.get('region_count'), info.get('skipped_count'), dump_sha256,
+          json.dumps(info, default=str)))
 
 
 class MemoryCapture:
-    def __init__(self, dump_dir="dumps"):
+    def __init__(self, dump_dir="dumps", db_path="src/database/evidence.db"):
         self.dump_dir = dump_dir
+        self.db_path = db_path
         self.setup_logging()
+        self.setup_database()
 
     def setup_logging(self):
         logging.basicConfig(
@@ -20,25 +163,37 @@ class MemoryCapture:
         )
         self.logger = logging.getLogger(__name__)
 
+    def setup_database(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            setup_memory_dump_tables(conn, self.dump_dir)
+        finally:
+            conn.close()
+
+    def reserve_dump_path(self, pid):
+        """Create an empty dump file under a name no other capture holds.
+
+        O_EXCL makes the name ours even when captures of one PID overlap,
+        so no capture ever overwrites an earlier dump or sidecar.
+        """
+        os.makedirs(self.dump_dir, exist_ok=True)
+        while True:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            dump_path = os.path.join(self.dump_dir, f"proc_{pid}_{timestamp}.dmp")
+            try:
+                os.close(os.open(dump_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return dump_path
+            except FileExistsError:
+                continue
+
     def capture_process_memory(self, pid):
         """Capture memory of a specific process with enhanced details"""
+        dump_path = None
         try:
             process = psutil.Process(pid)
             
-            # Initialize CPU measurement
-            process.cpu_percent()
-            
-            # Wait a short time to get accurate measurement
-            time.sleep(0.5)
-            
-            # Now get CPU percent with the second measurement
-            cpu_percent = process.cpu_percent()
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            dump_path = os.path.join(self.dump_dir, f"proc_{pid}_{timestamp}.dmp")
-            
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(dump_path), exist_ok=True)
+            # CPU over the shared sampler's last interval; no sleep per PID
+            cpu_percent = get_sampler().cpu_percent(pid) or 0.0
             
             # Enhanced process information
             info = {
@@ -74,6 +229,29 @@ class MemoryCapture:
             except (psutil.AccessDenied, AttributeError):
                 info['connections'] = "Access Denied"
             
+            dump_path = self.reserve_dump_path(pid)
+            # Acquire the memory itself where /proc exposes it (Linux)
+            if proc_memory_available(pid):
+                try:
+                    acquisition = ProcessMemoryReader(pid).dump(dump_path)
+                    # The region index lives in the dump's footer
+                    info['dump_format'] = 'fdmp'
+                    info['dump_sha256'] = acquisition['file_sha256']
+                    info['dump_size'] = acquisition['size']
+                    info['memory_sha256'] = acquisition['sha256']
+                    info['memory_captured'] = acquisition['captured']
+                    info['region_count'] = acquisition['regions']
+                    info['skipped_count'] = acquisition['skipped']
+                except OSError as e:
+                    # Typically ptrace restrictions or the process exiting
+                    self.logger.warning(f"Could not read memory of process {pid}: {str(e)}")
+                    info['dump_error'] = str(e)
+                    if os.path.exists(dump_path):
+                        os.remove(dump_path)
+            else:
+                # Only the sidecar is written; drop the reserved name
+                os.remove(dump_path)
+            
             # Save process information as JSON
             with open(f"{dump_path}.json", 'w') as f:
                 json.dump(info, f, indent=2, default=str)
@@ -83,111 +261,107 @@ class MemoryCapture:
                 
         except Exception as e:
             self.logger.error(f"Error capturing process memory: {str(e)}")
+            if dump_path and not os.path.exists(f"{dump_path}.json") and os.path.exists(dump_path):
+                os.remove(dump_path)
             return None, None
 
     def capture_process_with_custody(self, pid, handler, location, notes=None):
         """Capture process memory and record in chain of custody"""
+        result = self.capture_processes_with_custody([pid], handler, location, notes)[0]
+        return result['evidence_id'], result['path']
+
+    def capture_processes(self, pids, workers=CAPTURE_WORKERS):
+        """Capture several processes concurrently; returns [(pid, dump_path, info)] in pid order.
+
+        A PID listed more than once is captured once.
+        """
+        pids = list(dict.fromkeys(pids))
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pids) or 1))) as executor:
+            captures = list(executor.map(self.capture_process_memory, pids))
+        return [(pid,) + capture for pid, capture in zip(pids, captures)]
+
+    def capture_processes_with_custody(self, pids, handler, location, notes=None,
+                                       workers=CAPTURE_WORKERS):
+        """Capture many processes and record them in one transaction.
+
+        Memory is acquired concurrently; the file_metadata rows and the
+        custody acquisition records of every successful capture are then
+        written together, so the batch is recorded completely or not at
+        all. Returns one dict per PID with evidence_id, path and error.
+
+        If the transaction fails the dumps stay on disk as evidence: they
+        are returned with unindexed=True (and indexed from their sidecars
+        by the next setup_database).
+        """
+        captures = self.capture_processes(pids, workers)
+        results = []
+        custody = CustodyManager(self.db_path)
         try:
-            # Create memory dump
-            dump_path, info = self.capture_process_memory(pid)
-            
-            if dump_path and info:
-                # Create a file entry first to get a numeric ID
-                conn = sqlite3.connect("src/database/evidence.db")
-                cursor = conn.cursor()
-                
-                # Calculate file hash if possible
-                file_hash = ""
-                file_size = 0
-                if os.path.exists(dump_path):
-                    with open(dump_path, 'rb') as f:
-                        file_data = f.read()
-                        # Add timestamp to the hash to make it unique
-                        file_data += str(datetime.now().timestamp()).encode('utf-8')
-                        file_hash = hashlib.sha256(file_data).hexdigest()
-                    file_size = os.path.getsize(dump_path)
-                
-                # Generate a unique filename with timestamp
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"memory_dump_{pid}_{info['name']}_{timestamp}.dmp"
-                
-                # Insert into file_metadata
-                try:
-                    cursor.execute("""
-                        INSERT INTO file_metadata (file_name, file_path, file_size, hash_sha256, last_modified)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (
-                        filename,
-                        dump_path, 
-                        file_size,
-                        file_hash,
-                        datetime.now().isoformat()
-                    ))
-                    
-                    evidence_id = cursor.lastrowid
-                    conn.commit()
-                    
-                    # Import the custody manager
-                    from src.chain_of_custody.custody_manager import CustodyManager
-                    
-                    custody = CustodyManager()
-                    custody.log_action(
-                        evidence_id=evidence_id,
-                        evidence_type="memory_dump",
-                        action_type="acquisition",
-                        handler=handler,
-                        location=location,
-                        file_path=dump_path,
-                        notes=f"Memory capture of process {pid} ({info['name']}). {notes or ''}"
-                    )
-                    
-                    self.logger.info(f"Memory capture recorded in chain of custody: {evidence_id}")
-                    return evidence_id, dump_path
-                    
-                except sqlite3.IntegrityError as e:
-                    if "UNIQUE constraint failed" in str(e):
-                        # If we get a unique constraint error, create a new unique hash
-                        import random
-                        unique_suffix = f"{timestamp}_{random.randint(1000, 9999)}"
-                        file_hash = hashlib.sha256((file_hash + unique_suffix).encode('utf-8')).hexdigest()
-                        
-                        cursor.execute("""
-                            INSERT INTO file_metadata (file_name, file_path, file_size, hash_sha256, last_modified)
-                            VALUES (?, ?, ?, ?, ?)
-                        """, (
-                            filename,
-                            dump_path, 
-                            file_size,
-                            file_hash,
-                            datetime.now().isoformat()
-                        ))
-                        
-                        evidence_id = cursor.lastrowid
-                        conn.commit()
-                        
-                        # Import the custody manager
-                        from src.chain_of_custody.custody_manager import CustodyManager
-                        
-                        custody = CustodyManager()
-                        custody.log_action(
-                            evidence_id=evidence_id,
-                            evidence_type="memory_dump",
-                            action_type="acquisition",
-                            handler=handler,
-                            location=location,
-                            file_path=dump_path,
-                            notes=f"Memory capture of process {pid} ({info['name']}). {notes or ''}"
-                        )
-                        
-                        self.logger.info(f"Memory capture recorded in chain of custody (with unique hash): {evidence_id}")
-                        return evidence_id, dump_path
-                    else:
-                        raise
-                finally:
-                    conn.close()
+            with custody.conn:
+                cursor = custody.conn.cursor()
+                actions = []
+                for pid, dump_path, info in captures:
+                    if not (dump_path and info):
+                        results.append({'pid': pid, 'evidence_id': None, 'path': None,
+                                        'error': 'Failed to capture memory'})
+                        continue
+                    evidence_id = self._insert_dump_metadata(cursor, pid, dump_path, info)
+                    actions.append({
+                        'evidence_id': evidence_id,
+                        'evidence_type': "memory_dump",
+                        'action_type': "acquisition",
+                        'handler': handler,
+                        'location': location,
+                        'file_path': dump_path,
+                        'notes': f"Memory capture of process {pid} ({info['name']}). {notes or ''}",
+                        'file_hash': info.get('dump_sha256')
+                    })
+                    results.append({'pid': pid, 'evidence_id': evidence_id, 'path': dump_path,
+                                    'error': info.get('dump_error')})
+                custody.log_actions(actions, commit=False)
+            self.logger.info(f"Memory capture of {len(actions)}/{len(captures)} processes recorded in chain of custody")
+            return results
         except Exception as e:
             self.logger.error(f"Failed to record memory capture in chain of custody: {str(e)}")
-            return None, None
+            results = []
+            for pid, dump_path, info in captures:
+                if dump_path and info:
+                    self.logger.warning(f"Memory capture of process {pid} left unindexed at {dump_path}")
+                    results.append({'pid': pid, 'evidence_id': None, 'path': dump_path,
+                                    'unindexed': True,
+                                    'error': f"Captured but not recorded: {str(e)}"})
+                else:
+                    results.append({'pid': pid, 'evidence_id': None, 'path': None,
+                                    'error': 'Failed to capture memory'})
+            return results
+        finally:
+            custody.close()
+
+    def _insert_dump_metadata(self, cursor, pid, dump_path, info):
+        """Insert the file_metadata and memory_dumps rows of one dump; returns its id"""
+        # Use the hash computed while the dump was written; NULL (which
+        # UNIQUE allows repeatedly) when only the sidecar was written
+        file_hash = info.get('dump_sha256')
+        file_size = info.get('dump_size', 0)
+        # Named after the capture time in the dump's own file name
+        match = DUMP_FILE_NAME.fullmatch(os.path.basename(dump_path))
+        timestamp = match.group(2) if match else datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"memory_dump_{pid}_{info['name']}_{timestamp}.dmp"
+        if file_hash and cursor.execute(
+                "SELECT 1 FROM file_metadata WHERE hash_sha256 = ?", (file_hash,)).fetchone():
+            # Same bytes as a recorded file: hash_sha256 is unique, so record
+            # an id derived from pid, capture time and hash instead;
+            # memory_dumps keeps the real hash
+            file_hash = hashlib.sha256(f"{pid}_{timestamp}_{file_hash}".encode('utf-8')).hexdigest()
+        captured = datetime.now().isoformat()
+        cursor.execute("""
+            INSERT INTO file_metadata (file_name, file_path, file_size, hash_sha256, last_modified)
+            VALUES (?, ?, ?, ?, ?)
+        """, (filename, dump_path, file_size, file_hash, captured))
+        dump_id = cursor.lastrowid
+        insert_memory_dump(cursor, dump_id, dump_path, info, captured, file_size,
+                           info.get('dump_sha256'))
+        return dump_id
 
     def get_system_memory_info(self):
         """Get system-wide memory statistics"""
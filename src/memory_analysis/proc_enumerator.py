@@ -0,0 +1,212 @@
+import os
+import sys
+import time
+from array import array
+
+try:
+    import pwd
+except ImportError:
+    # Not on Windows; /proc is not read there either
+    pwd = None
+
+PROC_ROOT = "/proc"
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# /proc/<pid>/stat fields after "pid (comm)", zero-based from the state field
+STAT_STATE = 0
+STAT_PPID = 1
+STAT_UTIME = 11
+STAT_STIME = 12
+STAT_THREADS = 17
+STAT_STARTTIME = 19
+STAT_VSIZE = 20
+STAT_RSS = 21
+
+# comm is truncated to 15 characters by the kernel
+COMM_LENGTH = 15
+
+# Windows "System Idle Process" and "System"; never listed
+HIDDEN_PIDS = (0, 4)
+
+_usernames = {}
+_boot_time = None
+
+
+def proc_fs_available():
+    return sys.platform.startswith('linux') and os.path.isdir(os.path.join(PROC_ROOT, 'self'))
+
+
+def boot_time():
+    """System boot time in seconds since the epoch (btime in /proc/stat)."""
+    global _boot_time
+    if _boot_time is None:
+        with open(os.path.join(PROC_ROOT, 'stat')) as f:
+            for line in f:
+                if line.startswith('btime'):
+                    _boot_time = float(line.split()[1])
+                    break
+    return _boot_time
+
+
+def username(uid):
+    """User name of a uid, cached; the uid itself if it has no passwd entry."""
+    if pwd is None:
+        return str(uid)
+    name = _usernames.get(uid)
+    if name is None:
+        try:
+            name = pwd.getpwuid(uid).pw_name
+        except KeyError:
+            name = str(uid)
+        _usernames[uid] = name
+    return name
+
+
+def read_proc_file(path, size=8192):
+    """Read a small /proc file with raw syscalls; None if the process is gone."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        return os.read(fd, size)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+
+def full_name(pid, comm):
+    """Untruncated process name from cmdline when comm hit the kernel limit."""
+    cmdline = read_proc_file(os.path.join(PROC_ROOT, str(pid), 'cmdline'))
+    if cmdline:
+        name = os.path.basename(cmdline.split(b'\x00', 1)[0].decode('utf-8', 'replace'))
+        if name.startswith(comm):
+            return name
+    return comm
+
+
+class ProcessTable:
+    """Columnar snapshot of every process: one array per attribute, indexed by row.
+
+    Built from /proc/<pid>/stat (state, parent, CPU ticks, threads, start
+    time, virtual size, resident pages) and /proc/<pid>/status (real
+    uid); statm is not read because stat already carries both sizes.
+    Each process costs two open/read/close calls and a handful of array
+    appends instead of psutil's per-attribute calls and objects.
+    """
+
+    def __init__(self):
+        self.pids = array('i')
+        self.ppids = array('i')
+        self.states = bytearray()
+        self.cpu_ticks = array('Q')
+        self.start_ticks = array('Q')
+        self.threads = array('i')
+        self.vms = array('Q')
+        self.rss = array('Q')
+        self.uids = array('i')
+        self.names = []
+        self.monotonic = None
+        self._rows = None
+
+    def __len__(self):
+        return len(self.pids)
+
+    @property
+    def rows(self):
+        """pid -> row number"""
+        if self._rows is None:
+            self._rows = {pid: row for row, pid in enumerate(self.pids)}
+        return self._rows
+
+    def add(self, pid, stat, status):
+        # comm may itself contain spaces and parentheses
+        comm_start = stat.index(b'(')
+        comm_end = stat.rindex(b')')
+        fields = stat[comm_end + 2:].split()
+        uid = -1
+        uid_start = status.find(b'\nUid:')
+        if uid_start != -1:
+            uid = int(status[uid_start + 5:status.index(b'\n', uid_start + 1)].split()[0])
+
+        name = stat[comm_start + 1:comm_end].decode('utf-8', 'replace')
+        if len(name) >= COMM_LENGTH:
+            name = full_name(pid, name)
+
+        self.pids.append(pid)
+        self.ppids.append(int(fields[STAT_PPID]))
+        self.states.append(fields[STAT_STATE][0])
+        self.cpu_ticks.append(int(fields[STAT_UTIME]) + int(fields[STAT_STIME]))
+        self.start_ticks.append(int(fields[STAT_STARTTIME]))
+        self.threads.append(int(fields[STAT_THREADS]))
+        self.vms.append(int(fields[STAT_VSIZE]))
+        self.rss.append(int(fields[STAT_RSS]) * PAGE_SIZE)
+        self.uids.append(uid)
+        self.names.append(name)
+
+    def cpu_time(self, row):
+        """User plus system CPU seconds of a row"""
+        return self.cpu_ticks[row] / CLOCK_TICKS
+
+    def create_time(self, row):
+        """Start time of a row in seconds since the epoch, as psutil reports it"""
+        return boot_time() + self.start_ticks[row] / CLOCK_TICKS
+
+    def cpu_percent_since(self, previous):
+        """CPU percent of every row since an earlier table (100 = one core).
+
+        Rows are matched on pid and start time, so a reused PID counts
+        from zero instead of producing a bogus delta.
+        """
+        percents = array('f', bytes(4 * len(self)))
+        if previous is None:
+            return percents
+        elapsed_ticks = (self.monotonic - previous.monotonic) * CLOCK_TICKS
+        if elapsed_ticks <= 0:
+            return percents
+        previous_rows = previous.rows
+        for row, pid in enumerate(self.pids):
+            old = previous_rows.get(pid)
+            if old is not None and previous.start_ticks[old] == self.start_ticks[row]:
+                delta = self.cpu_ticks[row] - previous.cpu_ticks[old]
+                if delta > 0:
+                    percents[row] = delta / elapsed_ticks * 100
+        return percents
+
+    def processes(self, sort_by_memory=True, cpu_percent=None):
+        """Return rows in ProcessAnalyzer.get_running_processes' shape."""
+        processes = []
+        for row, pid in enumerate(self.pids):
+            if pid in HIDDEN_PIDS:
+                continue
+            processes.append({
+                'pid': pid,
+                'name': self.names[row],
+                'username': username(self.uids[row]) if self.uids[row] >= 0 else None,
+                'memory_usage': self.rss[row] // 1024 // 1024,  # MB
+                'cpu_percent': round(cpu_percent[row], 1) if cpu_percent is not None else 0.0
+            })
+        if sort_by_memory:
+            processes.sort(key=lambda x: x['memory_usage'], reverse=True)
+        return processes
+
+
+def read_process_table():
+    """Read every process from /proc into a ProcessTable.
+
+    Processes that exit while the table is read are left out.
+    """
+    table = ProcessTable()
+    table.monotonic = time.monotonic()
+    for entry in os.listdir(PROC_ROOT):
+        if not entry.isdigit():
+            continue
+        base = os.path.join(PROC_ROOT, entry)
+        stat = read_proc_file(base + '/stat')
+        status = read_proc_file(base + '/status')
+        if not stat or not status:
+            continue
+        table.add(int(entry), stat, status)
+    return table
@@ -2,11 +2,13 @@ import psutil
 import json
 from datetime import datetime
 import logging
-import time
+from src.memory_analysis.process_sampler import get_sampler
 
 class ProcessAnalyzer:
-    def __init__(self):
+    def __init__(self, sampler=None):
         self.processes = {}
+        # Shared background sampler; listings never block on psutil
+        self.sampler = sampler or get_sampler()
         self.setup_logging()
         self.process_categories = {
             'system': ['System', 'Registry', 'smss.exe', 'csrss.exe'],
@@ -22,44 +24,12 @@ class ProcessAnalyzer:
         self.logger = logging.getLogger(__name__)
 
     def get_running_processes(self, sort_by_memory=True):
-        """Get list of running processes with details"""
-        processes = []
-        
-        # First pass to initialize CPU monitoring
-        process_list = list(psutil.process_iter(['pid', 'name', 'username', 'memory_info']))
-        for proc in process_list:
-            try:
-                proc.cpu_percent(interval=0)  # Initialize CPU monitoring
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
-        
-        # Brief pause to collect CPU data
-        time.sleep(0.1)
-        
-        # Second pass to get actual values
-        for proc in process_list:
-            try:
-                # Skip system processes
-                if proc.info['pid'] == 0 or proc.info['pid'] == 4:
-                    continue
-                
-                # Get CPU percent (initialized in first pass)
-                cpu_percent = proc.cpu_percent(interval=0)
-                
-                processes.append({
-                    'pid': proc.info['pid'],
-                    'name': proc.info['name'],
-                    'username': proc.info['username'],
-                    'memory_usage': proc.info['memory_info'].rss // 1024 // 1024,  # MB
-                    'cpu_percent': round(cpu_percent, 1) if cpu_percent is not None else 0.0
-                })
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
+        """Get list of running processes with details.
 
-        if sort_by_memory:
-            processes.sort(key=lambda x: x['memory_usage'], reverse=True)
-            
-        return processes
+        Served from the sampler's latest snapshot; CPU percent covers the
+        last sample interval.
+        """
+        return self.sampler.processes(sort_by_memory)
 
     def analyze_process(self, pid):
         """Analyze specific process"""
@@ -72,7 +42,7 @@ class ProcessAnalyzer:
                 'name': proc.name(),
                 'status': proc.status(),
                 'created_time': datetime.fromtimestamp(proc.create_time()).isoformat(),
-                'cpu_percent': proc.cpu_percent(),
+                'cpu_percent': self.sampler.cpu_percent(pid) or 0.0,
                 'memory_usage': proc.memory_info().rss // 1024 // 1024,  # MB
             }
             
@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+
+import psutil
+
+from src.memory_analysis.proc_enumerator import (
+    HIDDEN_PIDS, proc_fs_available, read_process_table, username
+)
+
+# Seconds between samples and number of samples kept
+SAMPLE_INTERVAL = 5.0
+SAMPLE_HISTORY = 12
+
+SAMPLE_ATTRS = ['pid', 'name', 'username', 'memory_info', 'cpu_times', 'create_time']
+
+ProcessRow = namedtuple('ProcessRow', 'pid name username rss cpu_time create_time cpu_percent')
+ProcessSnapshot = namedtuple('ProcessSnapshot', 'timestamp monotonic rows')
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessSampler:
+    """Sample every process on a background thread into a ring buffer.
+
+    One pass per interval collects name, user, RSS and CPU times, read
+    straight from /proc on Linux (see proc_enumerator) and through
+    psutil.process_iter elsewhere. CPU percent is the CPU time consumed between two consecutive
+    samples divided by the wall time between them (100 = one full core,
+    as psutil reports it), so no caller ever sleeps to measure CPU. The
+    last `history` snapshots are kept; readers get the newest one without
+    touching psutil.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, history=SAMPLE_HISTORY):
+        self.interval = interval
+        self.samples = deque(maxlen=history)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.use_proc = proc_fs_available()
+        self.previous_table = None
+
+    def start(self):
+        """Take the first sample synchronously, then sample in the background."""
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.stop_event.clear()
+            self.sample()
+            self.thread = threading.Thread(target=self._run, name='process-sampler', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        # Take the second sample early so CPU figures exist within a second
+        wait = min(self.interval, 1.0)
+        while not self.stop_event.wait(wait):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Process sampling failed: {str(e)}")
+            wait = self.interval
+
+    def sample(self):
+        """Collect one snapshot and append it to the ring buffer."""
+        if self.use_proc:
+            snapshot = self._sample_proc()
+        else:
+            snapshot = self._sample_psutil()
+        self.samples.append(snapshot)
+        return snapshot
+
+    def _sample_proc(self):
+        table = read_process_table()
+        percents = table.cpu_percent_since(self.previous_table)
+        self.previous_table = table
+        rows = {}
+        for row, pid in enumerate(table.pids):
+            uid = table.uids[row]
+            rows[pid] = ProcessRow(
+                pid, table.names[row], username(uid) if uid >= 0 else None, table.rss[row],
+                table.cpu_time(row), table.create_time(row), percents[row]
+            )
+        return ProcessSnapshot(datetime.now().isoformat(), table.monotonic, rows)
+
+    def _sample_psutil(self):
+        previous = self.samples[-1] if self.samples else None
+        now = time.monotonic()
+        rows = {}
+        for proc in psutil.process_iter(SAMPLE_ATTRS):
+            info = proc.info
+            memory = info['memory_info']
+            times = info['cpu_times']
+            cpu_time = times.user + times.system if times else None
+            cpu_percent = 0.0
+            if previous and cpu_time is not None:
+                old = previous.rows.get(info['pid'])
+                # Same PID and start time, so not a reused PID
+                if old and old.create_time == info['create_time'] and old.cpu_time is not None:
+                    elapsed = now - previous.monotonic
+                    if elapsed > 0:
+                        cpu_percent = max(0.0, (cpu_time - old.cpu_time) / elapsed * 100)
+            rows[info['pid']] = ProcessRow(
+                info['pid'], info['name'], info['username'],
+                memory.rss if memory else 0, cpu_time, info['create_time'], cpu_percent
+            )
+        return ProcessSnapshot(datetime.now().isoformat(), now, rows)
+
+    def latest(self):
+        """Return the newest snapshot, starting the sampler on first use."""
+        if not self.samples:
+            self.start()
+        return self.samples[-1]
+
+    def cpu_percent(self, pid):
+        """CPU percent of pid over the last sample interval, or None if unknown."""
+        row = self.latest().rows.get(pid)
+        return row.cpu_percent if row else None
+
+    def processes(self, sort_by_memory=True):
+        """Return the newest snapshot in get_running_processes' shape."""
+        processes = [
+            {
+                'pid': row.pid,
+                'name': row.name,
+                'username': row.username,
+                'memory_usage': row.rss // 1024 // 1024,  # MB
+                'cpu_percent': round(row.cpu_percent, 1)
+            }
+            for row in self.latest().rows.values()
+            if row.pid not in HIDDEN_PIDS
+        ]
+        if sort_by_memory:
+            processes.sort(key=lambda x: x['memory_usage'], reverse=True)
+        return processes
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    """Return the process-wide sampler.
+
+    Sampling starts on the first read (see latest), not here, so holding
+    the sampler (as ProcessAnalyzer does at import) starts no thread.
+    """
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = ProcessSampler()
+        return _sampler
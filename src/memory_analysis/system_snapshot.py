@@ -0,0 +1,453 @@
+import glob
+import json
+import logging
+import os
+import re
+import socket
+import struct
+import sys
+import time
+import zlib
+from array import array
+from datetime import datetime
+from functools import lru_cache
+
+import psutil
+
+from src.memory_analysis.proc_enumerator import (
+    CLOCK_TICKS, PROC_ROOT, boot_time, proc_fs_available, read_process_table, username
+)
+
+SNAPSHOT_DIR = os.path.join("dumps", "snapshots")
+SNAPSHOT_MAGIC = b'FSNP'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".fsnp"
+SNAPSHOT_ID_PATTERN = re.compile(r'^\d{8}_\d{6}_\d{6}$')
+HEADER_LENGTH = struct.Struct('<I')
+
+# Open files outside these trees are recorded; device and pseudo files are not
+PSEUDO_FILE_PREFIXES = ('/dev/', '/proc/', '/sys/')
+
+# Thresholds for diff_snapshots' resource jumps
+RSS_JUMP_BYTES = 64 * 1024 * 1024
+RSS_JUMP_RATIO = 1.5
+THREAD_JUMP = 20
+FD_JUMP = 100
+CPU_JUMP_PERCENT = 50.0
+
+LISTEN_STATUS = 'LISTEN'
+UNKNOWN_PID = -1
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotFormatError(Exception):
+    pass
+
+
+class SystemSnapshot:
+    """Every process, connection and open file on the host at one moment.
+
+    Data is held column-wise: tables['processes'], tables['connections']
+    and tables['files'] map column names to arrays (numbers) or lists
+    (strings), all columns of a table having one entry per row. Rows of
+    the other tables point at processes by pid.
+    """
+
+    def __init__(self, meta=None, tables=None):
+        self.meta = meta or {}
+        self.tables = tables or {}
+
+    @property
+    def id(self):
+        return self.meta.get('id')
+
+    def rows(self, table):
+        """Iterate a table as dicts (for output, not for hot paths)"""
+        columns = self.tables[table]
+        names = list(columns)
+        for values in zip(*(columns[name] for name in names)):
+            yield dict(zip(names, values))
+
+    def save(self, path):
+        """Write the snapshot as zlib-compressed columns after a JSON header.
+
+        String columns are stored as indexes into one deduplicated,
+        NUL-separated string table.
+        """
+        strings = {}
+        blobs = []
+        offset = 0
+        layout = {}
+        for table, columns in self.tables.items():
+            layout[table] = []
+            for name, values in columns.items():
+                if isinstance(values, array):
+                    typecode = values.typecode
+                    data = values.tobytes()
+                else:
+                    typecode = 'str'
+                    data = array('I', [strings.setdefault(value or '', len(strings))
+                                       for value in values]).tobytes()
+                blob = zlib.compress(data, 1)
+                layout[table].append([name, typecode, len(values), offset, len(blob)])
+                blobs.append(blob)
+                offset += len(blob)
+        string_blob = zlib.compress('\x00'.join(strings).encode('utf-8'), 1)
+        header = json.dumps({
+            'version': SNAPSHOT_VERSION,
+            'byteorder': sys.byteorder,
+            'meta': self.meta,
+            'tables': layout,
+            'strings': [offset, len(string_blob)]
+        }).encode('utf-8')
+
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+            for blob in blobs:
+                f.write(blob)
+            f.write(string_blob)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:4] != SNAPSHOT_MAGIC:
+            raise SnapshotFormatError(f"{path} is not a system snapshot")
+        (length,) = HEADER_LENGTH.unpack_from(data, 4)
+        base = 4 + HEADER_LENGTH.size
+        header = json.loads(data[base:base + length])
+        if header['version'] > SNAPSHOT_VERSION:
+            raise SnapshotFormatError(f"Unsupported snapshot version {header['version']}")
+        base += length
+        string_offset, string_length = header['strings']
+        string_data = zlib.decompress(data[base + string_offset:base + string_offset + string_length])
+        strings = string_data.decode('utf-8').split('\x00') if string_data else ['']
+
+        tables = {}
+        for table, layout in header['tables'].items():
+            columns = tables[table] = {}
+            for name, typecode, count, offset, blob_length in layout:
+                raw = zlib.decompress(data[base + offset:base + offset + blob_length])
+                values = array('I' if typecode == 'str' else typecode)
+                values.frombytes(raw)
+                if header['byteorder'] != sys.byteorder:
+                    values.byteswap()
+                columns[name] = [strings[index] for index in values] if typecode == 'str' else values
+        return cls(header['meta'], tables)
+
+
+def empty_tables():
+    return {
+        'processes': {
+            'pid': array('i'), 'ppid': array('i'), 'name': [], 'username': [],
+            'start_time': array('d'), 'cpu_time': array('d'), 'rss': array('Q'),
+            'vms': array('Q'), 'threads': array('i'), 'fds': array('i')
+        },
+        'connections': {
+            'pid': array('i'), 'family': array('i'), 'type': array('i'), 'laddr': [],
+            'lport': array('i'), 'raddr': [], 'rport': array('i'), 'status': []
+        },
+        'files': {'pid': array('i'), 'path': []}
+    }
+
+
+def collect_processes_proc(tables):
+    """Fill the process and file tables from /proc (Linux)."""
+    processes = tables['processes']
+    files = tables['files']
+    table = read_process_table()
+    btime = boot_time()
+    for row, pid in enumerate(table.pids):
+        uid = table.uids[row]
+        processes['pid'].append(pid)
+        processes['ppid'].append(table.ppids[row])
+        processes['name'].append(table.names[row])
+        processes['username'].append(username(uid) if uid >= 0 else '')
+        processes['start_time'].append(btime + table.start_ticks[row] / CLOCK_TICKS)
+        processes['cpu_time'].append(table.cpu_ticks[row] / CLOCK_TICKS)
+        processes['rss'].append(table.rss[row])
+        processes['vms'].append(table.vms[row])
+        processes['threads'].append(table.threads[row])
+
+        fd_dir = f"{PROC_ROOT}/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            processes['fds'].append(-1)
+            continue
+        processes['fds'].append(len(fds))
+        for fd in fds:
+            try:
+                target = os.readlink(f"{fd_dir}/{fd}")
+            except OSError:
+                continue
+            if target.startswith('/') and not target.startswith(PSEUDO_FILE_PREFIXES):
+                files['pid'].append(pid)
+                files['path'].append(target)
+
+
+def collect_processes_psutil(tables):
+    """Fill the process and file tables through psutil (non-Linux)."""
+    processes = tables['processes']
+    files = tables['files']
+    attrs = ['pid', 'ppid', 'name', 'username', 'create_time', 'cpu_times', 'memory_info', 'num_threads']
+    for proc in psutil.process_iter(attrs):
+        info = proc.info
+        memory = info['memory_info']
+        times = info['cpu_times']
+        processes['pid'].append(info['pid'])
+        processes['ppid'].append(info['ppid'] or 0)
+        processes['name'].append(info['name'] or '')
+        processes['username'].append(info['username'] or '')
+        processes['start_time'].append(info['create_time'] or 0.0)
+        processes['cpu_time'].append(times.user + times.system if times else 0.0)
+        processes['rss'].append(memory.rss if memory else 0)
+        processes['vms'].append(memory.vms if memory else 0)
+        processes['threads'].append(info['num_threads'] or 0)
+        try:
+            open_files = proc.open_files()
+        except (psutil.AccessDenied, psutil.NoSuchProcess, psutil.ZombieProcess):
+            processes['fds'].append(-1)
+            continue
+        processes['fds'].append(len(open_files))
+        for open_file in open_files:
+            files['pid'].append(info['pid'])
+            files['path'].append(open_file.path)
+
+
+def collect_connections(tables):
+    """Fill the connection table with one system-wide net_connections call."""
+    connections = tables['connections']
+    try:
+        system_connections = psutil.net_connections(kind='inet')
+    except psutil.AccessDenied:
+        logger.warning("Not allowed to list system-wide connections")
+        return
+    for conn in system_connections:
+        connections['pid'].append(conn.pid if conn.pid is not None else UNKNOWN_PID)
+        connections['family'].append(int(conn.family))
+        connections['type'].append(int(conn.type))
+        connections['laddr'].append(conn.laddr.ip if conn.laddr else '')
+        connections['lport'].append(conn.laddr.port if conn.laddr else 0)
+        connections['raddr'].append(conn.raddr.ip if conn.raddr else '')
+        connections['rport'].append(conn.raddr.port if conn.raddr else 0)
+        connections['status'].append(conn.status or '')
+
+
+def capture_snapshot():
+    """Capture every process, connection and open file into a SystemSnapshot."""
+    started = time.perf_counter()
+    now = datetime.now()
+    tables = empty_tables()
+    if proc_fs_available():
+        collect_processes_proc(tables)
+    else:
+        collect_processes_psutil(tables)
+    collect_connections(tables)
+    meta = {
+        'id': now.strftime('%Y%m%d_%H%M%S_%f'),
+        'captured': now.isoformat(),
+        'timestamp': now.timestamp(),
+        'hostname': socket.gethostname(),
+        'processes': len(tables['processes']['pid']),
+        'connections': len(tables['connections']['pid']),
+        'files': len(tables['files']['pid']),
+        'capture_seconds': round(time.perf_counter() - started, 3)
+    }
+    return SystemSnapshot(meta, tables)
+
+
+def process_index(snapshot):
+    """(pid, start_time) -> row; start time tells a reused PID apart"""
+    processes = snapshot.tables['processes']
+    return {key: row for row, key in enumerate(zip(processes['pid'], processes['start_time']))}
+
+
+def process_summary(snapshot, row, names_by_pid):
+    processes = snapshot.tables['processes']
+    ppid = processes['ppid'][row]
+    return {
+        'pid': processes['pid'][row],
+        'name': processes['name'][row],
+        'username': processes['username'][row],
+        'ppid': ppid,
+        'parent_name': names_by_pid.get(ppid),
+        'started': datetime.fromtimestamp(processes['start_time'][row]).isoformat(),
+        'rss': processes['rss'][row],
+        'threads': processes['threads'][row]
+    }
+
+
+def listener_keys(snapshot):
+    """Listening endpoints: (family, type, address, port) -> process name"""
+    connections = snapshot.tables['connections']
+    names_by_pid = dict(zip(snapshot.tables['processes']['pid'], snapshot.tables['processes']['name']))
+    listeners = {}
+    for pid, family, kind, laddr, lport, raddr, status in zip(
+            connections['pid'], connections['family'], connections['type'], connections['laddr'],
+            connections['lport'], connections['raddr'], connections['status']):
+        # TCP sockets in LISTEN, and bound UDP sockets without a peer
+        if status == LISTEN_STATUS or (kind == socket.SOCK_DGRAM and not raddr and lport):
+            listeners[(family, kind, laddr, lport)] = (pid, names_by_pid.get(pid))
+    return listeners
+
+
+def remote_keys(snapshot):
+    """Remote endpoints in use: (address, port, pid) -> process name"""
+    connections = snapshot.tables['connections']
+    names_by_pid = dict(zip(snapshot.tables['processes']['pid'], snapshot.tables['processes']['name']))
+    return {
+        (raddr, rport, pid): names_by_pid.get(pid)
+        for pid, raddr, rport in zip(connections['pid'], connections['raddr'], connections['rport'])
+        if raddr
+    }
+
+
+def listener_entry(key, owner):
+    family, kind, address, port = key
+    return {
+        'protocol': 'udp' if kind == socket.SOCK_DGRAM else 'tcp',
+        'ipv6': family == socket.AF_INET6,
+        'address': address,
+        'port': port,
+        'pid': owner[0],
+        'process': owner[1]
+    }
+
+
+def diff_snapshots(old, new):
+    """Report what changed between two snapshots.
+
+    Processes are matched on (pid, start time). Returns new and exited
+    processes (with their parents), processes whose parent changed, new
+    and closed listeners, new remote endpoints and resource jumps (RSS,
+    threads, open descriptors and CPU use between the two captures).
+    """
+    started = time.perf_counter()
+    old_index = process_index(old)
+    new_index = process_index(new)
+    old_names = dict(zip(old.tables['processes']['pid'], old.tables['processes']['name']))
+    new_names = dict(zip(new.tables['processes']['pid'], new.tables['processes']['name']))
+    old_processes = old.tables['processes']
+    new_processes = new.tables['processes']
+    elapsed = new.meta['timestamp'] - old.meta['timestamp']
+
+    new_list = [process_summary(new, row, new_names)
+                for key, row in new_index.items() if key not in old_index]
+    exited_list = [process_summary(old, row, old_names)
+                   for key, row in old_index.items() if key not in new_index]
+
+    reparented = []
+    jumps = []
+    for key, row in new_index.items():
+        old_row = old_index.get(key)
+        if old_row is None:
+            continue
+        if old_processes['ppid'][old_row] != new_processes['ppid'][row]:
+            reparented.append({
+                'pid': key[0],
+                'name': new_processes['name'][row],
+                'old_ppid': old_processes['ppid'][old_row],
+                'new_ppid': new_processes['ppid'][row],
+                'new_parent_name': new_names.get(new_processes['ppid'][row])
+            })
+        changes = {}
+        old_rss = old_processes['rss'][old_row]
+        new_rss = new_processes['rss'][row]
+        if new_rss - old_rss >= RSS_JUMP_BYTES and new_rss >= old_rss * RSS_JUMP_RATIO:
+            changes['rss'] = [old_rss, new_rss]
+        if new_processes['threads'][row] - old_processes['threads'][old_row] >= THREAD_JUMP:
+            changes['threads'] = [old_processes['threads'][old_row], new_processes['threads'][row]]
+        old_fds = old_processes['fds'][old_row]
+        new_fds = new_processes['fds'][row]
+        if old_fds >= 0 and new_fds - old_fds >= FD_JUMP:
+            changes['fds'] = [old_fds, new_fds]
+        if elapsed > 0:
+            cpu_percent = (new_processes['cpu_time'][row] - old_processes['cpu_time'][old_row]) / elapsed * 100
+            if cpu_percent >= CPU_JUMP_PERCENT:
+                changes['cpu_percent'] = round(cpu_percent, 1)
+        if changes:
+            jumps.append({'pid': key[0], 'name': new_processes['name'][row], 'changes': changes})
+
+    old_listeners = listener_keys(old)
+    new_listeners = listener_keys(new)
+    old_remotes = remote_keys(old)
+    new_remotes = remote_keys(new)
+
+    result = {
+        'from': old.meta,
+        'to': new.meta,
+        'elapsed_seconds': round(elapsed, 3),
+        'new_processes': new_list,
+        'exited_processes': exited_list,
+        'reparented_processes': reparented,
+        'new_listeners': [listener_entry(key, owner) for key, owner in new_listeners.items()
+                          if key not in old_listeners],
+        'closed_listeners': [listener_entry(key, owner) for key, owner in old_listeners.items()
+                             if key not in new_listeners],
+        'new_remote_endpoints': [
+            {'address': key[0], 'port': key[1], 'pid': key[2], 'process': name}
+            for key, name in new_remotes.items() if key not in old_remotes
+        ],
+        'resource_jumps': jumps
+    }
+    result['summary'] = {
+        name: len(result[name]) for name in (
+            'new_processes', 'exited_processes', 'reparented_processes', 'new_listeners',
+            'closed_listeners', 'new_remote_endpoints', 'resource_jumps'
+        )
+    }
+    result['diff_seconds'] = round(time.perf_counter() - started, 4)
+    return result
+
+
+class SnapshotStore:
+    """Snapshot files under SNAPSHOT_DIR, named by snapshot id."""
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR):
+        self.snapshot_dir = snapshot_dir
+
+    def path(self, snapshot_id):
+        if not SNAPSHOT_ID_PATTERN.match(snapshot_id or ''):
+            return None
+        return os.path.join(self.snapshot_dir, f"snapshot_{snapshot_id}{SNAPSHOT_SUFFIX}")
+
+    def capture(self):
+        """Capture a snapshot, write it and return its metadata."""
+        snapshot = capture_snapshot()
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self.path(snapshot.id)
+        snapshot.save(path)
+        meta = dict(snapshot.meta, size=os.path.getsize(path))
+        logger.info(f"Snapshot {snapshot.id}: {meta['processes']} processes, "
+                    f"{meta['connections']} connections, {meta['files']} open files")
+        return meta
+
+    def list(self):
+        """Snapshot ids, newest first"""
+        pattern = os.path.join(self.snapshot_dir, f"snapshot_*{SNAPSHOT_SUFFIX}")
+        ids = [os.path.basename(path)[len('snapshot_'):-len(SNAPSHOT_SUFFIX)] for path in glob.glob(pattern)]
+        return sorted((snapshot_id for snapshot_id in ids if SNAPSHOT_ID_PATTERN.match(snapshot_id)),
+                      reverse=True)
+
+    def load(self, snapshot_id):
+        path = self.path(snapshot_id)
+        if not path or not os.path.exists(path):
+            return None
+        return load_snapshot(path, os.path.getmtime(path))
+
+    def diff(self, old_id, new_id):
+        old = self.load(old_id)
+        new = self.load(new_id)
+        if old is None or new is None:
+            return None
+        return diff_snapshots(old, new)
+
+
+@lru_cache(maxsize=8)
+def load_snapshot(path, mtime):
+    """Load a snapshot file; cached per path and modification time."""
+    return SystemSnapshot.load(path)
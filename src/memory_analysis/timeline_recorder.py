@@ -0,0 +1,333 @@
+import bisect
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime
+
+import psutil
+
+from src.memory_analysis.process_sampler import get_sampler
+
+TIMELINE_DIR = "dumps"
+TIMELINE_SUFFIX = ".tml"
+
+# Recorded metrics and the array typecode each one is stored in
+TIMELINE_METRICS = (
+    ('rss', 'Q'),
+    ('vms', 'Q'),
+    ('cpu_percent', 'f'),
+    ('threads', 'i'),
+    ('open_files', 'i'),
+    ('connections', 'i'),
+)
+# Stored for counts the process would not let us read
+UNAVAILABLE = -1
+
+MIN_INTERVAL = 0.5
+MAX_DURATION = 24 * 3600
+# Points returned by a view when the caller does not ask for a number
+DEFAULT_VIEW_POINTS = 300
+
+TIMELINE_ID_PATTERN = re.compile(r'^\d+_\d{8}_\d{6}_\d+$')
+# JSON header length, then the header, then every array's raw bytes
+HEADER_LENGTH = struct.Struct('<I')
+
+logger = logging.getLogger(__name__)
+
+
+def process_connections(proc):
+    """Connections of one process (net_connections from psutil 6)."""
+    method = getattr(proc, 'net_connections', None) or proc.connections
+    return method()
+
+
+class Timeline:
+    """Resource samples of one process, one array per metric.
+
+    Offsets are seconds since the recording started. A sample costs a
+    few bytes per metric instead of a JSON object, so long recordings at
+    short intervals stay small in memory and on disk.
+    """
+
+    def __init__(self, timeline_id, pid, name, interval, duration, started,
+                 status='recording'):
+        self.id = timeline_id
+        self.pid = pid
+        self.name = name
+        self.interval = interval
+        self.duration = duration
+        self.started = started
+        self.status = status
+        self.offsets = array('d')
+        self.series = {metric: array(typecode) for metric, typecode in TIMELINE_METRICS}
+        # Recording state, not saved
+        self.process = None
+        self.started_monotonic = None
+        self.last_cpu = None
+        self.finished = False
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def append(self, offset, values):
+        self.offsets.append(offset)
+        for metric, _ in TIMELINE_METRICS:
+            self.series[metric].append(values[metric])
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'pid': self.pid,
+            'name': self.name,
+            'interval': self.interval,
+            'duration': self.duration,
+            'started': self.started,
+            'status': self.status,
+            'samples': len(self)
+        }
+
+    def view(self, points=DEFAULT_VIEW_POINTS, start=None, end=None):
+        """Return samples in [start, end] seconds, downsampled to at most points.
+
+        Each returned point covers a bucket of consecutive samples and
+        carries the bucket's average, minimum and maximum per metric, so
+        short spikes survive downsampling. Unavailable counts are left
+        out of the aggregates (None when a whole bucket is unavailable).
+        """
+        first = 0 if start is None else bisect.bisect_left(self.offsets, start)
+        last = len(self.offsets) if end is None else bisect.bisect_right(self.offsets, end)
+        last = max(first, last)
+        count = last - first
+        points = max(1, points or count or 1)
+        bucket_size = max(1, -(-count // points))
+
+        view = {'offset': [], 'avg': {}, 'min': {}, 'max': {}}
+        for metric, _ in TIMELINE_METRICS:
+            view['avg'][metric] = []
+            view['min'][metric] = []
+            view['max'][metric] = []
+        for bucket_start in range(first, last, bucket_size):
+            bucket_end = min(bucket_start + bucket_size, last)
+            view['offset'].append(round(self.offsets[bucket_start], 3))
+            for metric, typecode in TIMELINE_METRICS:
+                values = self.series[metric][bucket_start:bucket_end]
+                if typecode == 'i':
+                    values = [value for value in values if value != UNAVAILABLE]
+                if values:
+                    view['avg'][metric].append(round(sum(values) / len(values), 2))
+                    view['min'][metric].append(round(min(values), 2))
+                    view['max'][metric].append(round(max(values), 2))
+                else:
+                    view['avg'][metric].append(None)
+                    view['min'][metric].append(None)
+                    view['max'][metric].append(None)
+        view['bucket_size'] = bucket_size
+        return view
+
+    def save(self, path):
+        header = self.summary()
+        header['byteorder'] = sys.byteorder
+        header['metrics'] = [metric for metric, _ in TIMELINE_METRICS]
+        data = json.dumps(header).encode('utf-8')
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(HEADER_LENGTH.pack(len(data)))
+            f.write(data)
+            self.offsets.tofile(f)
+            for metric, _ in TIMELINE_METRICS:
+                self.series[metric].tofile(f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            (length,) = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+            header = json.loads(f.read(length))
+            timeline = cls(header['id'], header['pid'], header['name'], header['interval'],
+                           header['duration'], header['started'], header['status'])
+            count = header['samples']
+            typecodes = dict(TIMELINE_METRICS)
+            for values in [timeline.offsets] + [timeline.series[metric] for metric in header['metrics']]:
+                values.fromfile(f, count)
+                if header['byteorder'] != sys.byteorder:
+                    values.byteswap()
+            for metric in set(typecodes) - set(header['metrics']):
+                timeline.series[metric] = array(typecodes[metric], [UNAVAILABLE] * count)
+        return timeline
+
+
+class TimelineRecorder:
+    """Record resource timelines for any number of processes on one thread.
+
+    Recordings sit in a heap keyed by their next due time; the recorder
+    thread sleeps until the earliest one is due, samples it and pushes it
+    back one interval later. Finished recordings are written to
+    TIMELINE_DIR and read back from there on request.
+    """
+
+    def __init__(self, timeline_dir=TIMELINE_DIR):
+        self.timeline_dir = timeline_dir
+        self.recording = {}
+        self.schedule = []
+        self.condition = threading.Condition()
+        self.thread = None
+        self.sequence = itertools.count(1)
+
+    def start(self, pid, duration=60, interval=5):
+        """Start recording pid; returns the timeline id.
+
+        Raises psutil.NoSuchProcess if the process does not exist.
+        """
+        interval = max(MIN_INTERVAL, float(interval))
+        duration = min(MAX_DURATION, max(interval, float(duration)))
+        process = psutil.Process(pid)
+        timeline_id = f"{pid}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{next(self.sequence)}"
+        timeline = Timeline(timeline_id, pid, process.name(), interval, duration,
+                            datetime.now().isoformat())
+        timeline.process = process
+        timeline.started_monotonic = time.monotonic()
+        with self.condition:
+            self.recording[timeline_id] = timeline
+            heapq.heappush(self.schedule, (timeline.started_monotonic, timeline_id))
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='timeline-recorder',
+                                               daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        logger.info(f"Recording timeline {timeline_id} of PID {pid} for {duration}s every {interval}s")
+        return timeline_id
+
+    def stop(self, timeline_id):
+        """Stop a recording early; what was collected is saved shortly after.
+
+        The recorder thread does the save, so it can never overlap a
+        sample being appended.
+        """
+        with self.condition:
+            timeline = self.recording.get(timeline_id)
+            if timeline is None or timeline.finished:
+                return False
+            timeline.status = 'stopped'
+            heapq.heappush(self.schedule, (time.monotonic(), timeline_id))
+            self.condition.notify()
+        return True
+
+    def get(self, timeline_id):
+        """Return a live or saved Timeline, or None."""
+        with self.condition:
+            timeline = self.recording.get(timeline_id)
+        if timeline is not None:
+            return timeline
+        path = self.timeline_path(timeline_id)
+        if path and os.path.exists(path):
+            return Timeline.load(path)
+        return None
+
+    def active(self):
+        with self.condition:
+            return [timeline.summary() for timeline in self.recording.values()]
+
+    def timeline_path(self, timeline_id):
+        if not TIMELINE_ID_PATTERN.match(timeline_id):
+            return None
+        return os.path.join(self.timeline_dir, f"timeline_{timeline_id}{TIMELINE_SUFFIX}")
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.schedule:
+                    self.condition.wait()
+                due, timeline_id = self.schedule[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    # Woken early when a new recording is scheduled
+                    self.condition.wait(delay)
+                    continue
+                heapq.heappop(self.schedule)
+                timeline = self.recording.get(timeline_id)
+            if timeline is None or timeline.finished:
+                continue
+            if timeline.status != 'recording':
+                # Stopped early
+                self._finish(timeline)
+                continue
+            try:
+                self._sample(timeline)
+            except psutil.NoSuchProcess:
+                timeline.status = 'exited'
+            except Exception as e:
+                logger.error(f"Timeline {timeline_id} sample failed: {str(e)}")
+            next_due = due + timeline.interval
+            if timeline.status == 'recording' and \
+                    next_due - timeline.started_monotonic <= timeline.duration:
+                with self.condition:
+                    heapq.heappush(self.schedule, (next_due, timeline_id))
+            else:
+                if timeline.status == 'recording':
+                    timeline.status = 'complete'
+                self._finish(timeline)
+
+    def _sample(self, timeline):
+        process = timeline.process
+        now = time.monotonic()
+        with process.oneshot():
+            memory = process.memory_info()
+            times = process.cpu_times()
+            threads = process.num_threads()
+        cpu_time = times.user + times.system
+        if timeline.last_cpu:
+            last_time, last_cpu_time = timeline.last_cpu
+            cpu_percent = max(0.0, (cpu_time - last_cpu_time) / (now - last_time) * 100)
+        else:
+            # No earlier sample yet: use the shared sampler's last interval
+            cpu_percent = get_sampler().cpu_percent(timeline.pid) or 0.0
+        timeline.last_cpu = (now, cpu_time)
+        try:
+            open_files = len(process.open_files())
+        except psutil.AccessDenied:
+            open_files = UNAVAILABLE
+        try:
+            connections = len(process_connections(process))
+        except psutil.AccessDenied:
+            connections = UNAVAILABLE
+        timeline.append(now - timeline.started_monotonic, {
+            'rss': memory.rss,
+            'vms': memory.vms,
+            'cpu_percent': cpu_percent,
+            'threads': threads,
+            'open_files': open_files,
+            'connections': connections
+        })
+
+    def _finish(self, timeline):
+        # Recorder thread only, so no sample is appended during the save
+        with self.condition:
+            if timeline.finished:
+                return
+            timeline.finished = True
+        os.makedirs(self.timeline_dir, exist_ok=True)
+        timeline.save(self.timeline_path(timeline.id))
+        with self.condition:
+            self.recording.pop(timeline.id, None)
+        logger.info(f"Timeline {timeline.id} {timeline.status} with {len(timeline)} samples")
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    """Return the process-wide timeline recorder."""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = TimelineRecorder()
+        return _recorder
@@ -0,0 +1,93 @@
+import base64
+import io
+
+from src.collectors.attachment_extractor import Base64Decoder, StreamingMimeWalker
+
+
+class ListSink:
+    def __init__(self, parts, headers):
+        self.parts = parts
+        self.headers = headers
+        self.data = b''
+
+    def write(self, data):
+        self.data += data
+
+    def close(self):
+        self.parts.append((self.headers.get_content_type(), self.headers.get_filename(), self.data))
+
+
+def walk(message, skip=()):
+    parts = []
+
+    def on_part(headers):
+        if headers.get_content_type() in skip:
+            return None
+        return ListSink(parts, headers)
+
+    StreamingMimeWalker(io.BytesIO(message)).walk(on_part)
+    return parts
+
+
+PAYLOAD = bytes(range(256)) * 3
+
+NESTED = b"""From: a@example.com
+Subject: nested
+MIME-Version: 1.0
+Content-Type: multipart/mixed; boundary="outer"
+
+preamble
+--outer
+Content-Type: multipart/alternative; boundary="inner"
+
+--inner
+Content-Type: text/plain
+
+plain body
+--inner
+Content-Type: text/html
+Content-Transfer-Encoding: quoted-printable
+
+<p>caf=C3=A9</p>
+--inner--
+--outer
+Content-Type: application/octet-stream; name="blob.bin"
+Content-Disposition: attachment; filename="blob.bin"
+Content-Transfer-Encoding: base64
+
+""" + base64.encodebytes(PAYLOAD) + b"""--outer--
+epilogue
+"""
+
+
+def test_nested_multipart_parts_are_decoded():
+    parts = walk(NESTED)
+    assert parts == [
+        ('text/plain', None, b'plain body'),
+        ('text/html', None, '<p>café</p>'.encode('utf-8')),
+        ('application/octet-stream', 'blob.bin', PAYLOAD),
+    ]
+
+
+def test_skipped_parts_are_not_decoded():
+    assert [part[0] for part in walk(NESTED, skip={'text/html'})] == [
+        'text/plain', 'application/octet-stream'
+    ]
+
+
+def test_crlf_line_endings():
+    parts = walk(NESTED.replace(b'\n', b'\r\n'))
+    assert parts[0] == ('text/plain', None, b'plain body')
+    assert parts[2][2] == PAYLOAD
+
+
+def test_single_part_message():
+    parts = walk(b"Content-Type: text/plain\n\nline one\nline two\n")
+    assert parts == [('text/plain', None, b'line one\nline two\n')]
+
+
+def test_base64_decoder_accepts_any_line_split():
+    encoded = base64.b64encode(PAYLOAD[:100])
+    decoder = Base64Decoder()
+    decoded = b''.join(decoder.decode(encoded[i:i + 7]) for i in range(0, len(encoded), 7))
+    assert decoded + decoder.finish() == PAYLOAD[:100]
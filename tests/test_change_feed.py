@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+
+from src.collectors.email_collector import migrate_email_database
+from src.database.change_feed import ChangeFeed, paused_change_log
+
+
+@pytest.fixture
+def paths(tmp_path):
+    evidence_db = str(tmp_path / 'evidence.db')
+    email_db = str(tmp_path / 'emails.db')
+    conn = sqlite3.connect(evidence_db)
+    conn.execute("""CREATE TABLE file_metadata (
+        id INTEGER PRIMARY KEY, file_name TEXT, file_size INTEGER, last_modified TEXT,
+        hash_sha256 TEXT, known_status TEXT, hash_set TEXT)""")
+    conn.close()
+    conn = sqlite3.connect(email_db)
+    migrate_email_database(conn)
+    conn.close()
+    return evidence_db, email_db
+
+
+@pytest.fixture
+def feed(paths):
+    feed = ChangeFeed(*paths)
+    yield feed
+    feed.close()
+
+
+def simple(changes):
+    return [(change['source'], change['id'], change['operation']) for change in changes['changes']]
+
+
+def test_changes_merge_per_item_and_keep_inserts(feed, paths):
+    since = feed.latest()
+    conn = sqlite3.connect(paths[0])
+    with conn:
+        conn.execute("INSERT INTO file_metadata (id, file_name) VALUES (1, 'a')")
+        conn.execute("INSERT INTO file_metadata (id, file_name) VALUES (2, 'b')")
+    with conn:
+        conn.execute("UPDATE file_metadata SET file_name = 'a2' WHERE id = 1")
+        conn.execute("DELETE FROM file_metadata WHERE id = 2")
+    conn.close()
+
+    changes = feed.changes(since)
+    assert simple(changes) == [('evidence', 1, 'insert'), ('evidence', 2, 'delete')]
+    assert not changes['more'] and not changes['reset']
+    assert feed.changes(changes['seq'])['changes'] == []
+
+
+def test_unlogged_columns_are_ignored(feed, paths):
+    conn = sqlite3.connect(paths[0])
+    with conn:
+        conn.execute("INSERT INTO file_metadata (id, file_name) VALUES (1, 'a')")
+    since = feed.latest()
+    with conn:
+        conn.execute("UPDATE file_metadata SET hash_sha256 = 'x' WHERE id = 1")
+    conn.close()
+    assert feed.changes(since)['changes'] == []
+
+
+def test_email_changes_are_copied_into_the_feed(feed, paths):
+    since = feed.latest()
+    conn = sqlite3.connect(paths[1])
+    with conn:
+        conn.execute("INSERT INTO email_metadata (message_id, subject) VALUES ('<1@x>', 'hi')")
+    conn.close()
+    assert simple(feed.changes(since)) == [('email', 1, 'insert')]
+    # Copied entries leave emails.db
+    conn = sqlite3.connect(paths[1])
+    assert conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0] == 0
+    conn.close()
+
+
+def test_paging(feed, paths):
+    since = feed.latest()
+    conn = sqlite3.connect(paths[0])
+    with conn:
+        conn.executemany("INSERT INTO file_metadata (id, file_name) VALUES (?, 'f')",
+                         [(i,) for i in range(1, 6)])
+    conn.close()
+    first = feed.changes(since, limit=3)
+    assert [change['id'] for change in first['changes']] == [1, 2, 3] and first['more']
+    second = feed.changes(first['seq'], limit=3)
+    assert [change['id'] for change in second['changes']] == [4, 5] and not second['more']
+
+
+def test_paused_log_records_one_reset(feed, paths):
+    since = feed.latest()
+    conn = sqlite3.connect(paths[0])
+    with paused_change_log(conn, 'evidence'):
+        with conn:
+            conn.executemany("INSERT INTO file_metadata (id, file_name) VALUES (?, 'f')",
+                             [(i,) for i in range(1, 50)])
+    conn.close()
+    assert simple(feed.changes(since)) == [('evidence', None, 'reset')]
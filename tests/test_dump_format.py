@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from src.memory_analysis.dump_format import (
+    DumpFormatError, DumpReader, DumpWriter, is_dump_container
+)
+
+CHUNK_SIZE = 4096
+
+
+@pytest.fixture
+def dump(tmp_path):
+    """A dump of two regions: one with data and a zero page, one partly unreadable."""
+    path = str(tmp_path / 'proc.dmp')
+    first = bytes(range(256)) * 20 + bytes(CHUNK_SIZE)
+    second = b'tail data' * 100
+    writer = DumpWriter(path, chunk_size=CHUNK_SIZE)
+    writer.add_region(0x10000, 0x10000 + len(first), 'r-xp', '/usr/bin/demo')
+    # Written in uneven pieces to exercise chunk filling
+    writer.write(0x10000, first[:1000])
+    writer.write(0x10000 + 1000, first[1000:])
+    writer.add_region(0x40000, 0x40000 + len(second) + 0x1000, 'rw-p', '[heap]')
+    writer.write(0x40000, second)
+    writer.skip((0x40000 + len(second), 0x40000 + len(second) + 0x1000, 'rw-p', '[heap]', 'EIO'))
+    summary = writer.close()
+    return path, summary, first, second
+
+
+def test_round_trip(dump):
+    path, summary, first, second = dump
+    assert is_dump_container(path)
+    assert summary['size'] == os.path.getsize(path)
+    assert summary['captured'] == len(first) + len(second)
+    with DumpReader(path) as reader:
+        assert reader.read(0x10000, len(first)) == first
+        assert reader.read(0x40000, len(second)) == second
+        # A read spanning a chunk boundary
+        assert reader.read(0x10000 + CHUNK_SIZE - 10, 20) == first[CHUNK_SIZE - 10:CHUNK_SIZE + 10]
+        assert [region['path'] for region in reader.regions] == ['/usr/bin/demo', '[heap]']
+        assert reader.skipped[0][4] == 'EIO'
+        info = reader.summary()
+        assert info['memory_sha256'] == summary['sha256']
+        assert info['zero_chunks'] == 1
+        assert b''.join(data for _, data in reader.iter_chunks()) == first + second
+
+
+def test_uncaptured_addresses_raise(dump):
+    path, _, first, second = dump
+    with DumpReader(path) as reader:
+        with pytest.raises(ValueError):
+            reader.read(0x0, 16)
+        with pytest.raises(ValueError):
+            reader.read(0x10000 + len(first) - 8, 16)
+        with pytest.raises(ValueError):
+            reader.read(0x40000 + len(second), 1)
+
+
+def test_interrupted_dump_is_rejected(tmp_path):
+    path = str(tmp_path / 'partial.dmp')
+    writer = DumpWriter(path, chunk_size=CHUNK_SIZE)
+    writer.write(0x1000, b'x' * CHUNK_SIZE)
+    writer.abort()
+    with pytest.raises(DumpFormatError):
+        DumpReader(path)
+
+
+def test_other_files_are_not_containers(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'MZ\x90\x00')
+    assert not is_dump_container(str(path))
+    with pytest.raises(DumpFormatError):
+        DumpReader(str(path))
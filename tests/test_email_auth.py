@@ -0,0 +1,80 @@
+from email.parser import HeaderParser
+
+from src.collectors.email_auth import (
+    NO_RESULT, analyze_auth_headers, parse_authentication_results, parse_dkim_signature,
+    parse_received_spf, split_header_value
+)
+
+
+def header_items(text):
+    return HeaderParser().parsestr(text).items()
+
+
+def test_split_header_value_drops_comments_and_keeps_quoted_separators():
+    value = 'mx.example.com; spf=pass (sender (nested) ok; really) smtp.mailfrom="a;b@example.com"'
+    assert split_header_value(value) == [
+        'mx.example.com',
+        'spf=pass  smtp.mailfrom="a;b@example.com"'
+    ]
+
+
+def test_parse_authentication_results_skips_authserv_id_and_versions():
+    results = parse_authentication_results(
+        'mx.example.com; dkim/1=PASS header.d=Example.org header.s=sel; '
+        'spf=fail smtp.mailfrom=bounce@example.net'
+    )
+    assert results == [
+        ('dkim', 'pass', {'header.d': 'Example.org', 'header.s': 'sel'}),
+        ('spf', 'fail', {'smtp.mailfrom': 'bounce@example.net'}),
+    ]
+
+
+def test_parse_received_spf():
+    value = 'Pass (mx.example.com: domain of a@example.org designates 1.2.3.4) ' \
+            'client-ip=1.2.3.4; envelope-from="a@Example.org"; helo=mail.example.org;'
+    assert parse_received_spf(value) == ('pass', 'example.org')
+    assert parse_received_spf('') == (None, None)
+
+
+def test_parse_dkim_signature():
+    value = 'v=1; a=rsa-sha256; d=Example.COM;\n s=selector1; bh=abc; b=de\n f'
+    assert parse_dkim_signature(value) == ('example.com', 'selector1')
+
+
+def test_topmost_authentication_results_wins():
+    headers = header_items(
+        'Authentication-Results: mx.example.com; spf=pass smtp.mailfrom=a@example.org;'
+        ' dkim=fail header.d=example.org; dmarc=pass header.from=example.org\n'
+        'Authentication-Results: relay.example.net; spf=fail smtp.mailfrom=a@example.org;'
+        ' dkim=pass header.d=example.org\n'
+        '\n'
+    )
+    assert analyze_auth_headers(headers) == (
+        1, 0, 1,
+        'pass', 'example.org', 'fail', 'example.org', 'pass', 'example.org'
+    )
+
+
+def test_any_passing_signature_in_one_header_counts():
+    headers = header_items(
+        'Authentication-Results: mx.example.com; dkim=fail header.d=bad.example;'
+        ' dkim=pass header.i=@good.example\n\n'
+    )
+    assert analyze_auth_headers(headers)[1] == 1
+    assert analyze_auth_headers(headers)[6] == 'good.example'
+
+
+def test_received_spf_and_signature_fill_gaps():
+    headers = header_items(
+        'Received-SPF: softfail (no designation) envelope-from=<x@spf.example>\n'
+        'DKIM-Signature: v=1; d=signer.example; s=s1; b=xyz\n\n'
+    )
+    assert analyze_auth_headers(headers) == (
+        0, 0, 0,
+        'softfail', 'spf.example', NO_RESULT, 'signer.example', NO_RESULT, None
+    )
+
+
+def test_body_text_cannot_produce_a_pass():
+    headers = header_items('Subject: spf=pass dkim=pass dmarc=pass\n\n')
+    assert analyze_auth_headers(headers)[:3] == (0, 0, 0)
@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+from src.collectors.email_collector import migrate_email_database
+from src.collectors.email_threads import (
+    delete_emails, get_copies, get_thread, index_thread_entries, reference_edges
+)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    migrate_email_database(conn)
+    yield conn
+    conn.close()
+
+
+def store(conn, message_id, date_sort, in_reply_to=None, references='', location=None):
+    conn.execute(
+        "INSERT INTO email_metadata (message_id, subject, date_sort) VALUES (?, ?, ?)",
+        (message_id, f"subject {message_id}", date_sort)
+    )
+    location = location or ('imap.example.com', 'user', 'INBOX', 1, date_sort[-1], None)
+    index_thread_entries(conn, [(message_id, in_reply_to, references, location)])
+
+
+def test_reference_edges_mark_the_parent():
+    assert reference_edges('c', 'b', 'a b') == [('c', 'a', 0, 0), ('c', 'b', 1, 1)]
+    # No In-Reply-To: the last reference is the parent
+    assert reference_edges('c', None, 'a b') == [('c', 'a', 0, 0), ('c', 'b', 1, 1)]
+    assert reference_edges('b', 'a', '') == [('b', 'a', 0, 1)]
+    assert reference_edges(None, 'a', 'a') == []
+
+
+def test_thread_walks_both_directions(conn):
+    store(conn, 'root', '2024-01-01T00:00:01')
+    store(conn, 'reply', '2024-01-01T00:00:02', 'root', 'root')
+    store(conn, 'reply2', '2024-01-01T00:00:03', 'reply', 'root reply')
+    store(conn, 'other', '2024-01-01T00:00:04')
+
+    for start in ('root', 'reply', 'reply2'):
+        rows = get_thread(conn, start, ('message_id',))
+        assert [row[0] for row in rows] == ['root', 'reply', 'reply2']
+    assert [row[0] for row in get_thread(conn, 'other', ('message_id',))] == ['other']
+
+
+def test_thread_survives_reference_cycles(conn):
+    store(conn, 'a', '2024-01-01T00:00:01', 'b', 'b')
+    store(conn, 'b', '2024-01-01T00:00:02', 'a', 'a')
+    assert [row[0] for row in get_thread(conn, 'a', ('message_id',))] == ['a', 'b']
+
+
+def test_thread_rows_count_copies(conn):
+    store(conn, 'root', '2024-01-01T00:00:01')
+    index_thread_entries(conn, [('root', None, '', ('imap.example.com', 'user', 'Archive', 1, 9, None))])
+    # message_id, copies
+    assert get_thread(conn, 'root', ('message_id',)) == [('root', 2)]
+    assert [copy[2] for copy in get_copies(conn, 'root')] == ['INBOX', 'Archive']
+
+
+def test_delete_emails_removes_copies_and_own_edges(conn):
+    store(conn, 'root', '2024-01-01T00:00:01')
+    store(conn, 'reply', '2024-01-01T00:00:02', 'root', 'root')
+    store(conn, 'reply2', '2024-01-01T00:00:03', 'reply', 'reply')
+    reply_id = conn.execute("SELECT id FROM email_metadata WHERE message_id = 'reply'").fetchone()[0]
+
+    assert delete_emails(conn, [reply_id]) == 1
+    assert get_copies(conn, 'reply') == []
+    assert conn.execute(
+        "SELECT message_id, referenced_id FROM email_references ORDER BY message_id"
+    ).fetchall() == [('reply2', 'reply')]
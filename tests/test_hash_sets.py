@@ -0,0 +1,88 @@
+import hashlib
+import sqlite3
+
+import pytest
+
+from src.collectors.hash_sets import (
+    KNOWN_BAD, KNOWN_GOOD, HashSetError, HashSetIndex, KnownFileFilter, build_index,
+    file_digests, iter_hash_list
+)
+
+
+def sha1(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_iter_hash_list_reads_plain_csv_and_nsrl_sqlite(tmp_path):
+    plain = tmp_path / 'plain.txt'
+    plain.write_text(f"{sha1(b'a').upper()}  a.exe\nnot a digest\n\n{sha1(b'b')}\n")
+    csv = tmp_path / 'NSRLFile.txt'
+    csv.write_text(f'"SHA-1","MD5","FileName"\n"{sha1(b"c")}","{hashlib.md5(b"c").hexdigest()}","c.dll"\n')
+    rds = tmp_path / 'rds.db'
+    conn = sqlite3.connect(rds)
+    conn.execute("CREATE TABLE FILE (sha1 TEXT, md5 TEXT)")
+    conn.execute("INSERT INTO FILE VALUES (?, ?)", (sha1(b'd'), None))
+    conn.commit()
+    conn.close()
+
+    assert list(iter_hash_list(str(plain), 'sha1')) == [sha1(b'a'), sha1(b'b')]
+    assert list(iter_hash_list(str(csv), 'sha1')) == [sha1(b'c')]
+    assert list(iter_hash_list(str(rds), 'sha1')) == [sha1(b'd')]
+
+
+def test_index_build_and_lookup(tmp_path):
+    digests = [sha256(str(i).encode()) for i in range(2000)]
+    source = tmp_path / 'set.txt'
+    # Duplicates are stored once
+    source.write_text('\n'.join(digests + digests[:10]) + '\n')
+    index_path = str(tmp_path / 'set.khsx')
+
+    assert build_index([str(source)], index_path, 'sha256') == 2000
+    index = HashSetIndex(index_path)
+    try:
+        assert len(index) == 2000
+        assert index.algorithm == 'sha256'
+        assert all(digest in index for digest in digests)
+        assert sha256(b'not in the set') not in index
+    finally:
+        index.close()
+
+
+def test_unsupported_algorithm_and_bad_index(tmp_path):
+    with pytest.raises(HashSetError):
+        build_index([], str(tmp_path / 'x.khsx'), 'crc32')
+    bad = tmp_path / 'bad.khsx'
+    bad.write_bytes(b'\0' * 64)
+    with pytest.raises(HashSetError):
+        HashSetIndex(str(bad))
+
+
+def test_known_bad_wins_over_known_good(tmp_path):
+    shared = tmp_path / 'shared.bin'
+    shared.write_bytes(b'in both sets')
+    good_only = tmp_path / 'good.bin'
+    good_only.write_bytes(b'only known good')
+    (tmp_path / 'good.txt').write_text(f"{sha256(b'in both sets')}\n{sha256(b'only known good')}\n")
+    (tmp_path / 'bad.txt').write_text(f"{sha1(b'in both sets')}\n")
+
+    known_files = KnownFileFilter(str(tmp_path / 'evidence.db'), str(tmp_path / 'indexes'))
+    try:
+        assert not known_files
+        known_files.add_hash_set('good', KNOWN_GOOD, [str(tmp_path / 'good.txt')])
+        known_files.add_hash_set('bad', KNOWN_BAD, [str(tmp_path / 'bad.txt')], 'sha1')
+        assert known_files.algorithms == ('sha256', 'sha1')
+
+        digests = file_digests(str(shared), known_files.algorithms)
+        assert known_files.lookup(digests) == (KNOWN_BAD, 'bad')
+        assert known_files.lookup(file_digests(str(good_only))) == (KNOWN_GOOD, 'good')
+        # Sets whose algorithm is missing from the digests are not consulted
+        assert known_files.lookup({'sha256': digests['sha256']}) == (KNOWN_GOOD, 'good')
+
+        known_files.remove_hash_set('good')
+        assert known_files.lookup(file_digests(str(good_only))) == (None, None)
+    finally:
+        known_files.close()
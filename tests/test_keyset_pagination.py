@@ -0,0 +1,128 @@
+import sqlite3
+
+import pytest
+
+from src.collectors.email_collector import get_email_page, migrate_email_database, parse_email_cursor
+from src.database.evidence_query import build_evidence_query, escape_like, format_evidence_row
+
+
+@pytest.fixture
+def email_conn():
+    conn = sqlite3.connect(':memory:')
+    migrate_email_database(conn)
+    # Ties on date_sort and undated ('') rows must page by id
+    dates = ['2024-01-03T00:00:00', '2024-01-02T00:00:00', '2024-01-02T00:00:00', '', '2024-01-01T00:00:00']
+    conn.executemany(
+        "INSERT INTO email_metadata (message_id, subject, date_sort) VALUES (?, ?, ?)",
+        [(f"<{i}@example.com>", f"subject {i}", date) for i, date in enumerate(dates)]
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def evidence_conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("""CREATE TABLE file_metadata (
+        id INTEGER PRIMARY KEY, file_name TEXT, file_size INTEGER, hash_sha256 TEXT)""")
+    conn.execute("""CREATE TABLE file_analysis (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, file_id INTEGER, file_type TEXT, mime_type TEXT, manipulation_confidence REAL)""")
+    conn.execute("""CREATE TABLE image_metadata (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, file_id INTEGER, width INTEGER, height INTEGER, format TEXT, mode TEXT, dpi TEXT,
+        compression TEXT, image_size_mb REAL, aspect_ratio REAL, color_depth INTEGER,
+        orientation TEXT, exif_data TEXT)""")
+    files = [
+        (1, 'a.png', 'image/png', 0.9),
+        (2, 'b.txt', 'text/plain', None),
+        (3, 'c.jpg', 'image/jpeg', 0.2),
+        (4, 'd.bin', 'image_x/raw', 0.5),
+        (5, 'e.jpg', 'image/jpeg', 0.7),
+    ]
+    for file_id, name, mime, score in files:
+        conn.execute("INSERT INTO file_metadata VALUES (?, ?, 10, ?)", (file_id, name, f"h{file_id}"))
+        conn.execute("""
+            INSERT INTO file_analysis (file_id, file_type, mime_type, manipulation_confidence)
+            VALUES (?, 'file', ?, ?)""", (file_id, mime, score))
+    yield conn
+    conn.close()
+
+
+def all_email_pages(conn, limit):
+    pages = []
+    cursor = None
+    while True:
+        rows, cursor = get_email_page(conn, limit, cursor, ('id', 'date_sort'))
+        pages.append([row[0] for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_email_pages_cover_every_row_once_newest_first(email_conn):
+    # Ties on date_sort go newest id first; undated rows come last
+    assert all_email_pages(email_conn, 2) == [[1, 3], [2, 5], [4]]
+    assert all_email_pages(email_conn, 5) == [[1, 3, 2, 5, 4], []]
+
+
+def test_email_cursor_parsing():
+    assert parse_email_cursor('2024-01-02T00:00:00|3') == ('2024-01-02T00:00:00', 3)
+    assert parse_email_cursor('|4') == ('', 4)
+    with pytest.raises(ValueError):
+        parse_email_cursor('not a cursor')
+
+
+def test_evidence_pages_newest_first(evidence_conn):
+    ids = []
+    cursor = None
+    while True:
+        query, params = build_evidence_query(['filename'], cursor=cursor, limit=2)
+        rows = evidence_conn.execute(query, params).fetchall()
+        ids.append([row[0] for row in rows])
+        if len(rows) < 2:
+            break
+        cursor = rows[-1][0]
+    assert ids == [[5, 4], [3, 2], [1]]
+
+
+def test_reanalyzed_file_appears_once_with_its_latest_analysis(evidence_conn):
+    evidence_conn.execute("""
+        INSERT INTO file_analysis (file_id, file_type, mime_type, manipulation_confidence)
+        VALUES (3, 'file', 'image/jpeg', 0.8)""")
+    pages = []
+    cursor = None
+    while True:
+        query, params = build_evidence_query(['manipulation_score'], cursor=cursor, limit=2)
+        rows = evidence_conn.execute(query, params).fetchall()
+        pages.append(rows)
+        if len(rows) < 2:
+            break
+        cursor = rows[-1][0]
+    assert pages == [[(5, 0.7), (4, 0.5)], [(3, 0.8), (2, None)], [(1, 0.9)]]
+
+
+def test_evidence_filters_and_projection(evidence_conn):
+    query, params = build_evidence_query(['filename', 'mime'], mime='image_', min_score=0.1)
+    rows = evidence_conn.execute(query, params).fetchall()
+    # '_' is literal, so image/ types do not match 'image_'
+    assert [format_evidence_row(['filename', 'mime'], row) for row in rows] == [
+        {'filename': 'd.bin', 'mime': 'image_x/raw'}
+    ]
+
+    query, params = build_evidence_query(['manipulation_score'], mime='image/', max_score=0.5)
+    assert evidence_conn.execute(query, params).fetchall() == [(3, 0.2)]
+
+    query, params = build_evidence_query(['filename', 'manipulation_score'], file_id=2)
+    row = evidence_conn.execute(query, params).fetchone()
+    assert format_evidence_row(['filename', 'manipulation_score'], row) == \
+        {'filename': 'b.txt', 'manipulation_score': 0.0}
+
+
+def test_only_needed_tables_are_joined():
+    query, _ = build_evidence_query(['filename', 'size'])
+    assert 'JOIN' not in query
+    query, _ = build_evidence_query(['width'])
+    assert 'image_metadata' in query and 'file_analysis' not in query
+
+
+def test_escape_like():
+    assert escape_like('50%_off\\') == '50\\%\\_off\\\\'
@@ -0,0 +1,49 @@
+import mmap
+
+from src.collectors.mailbox_importer import find_mbox_ranges, iter_mbox_messages
+
+MBOX = (
+    b"From alice@example.com Mon Jan  1 00:00:00 2024\n"
+    b"Message-ID: <1@example.com>\n"
+    b"Subject: one\n"
+    b"\n"
+    b">From the start of a line\n"
+    b">>From a quoted line\n"
+    b"not >From mid-line\n"
+    b"\n"
+    b"From bob@example.com Mon Jan  1 00:00:01 2024\n"
+    b"Message-ID: <2@example.com>\n"
+    b"Subject: two\n"
+    b"\n"
+    b"second body\n"
+)
+
+
+def read_messages(path):
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return [message for start, end in find_mbox_ranges(path, range_size=16)
+                for message in iter_mbox_messages(mm, start, end)]
+
+
+def test_mboxrd_from_lines_are_unescaped(tmp_path):
+    path = tmp_path / 'box.mbox'
+    path.write_bytes(MBOX)
+    messages = read_messages(str(path))
+
+    assert [offset for offset, _ in messages] == [0, MBOX.index(b'From bob')]
+    first = messages[0][1]
+    assert b"\nFrom the start of a line\n" in first
+    assert b"\n>From a quoted line\n" in first
+    assert b"\nnot >From mid-line\n" in first
+    # The blank line separating messages is not part of the first one
+    assert first.endswith(b"mid-line\n")
+    assert messages[1][1] == b"Message-ID: <2@example.com>\nSubject: two\n\nsecond body\n"
+
+
+def test_ranges_split_on_message_boundaries(tmp_path):
+    path = tmp_path / 'box.mbox'
+    path.write_bytes(MBOX * 3)
+    ranges = find_mbox_ranges(str(path), range_size=16)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(MBOX) * 3
+    assert all(MBOX[start % len(MBOX):].startswith(b'From ') for start, _ in ranges)
+    assert len(read_messages(str(path))) == 6
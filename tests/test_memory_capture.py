@@ -0,0 +1,40 @@
+import os
+import sqlite3
+
+import pytest
+
+from src.memory_analysis.memory_capture import DUMP_FILE_NAME, MemoryCapture
+
+
+@pytest.fixture
+def capture(tmp_path):
+    db_path = str(tmp_path / 'evidence.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute("""CREATE TABLE file_metadata (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, file_name TEXT, file_path TEXT UNIQUE,
+        file_size INTEGER, hash_sha256 TEXT UNIQUE, last_modified TEXT)""")
+    conn.commit()
+    conn.close()
+    return MemoryCapture(str(tmp_path / 'dumps'), db_path)
+
+
+def test_reserved_dump_names_are_unique(capture):
+    paths = {capture.reserve_dump_path(1234) for _ in range(50)}
+    assert len(paths) == 50
+    assert all(DUMP_FILE_NAME.fullmatch(os.path.basename(path)) for path in paths)
+
+
+def test_dump_names_with_and_without_microseconds_match():
+    assert DUMP_FILE_NAME.fullmatch('proc_42_20240101_120000.dmp').groups() == ('42', '20240101_120000')
+    assert DUMP_FILE_NAME.fullmatch('proc_42_20240101_120000_123456.dmp').groups() == ('42', '20240101_120000')
+
+
+def test_repeated_pids_are_captured_once(capture):
+    pid = os.getpid()
+    results = capture.capture_processes_with_custody([pid, pid], 'tester', 'localhost')
+    assert [result['pid'] for result in results] == [pid]
+    assert results[0]['evidence_id'] is not None
+    # A second capture within the same second gets its own files
+    again = capture.capture_processes_with_custody([pid], 'tester', 'localhost')
+    assert again[0]['path'] != results[0]['path']
+    assert os.path.exists(results[0]['path'] + '.json')
@@ -0,0 +1,28 @@
+import importlib
+import sys
+
+import pytest
+
+MODULE = 'src.memory_analysis.proc_enumerator'
+
+
+@pytest.fixture
+def without_pwd(monkeypatch):
+    """Import proc_enumerator as on a platform without pwd (Windows)."""
+    # Imported normally first so monkeypatch has it to put back afterwards
+    importlib.import_module(MODULE)
+    monkeypatch.setitem(sys.modules, 'pwd', None)
+    monkeypatch.delitem(sys.modules, MODULE)
+    return importlib.import_module(MODULE)
+
+
+def test_imports_without_pwd(without_pwd):
+    assert without_pwd.pwd is None
+    assert without_pwd.username(1000) == '1000'
+
+
+def test_username_falls_back_to_uid():
+    pytest.importorskip('pwd')
+    from src.memory_analysis.proc_enumerator import username
+    assert username(0) == 'root'
+    assert username(2 ** 31 - 2) == str(2 ** 31 - 2)
@@ -0,0 +1,73 @@
+import sqlite3
+
+import pytest
+
+from src.collectors.email_collector import get_email_count, migrate_email_database
+from src.dashboard.dashboard import EMAIL_SOURCE, FILE_SOURCE
+
+
+@pytest.fixture
+def connections():
+    email = sqlite3.connect(':memory:')
+    migrate_email_database(email)
+    evidence = sqlite3.connect(':memory:')
+    evidence.execute("CREATE TABLE file_metadata (id INTEGER PRIMARY KEY, file_name TEXT)")
+    evidence.executemany("INSERT INTO file_metadata (id, file_name) VALUES (?, ?)",
+                         [(i, f"{i}.txt") for i in (2, 4, 6, 8)])
+    yield {'email': email, 'evidence': evidence}
+    email.close()
+    evidence.close()
+
+
+def add_emails(conn, dates):
+    for date in dates:
+        conn.execute(
+            "INSERT INTO email_metadata (message_id, subject, date_sort) "
+            "VALUES ('<' || (SELECT COUNT(*) FROM email_metadata) || '@example.com>', 'subject', ?)",
+            (date,)
+        )
+    conn.commit()
+
+
+def test_merge_matches_reading_every_key(connections):
+    conn = connections['email']
+    add_emails(conn, ['2024-01-03', '2024-01-01', '', '2024-01-01'])
+    keys = EMAIL_SOURCE.keys(connections)
+    add_emails(conn, ['2024-01-02', '2024-01-05', '', '2024-01-01'])
+    conn.execute("DELETE FROM email_metadata WHERE id = 2")
+    conn.commit()
+
+    merged, first = EMAIL_SOURCE.merge_keys(connections, keys, 0, [5, 6, 7, 8], [2])
+
+    assert list(merged) == list(EMAIL_SOURCE.keys(connections))
+    assert first == 0
+    assert len(merged) == get_email_count(conn)
+    # The shown list is left for the Tk thread
+    assert list(keys) == [1, 4, 2, 3]
+
+
+def test_merge_keeps_top_row(connections):
+    keys = FILE_SOURCE.keys(connections)
+    connections['evidence'].executemany("INSERT INTO file_metadata (id) VALUES (?)", [(1,), (5,), (9,)])
+    connections['evidence'].execute("DELETE FROM file_metadata WHERE id = 2")
+
+    merged, first = FILE_SOURCE.merge_keys(connections, keys, 2, [1, 5, 9], [2])
+
+    assert list(merged) == [1, 4, 5, 6, 8, 9]
+    assert merged[first] == keys[2]
+
+
+def test_merge_skips_known_and_missing_keys(connections):
+    keys = FILE_SOURCE.keys(connections)
+    merged, first = FILE_SOURCE.merge_keys(connections, keys, 0, [4, 7], [])
+    assert list(merged) == [2, 4, 6, 8]
+
+
+def test_merge_reads_every_key_when_a_row_went(connections):
+    keys = FILE_SOURCE.keys(connections)
+    connections['evidence'].execute("INSERT INTO file_metadata (id) VALUES (5)")
+    connections['evidence'].execute("DELETE FROM file_metadata WHERE id IN (4, 6)")
+
+    merged, first = FILE_SOURCE.merge_keys(connections, keys, 0, [5], [])
+
+    assert list(merged) == [2, 5, 8]
@@ -15,17 +15,40 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from dotenv import load_dotenv
 from src.analyzers.enhanced_analyzer import EnhancedFileAnalyzer
 from src.collectors.email_collector import EmailMetadataExtractor
+from src.collectors.email_collector import (
+    EMAIL_LIST_COLUMNS, migrate_email_database, get_email_count, get_email_page
+)
+from src.collectors.email_coordinator import EmailCollectionCoordinator
+from src.collectors.email_auth import rescore_emails
+from src.collectors.email_threads import delete_emails, get_thread, get_copies
+from src.collectors.message_store import MessageStore
+from src.collectors.attachment_extractor import AttachmentExtractor
 from src.chain_of_custody.custody_manager import CustodyManager
 from src.collectors.file_collector import LocalFileExtractor
 from flask import Flask, render_template, url_for
 from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for, flash
+from flask import Response, stream_with_context
 from werkzeug.utils import secure_filename
+import psutil
+import itertools
+import threading
+import time
 import sqlite3
+import json
 from flask import request, jsonify
 
 # Add these imports
-from src.memory_analysis.memory_capture import MemoryCapture
+from src.memory_analysis.memory_capture import CAPTURE_WORKERS, MemoryCapture
+from src.memory_analysis.dump_format import DumpReader, is_dump_container
+from src.analyzers.ioc_extractor import IOCExtractor, setup_ioc_tables
 from src.memory_analysis.process_analyzer import ProcessAnalyzer
+from src.memory_analysis.timeline_recorder import DEFAULT_VIEW_POINTS, get_recorder
+from src.memory_analysis.system_snapshot import SnapshotStore
+from src.database.change_feed import CHANGE_PAGE_LIMIT, ChangeFeed, paused_change_log
+from src.database.evidence_query import (
+    EVIDENCE_DEFAULT_LIMIT, EVIDENCE_FIELDS, EVIDENCE_MAX_LIMIT, build_evidence_query,
+    format_evidence_row
+)
 from src.analyzers.ai_authenticator import AIAuthenticator
 from functools import wraps
 from web_app.auth.decorators import role_required  # Change to absolute import
@@ -57,6 +80,7 @@ EMAIL_CONFIG = {
 # Initialize analyzers
 mem_capture = MemoryCapture()
 proc_analyzer = ProcessAnalyzer()
+snapshot_store = SnapshotStore()
 
 # Add configuration
 UPLOAD_FOLDER = 'web_app/static/uploads'
@@ -169,7 +193,9 @@ def analyze_file():
                         im.mode,
                         im.exif_data,
                         im.is_animated,
-                        im.frames
+                        im.frames,
+                        fm.known_status,
+                        fm.hash_set
                     FROM file_metadata fm
                     LEFT JOIN file_analysis fa ON fm.id = fa.file_id
                     LEFT JOIN image_metadata im ON fm.id = im.file_id
@@ -198,7 +224,9 @@ def analyze_file():
                             'mode': result[12],
                             'metadata': result[13],
                             'is_animated': bool(result[14]),
-                            'frames': result[15] or 1
+                            'frames': result[15] or 1,
+                            'known_status': result[16],
+                            'hash_set': result[17]
                         }
                     })
                 
@@ -222,49 +250,58 @@ def analyze_file():
             custody_manager.close()
             custody_manager = None
 
+EMAIL_DB_PATH = 'src/database/emails.db'
+_email_db_migrated = False
+
+def get_email_db():
+    """Open emails.db, applying schema migrations once per process"""
+    global _email_db_migrated
+    conn = sqlite3.connect(EMAIL_DB_PATH)
+    if not _email_db_migrated:
+        migrate_email_database(conn)
+        _email_db_migrated = True
+    return conn
+
 #The new route to fetch the emails
 # Add this new route
 @app.route('/api/emails', methods=['GET'])
 def get_emails():
+    """Return one page of emails, newest first.
+
+    Pass the previous response's next_cursor as ?cursor= to get the next
+    page; pages are keyset-based so deep pages cost the same as the first.
+    """
+    conn = None
     try:
-        # Get pagination parameters
-        page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 10, type=int)
+        limit = max(1, min(limit, 500))
+        cursor_arg = request.args.get('cursor')
         
-        # Calculate offset
-        offset = (page - 1) * limit
-        
-        # Connect to database
-        conn = sqlite3.connect('src/database/emails.db')
-        conn.row_factory = sqlite3.Row  # This enables column access by name
-        cursor = conn.cursor()
-        
-        # Get total count
-        cursor.execute('SELECT COUNT(*) FROM email_metadata')
-        total_count = cursor.fetchone()[0]
+        conn = get_email_db()
         
-        # Get emails with pagination
-        cursor.execute('''
-            SELECT * FROM email_metadata 
-            ORDER BY date DESC
-            LIMIT ? OFFSET ?
-        ''', (limit, offset))
+        # Maintained by triggers, see migrate_email_database
+        total_count = get_email_count(conn)
         
-        # Convert to list of dicts
-        emails = [dict(row) for row in cursor.fetchall()]
-        
-        conn.close()
+        # date_sort lets clients place live updates (see /api/changes)
+        columns = EMAIL_LIST_COLUMNS + ('date_sort',)
+        rows, next_cursor = get_email_page(conn, limit, cursor_arg, columns)
+        emails = [dict(zip(columns, row)) for row in rows]
         
         return jsonify({
             'emails': emails,
             'total': total_count,
-            'page': page,
             'limit': limit,
-            'pages': (total_count + limit - 1) // limit  # Ceiling division
+            'pages': (total_count + limit - 1) // limit,  # Ceiling division
+            'next_cursor': next_cursor
         })
         
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
 
 
 #The new route to delete files and emails buttons
@@ -301,74 +338,107 @@ def delete_file_evidence(file_id):
 
 @app.route('/api/emails/delete/<email_id>', methods=['DELETE'])
 def delete_email(email_id):
+    conn = None
     try:
-        conn = sqlite3.connect('src/database/emails.db')
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM email_metadata WHERE id = ?", (email_id,))
-        conn.commit()
+        conn = get_email_db()
+        delete_emails(conn, [email_id])
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
 
 @app.route('/api/evidence')
 def get_evidence():
-    analyzer = EnhancedFileAnalyzer()
+    """Stream one page of evidence.
+
+    Query parameters:
+        cursor: only return rows with an id lower than this (from next_cursor)
+        limit: page size (default 100, max 1000)
+        fields: comma-separated output fields (default: all)
+        mime: mime type prefix filter, e.g. 'image/'
+        min_score / max_score: manipulation score range
+    """
+    fields_arg = request.args.get('fields')
+    if fields_arg:
+        fields = [f.strip() for f in fields_arg.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in EVIDENCE_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    else:
+        fields = list(EVIDENCE_FIELDS)
+
+    limit = request.args.get('limit', EVIDENCE_DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit, EVIDENCE_MAX_LIMIT))
+    query, params = build_evidence_query(
+        fields,
+        cursor=request.args.get('cursor', type=int),
+        limit=limit,
+        mime=request.args.get('mime'),
+        min_score=request.args.get('min_score', type=float),
+        max_score=request.args.get('max_score', type=float)
+    )
+
+    # The query runs (and its first rows are read) before the response
+    # starts, so errors there are still a 500
+    conn = sqlite3.connect("src/database/evidence.db")
     try:
-        cursor = analyzer.conn.cursor()
-        cursor.execute("""
-            SELECT 
-                fm.id,
-                fm.file_name,
-                fm.file_size,
-                fm.hash_sha256,
-                fa.file_type,
-                fa.mime_type,
-                fa.manipulation_confidence,
-                im.width,
-                im.height,
-                im.format,
-                im.mode,
-                im.dpi,
-                im.compression,
-                im.image_size_mb,
-                im.aspect_ratio,
-                im.color_depth,
-                im.orientation,
-                im.exif_data
-            FROM file_metadata fm
-            LEFT JOIN file_analysis fa ON fm.id = fa.file_id
-            LEFT JOIN image_metadata im ON fm.id = im.file_id
-            ORDER BY fm.id DESC
-        """)
-        
-        results = cursor.fetchall()
-        return jsonify([{
-            'id': r[0],
-            'filename': r[1],
-            'size': r[2],
-            'hash': r[3],
-            'type': r[4] or 'Unknown',
-            'mime': r[5] or 'Unknown',
-            'manipulation_score': r[6] or 0.0,
-            'width': r[7],
-            'height': r[8],
-            'format': r[9],
-            'mode': r[10],
-            'dpi': r[11],
-            'compression': r[12],
-            'image_size_mb': r[13],
-            'aspect_ratio': r[14],
-            'color_depth': r[15],
-            'orientation': r[16],
-            'exif_data': r[17]
-        } for r in results])
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchmany(200)
+    except Exception as e:
+        conn.close()
+        app.logger.error(f"Error fetching evidence: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+    def generate(rows):
+        try:
+            yield '{"evidence": ['
+            count = 0
+            last_id = None
+            error = None
+            while rows:
+                chunk = []
+                for row in rows:
+                    chunk.append(json.dumps(format_evidence_row(fields, row), default=str))
+                    last_id = row[0]
+                yield (',' if count else '') + ','.join(chunk)
+                count += len(rows)
+                try:
+                    rows = cursor.fetchmany(200)
+                except Exception as e:
+                    # Too late for a 500: end the document with the error
+                    app.logger.error(f"Error streaming evidence: {str(e)}")
+                    error = str(e)
+                    break
+            if error:
+                yield f'], "count": {count}, "next_cursor": null, "error": {json.dumps(error)}}}'
+                return
+            # A full page means there may be more rows after the last id
+            next_cursor = last_id if count == limit else None
+            yield f'], "count": {count}, "next_cursor": {json.dumps(next_cursor)}}}'
+        finally:
+            conn.close()
+
+    return Response(stream_with_context(generate(rows)), mimetype='application/json')
+
+@app.route('/api/evidence/<int:file_id>')
+def get_evidence_details(file_id):
+    """Return every field of a single evidence item"""
+    fields = list(EVIDENCE_FIELDS)
+    query, params = build_evidence_query(fields, limit=1, file_id=file_id)
+    conn = sqlite3.connect("src/database/evidence.db")
+    try:
+        row = conn.execute(query, params).fetchone()
+        if not row:
+            return jsonify({'error': 'File not found'}), 404
+        return jsonify(format_evidence_row(fields, row))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        analyzer.close()
+        conn.close()
 
 @app.route('/api/custody/<evidence_id>')
 def get_custody_chain(evidence_id):
@@ -397,6 +467,122 @@ def get_custody_chain(evidence_id):
             custody_manager.close()
 
 
+# Evidence fields sent with change deltas (the dashboard's list projection)
+EVIDENCE_CHANGE_FIELDS = ['filename', 'size', 'type', 'mime', 'manipulation_score']
+# Seconds between change feed checks and between system memory pushes on a stream
+CHANGE_POLL_INTERVAL = 1.0
+MEMORY_PUSH_INTERVAL = 5.0
+# Each stream holds a server thread: streams end after STREAM_MAX_SECONDS
+# (browsers reconnect and resume from the last event id) and at most
+# STREAM_MAX_CLIENTS run at once; others get a 503 and poll /api/changes
+STREAM_MAX_SECONDS = 300
+STREAM_MAX_CLIENTS = 8
+STREAM_RETRY_MS = 1000
+stream_slots = threading.BoundedSemaphore(STREAM_MAX_CLIENTS)
+
+def change_delta(feed, since, limit=CHANGE_PAGE_LIMIT):
+    """Changes after since, each with the item's current list row.
+
+    Evidence and email changes whose item no longer exists are reported
+    as deletes; custody changes name the evidence item whose chain grew.
+    'reset' changes (a source changed in bulk) carry no row.
+    """
+    if since is None:
+        return {'seq': feed.latest(), 'more': False, 'reset': False, 'changes': []}
+    delta = feed.changes(since, limit)
+    items = [c for c in delta['changes'] if c['operation'] != 'reset']
+    evidence_ids = [c['id'] for c in items if c['source'] == 'evidence']
+    email_ids = [c['id'] for c in items if c['source'] == 'email']
+
+    rows = {}
+    if evidence_ids:
+        query, params = build_evidence_query(EVIDENCE_CHANGE_FIELDS, limit=len(evidence_ids),
+                                             ids=evidence_ids)
+        for row in feed.evidence_conn.execute(query, params):
+            rows[('evidence', row[0])] = dict(format_evidence_row(EVIDENCE_CHANGE_FIELDS, row), id=row[0])
+    if email_ids:
+        columns = EMAIL_LIST_COLUMNS + ('date_sort',)
+        placeholders = ', '.join('?' * len(email_ids))
+        for row in feed.email_conn.execute(
+                f"SELECT {', '.join(columns)} FROM email_metadata WHERE id IN ({placeholders})", email_ids):
+            rows[('email', row[0])] = dict(zip(columns, row))
+    if any(c['source'] == 'email' for c in delta['changes']):
+        delta['email_total'] = get_email_count(feed.email_conn)
+
+    for change in items:
+        if change['source'] in ('evidence', 'email'):
+            change['row'] = rows.get((change['source'], change['id']))
+            if change['row'] is None:
+                change['operation'] = 'delete'
+    return delta
+
+@app.route('/api/changes')
+def get_changes():
+    """Changes after ?since=<seq> (without since: just the current seq)"""
+    feed = None
+    try:
+        feed = ChangeFeed()
+        limit = max(1, min(request.args.get('limit', CHANGE_PAGE_LIMIT, type=int), CHANGE_PAGE_LIMIT))
+        return jsonify(change_delta(feed, request.args.get('since', type=int), limit))
+    except Exception as e:
+        app.logger.error(f"Change feed failed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if feed:
+            feed.close()
+
+@app.route('/api/changes/stream')
+def stream_changes():
+    """Server-sent events: 'changes' deltas as they happen, 'memory' when system memory changes.
+
+    Resumes after ?since= or the Last-Event-ID header (each changes
+    event's id is its seq); without either, starts at the current seq.
+    Bounded by STREAM_MAX_SECONDS and STREAM_MAX_CLIENTS.
+    """
+    since = request.args.get('since', type=int)
+    if since is None and request.headers.get('Last-Event-ID', '').isdigit():
+        since = int(request.headers['Last-Event-ID'])
+    if not stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many change streams, poll /api/changes'}), 503
+
+    def generate():
+        feed = None
+        try:
+            feed = ChangeFeed()
+            seq = since if since is not None else feed.latest()
+            yield f"retry: {STREAM_RETRY_MS}\nid: {seq}\nevent: ready\ndata: {json.dumps({'seq': seq})}\n\n"
+            last_memory = None
+            next_memory = 0
+            # Writes to a client that went away fail at the next yield
+            # (a keepalive at least every MEMORY_PUSH_INTERVAL)
+            end = time.monotonic() + STREAM_MAX_SECONDS
+            while time.monotonic() < end:
+                delta = change_delta(feed, seq)
+                if delta['changes'] or delta['reset']:
+                    seq = delta['seq']
+                    yield f"id: {seq}\nevent: changes\ndata: {json.dumps(delta, default=str)}\n\n"
+                    if delta['more']:
+                        continue
+                if time.monotonic() >= next_memory:
+                    memory = mem_capture.get_system_memory_info()
+                    if memory != last_memory:
+                        yield f"event: memory\ndata: {json.dumps(memory)}\n\n"
+                        last_memory = memory
+                    else:
+                        # Lets the server notice clients that went away
+                        yield ": keepalive\n\n"
+                    next_memory = time.monotonic() + MEMORY_PUSH_INTERVAL
+                time.sleep(CHANGE_POLL_INTERVAL)
+        finally:
+            if feed:
+                feed.close()
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs even if the client left before the generator started
+    response.call_on_close(stream_slots.release)
+    return response
+
 @app.route('/api/emails/fetch', methods=['POST'])
 def fetch_new_emails():
     email_extractor = None
@@ -406,7 +592,15 @@ def fetch_new_emails():
             EMAIL_CONFIG['user'],
             EMAIL_CONFIG['password']
         )
-        num_fetched = email_extractor.fetch_emails(limit=10)  # Specify limit
+        options = request.get_json(silent=True) or {}
+        if options.get('mode') == 'latest':
+            num_fetched = email_extractor.fetch_emails(limit=options.get('limit', 10))
+        else:
+            # Default: incremental sync of everything above the stored UID mark
+            num_fetched = email_extractor.sync_emails(
+                max_messages=options.get('max_messages'),
+                headers_only=bool(options.get('headers_only', False))
+            )
         if num_fetched > 0:
             return jsonify({
                 'status': 'success',
@@ -427,6 +621,207 @@ def fetch_new_emails():
         if email_extractor:
             email_extractor.cleanup()
 
+# Email sweeps run in the background; finished jobs are kept for polling
+COLLECT_JOBS_KEPT = 20
+collect_jobs = {}
+collect_jobs_lock = threading.Lock()
+collect_job_ids = itertools.count(1)
+
+def run_collect_job(job, coordinator):
+    try:
+        summary = coordinator.collect()
+        job.update({
+            'status': 'error' if summary['writer_error'] else 'success',
+            'message': f"Collected {summary['inserted']} new emails",
+            'count': summary['inserted'],
+            'summary': summary,
+            'refresh': summary['inserted'] > 0
+        })
+    except Exception as e:
+        job.update({'status': 'error', 'message': str(e)})
+    job['finished'] = datetime.now().isoformat()
+
+@app.route('/api/emails/collect', methods=['POST'])
+def collect_all_emails():
+    """Start a sweep of every folder (or the given folders) of the configured account"""
+    try:
+        options = request.get_json(silent=True) or {}
+        coordinator = EmailCollectionCoordinator(
+            [EMAIL_CONFIG],
+            max_sessions=options.get('max_sessions', 4),
+            folders=options.get('folders'),
+            headers_only=bool(options.get('headers_only', False)),
+            extract_attachments=bool(options.get('extract_attachments', False))
+        )
+        with collect_jobs_lock:
+            running = [job for job in collect_jobs.values() if job['status'] == 'running']
+            if running:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'An email collection is already running',
+                    'job_id': running[0]['id']
+                }), 409
+            job = {'id': str(next(collect_job_ids)), 'status': 'running',
+                   'started': datetime.now().isoformat()}
+            collect_jobs[job['id']] = job
+            for job_id in list(collect_jobs)[:-COLLECT_JOBS_KEPT]:
+                collect_jobs.pop(job_id)
+        threading.Thread(target=run_collect_job, args=(job, coordinator),
+                         name=f"email-collect-{job['id']}", daemon=True).start()
+        return jsonify({'status': 'started', 'job_id': job['id']}), 202
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/emails/collect/<job_id>')
+def get_collect_job(job_id):
+    """Return the state of an email sweep, with its summary once finished"""
+    with collect_jobs_lock:
+        job = collect_jobs.get(job_id)
+        if job is None:
+            return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+        return jsonify(dict(job))
+
+@app.route('/api/emails/<int:email_id>/thread')
+def get_email_thread(email_id):
+    """Return the whole conversation an email belongs to, oldest first"""
+    conn = None
+    try:
+        conn = get_email_db()
+        row = conn.execute(
+            "SELECT message_id FROM email_metadata WHERE id = ?", (email_id,)
+        ).fetchone()
+        if not row:
+            return jsonify({'error': 'Email not found'}), 404
+        if not row[0]:
+            return jsonify({'error': 'Email has no Message-ID to thread on'}), 400
+        
+        columns = EMAIL_LIST_COLUMNS + ('in_reply_to',)
+        messages = [
+            dict(zip(columns + ('copies',), thread_row))
+            for thread_row in get_thread(conn, row[0], columns)
+        ]
+        return jsonify({'message_id': row[0], 'messages': messages, 'count': len(messages)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+
+@app.route('/api/emails/<int:email_id>/copies')
+def get_email_copies(email_id):
+    """List every folder and account a message was collected from"""
+    conn = None
+    try:
+        conn = get_email_db()
+        row = conn.execute(
+            "SELECT message_id FROM email_metadata WHERE id = ?", (email_id,)
+        ).fetchone()
+        if not row:
+            return jsonify({'error': 'Email not found'}), 404
+        
+        keys = ('server', 'user', 'folder', 'uidvalidity', 'uid', 'raw_sha256', 'seen')
+        copies = [dict(zip(keys, copy)) for copy in get_copies(conn, row[0])]
+        return jsonify({'message_id': row[0], 'copies': copies, 'count': len(copies)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+
+@app.route('/api/emails/rescore', methods=['POST'])
+def rescore_email_authentication():
+    """Re-score SPF/DKIM/DMARC for stored emails from their header blocks"""
+    conn = None
+    try:
+        conn = get_email_db()
+        # Every row may change; the change feed reports one reset
+        with paused_change_log(conn, 'email'):
+            count = rescore_emails(conn)
+        return jsonify({'status': 'success', 'count': count})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+
+@app.route('/api/emails/attachments/extract', methods=['POST'])
+def extract_email_attachments():
+    """Extract pending attachments into evidence, then analyze the queued files"""
+    attachment_extractor = None
+    analyzer = None
+    try:
+        options = request.get_json(silent=True) or {}
+        attachment_extractor = AttachmentExtractor()
+        emails, attachments = attachment_extractor.extract_pending(limit=options.get('limit'))
+        analyzer = EnhancedFileAnalyzer()
+        analyzed, failed = analyzer.analyze_pending()
+        return jsonify({
+            'status': 'success',
+            'emails': emails,
+            'attachments': attachments,
+            'analyzed': analyzed,
+            'failed': failed,
+            'refresh': attachments > 0
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    finally:
+        if attachment_extractor:
+            attachment_extractor.close()
+        if analyzer:
+            analyzer.close()
+
+@app.route('/api/emails/<int:email_id>/raw')
+def get_email_raw(email_id):
+    """Download the full message from the message store, or from the server on demand"""
+    email_extractor = None
+    conn = None
+    try:
+        conn = get_email_db()
+        row = conn.execute(
+            "SELECT imap_server, imap_user, imap_folder, raw_sha256 FROM email_metadata WHERE id = ?",
+            (email_id,)
+        ).fetchone()
+        if not row:
+            return jsonify({'error': 'Email not found'}), 404
+        
+        raw_message = None
+        if row[3]:
+            store = MessageStore()
+            try:
+                raw_message = store.get(row[3])
+            finally:
+                store.close()
+        if raw_message is not None:
+            return Response(
+                raw_message,
+                mimetype='message/rfc822',
+                headers={'Content-Disposition': f'attachment; filename=email_{email_id}.eml'}
+            )
+        
+        if (row[0], row[1]) != (EMAIL_CONFIG['server'], EMAIL_CONFIG['user']):
+            return jsonify({'error': 'Email was collected from a different account'}), 409
+        
+        email_extractor = EmailMetadataExtractor(
+            EMAIL_CONFIG['server'],
+            EMAIL_CONFIG['user'],
+            EMAIL_CONFIG['password'],
+            folder=row[2]
+        )
+        raw_message = email_extractor.fetch_full_message(email_id)
+        return Response(
+            raw_message,
+            mimetype='message/rfc822',
+            headers={'Content-Disposition': f'attachment; filename=email_{email_id}.eml'}
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+        if email_extractor:
+            email_extractor.cleanup()
+
 # Add these routes
 @app.route('/api/memory/system')
 def get_system_memory():
@@ -620,16 +1015,12 @@ def delete_emails_batch():
         
         email_ids = data['ids']
         
-        # Connect to database
-        conn = sqlite3.connect('src/database/emails.db')
-        cursor = conn.cursor()
-        
-        # Delete emails
-        placeholders = ','.join('?' for _ in email_ids)
-        cursor.execute(f'DELETE FROM email_metadata WHERE id IN ({placeholders})', email_ids)
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+        # Delete emails with their copies and reference edges
+        conn = get_email_db()
+        try:
+            deleted_count = delete_emails(conn, email_ids)
+        finally:
+            conn.close()
         
         return jsonify({
             'success': True,
@@ -644,9 +1035,12 @@ def delete_emails_batch():
 
 @app.route('/api/memory/system-processes')
 def get_system_processes():
-    analyzer = ProcessAnalyzer()
-    processes = analyzer.get_running_processes()
-    return jsonify(processes)
+    # Latest background sample; never waits on psutil once sampling runs
+    try:
+        processes = proc_analyzer.get_running_processes()
+        return jsonify(processes)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 @app.route('/api/memory/capture/<int:pid>', methods=['POST'])
 def capture_memory(pid):
     capture = MemoryCapture()
@@ -663,59 +1057,101 @@ def capture_memory(pid):
             'evidence_id': evidence_id,
             'path': path
         })
+    elif path:
+        return jsonify({
+            'status': 'error',
+            'message': 'Memory captured but not recorded in chain of custody',
+            'path': path
+        }), 500
     else:
         return jsonify({
             'status': 'error', 
             'message': 'Failed to capture memory'
         }), 500
 
+@app.route('/api/memory/capture/batch', methods=['POST'])
+def capture_memory_batch():
+    """Capture many processes concurrently and record custody in one transaction.
+
+    Body: {"pids": [...]} or {"all": true}, plus handler, location, notes
+    and optional workers.
+    """
+    try:
+        data = request.json or {}
+        if data.get('all'):
+            pids = [row['pid'] for row in proc_analyzer.get_running_processes(sort_by_memory=False)
+                    if row['pid'] != os.getpid()]
+        else:
+            pids = [int(pid) for pid in data.get('pids', [])]
+        if not pids:
+            return jsonify({'status': 'error', 'message': 'No processes selected'}), 400
+
+        capture = MemoryCapture()
+        results = capture.capture_processes_with_custody(
+            pids,
+            data.get('handler', session.get('username', 'system')),
+            data.get('location', 'localhost'),
+            data.get('notes'),
+            workers=data.get('workers', CAPTURE_WORKERS)
+        )
+        captured = sum(1 for result in results if result['evidence_id'])
+        return jsonify({
+            'status': 'success' if captured else 'error',
+            'captured': captured,
+            'failed': len(results) - captured,
+            'results': results
+        })
+    except Exception as e:
+        app.logger.error(f"Batch memory capture failed: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/api/memory/processes')
 def get_memory_processes():
-    analyzer = ProcessAnalyzer()
-    processes = analyzer.get_running_processes()
-    return jsonify(processes)
+    # Latest background sample; never waits on psutil once sampling runs
+    try:
+        processes = proc_analyzer.get_running_processes()
+        return jsonify(processes)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/memory/dumps')
 def get_memory_dumps():
+    """List memory dumps newest first; ?pid= and ?process= filter on indexed columns"""
     try:
-        # Connect to database
+        conditions = []
+        params = []
+        pid = request.args.get('pid', type=int)
+        if pid is not None:
+            conditions.append("m.pid = ?")
+            params.append(pid)
+        process_name = request.args.get('process')
+        if process_name:
+            conditions.append("m.process_name = ?")
+            params.append(process_name)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
         conn = sqlite3.connect("src/database/evidence.db")
         conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Query for memory dumps - simplified query to find more dumps
-        cursor.execute("""
-            SELECT f.id, f.file_name, f.file_path, f.file_size, f.last_modified
-            FROM file_metadata f
-            WHERE f.file_name LIKE 'memory_dump_%'
-            ORDER BY f.last_modified DESC
-        """)
-        
-        dumps = []
-        for row in cursor.fetchall():
-            # Extract process info from filename
-            import re
-            pid = "Unknown"
-            process_name = "Unknown Process"
-            
-            if row['file_name']:
-                match = re.search(r'memory_dump_(\d+)_(.+?)(?:_\d{8}_\d{6})?\.dmp', row['file_name'])
-                if match:
-                    pid = match.group(1)
-                    process_name = match.group(2)
-            
-            dumps.append({
-                'id': row['id'],
-                'file_name': row['file_name'],
-                'path': row['file_path'],
-                'size': row['file_size'],
-                'timestamp': row['last_modified'],
-                'pid': pid,
-                'process_name': process_name
-            })
-            
+        rows = conn.execute(f"""
+            SELECT m.id, f.file_name, m.dump_path, m.dump_size, m.captured, m.pid,
+                   m.process_name, m.region_count
+            FROM memory_dumps m JOIN file_metadata f ON f.id = m.id
+            {where}
+            ORDER BY m.captured DESC
+        """, params).fetchall()
         conn.close()
         
+        dumps = [{
+            'id': row['id'],
+            'file_name': row['file_name'],
+            'path': row['dump_path'],
+            'size': row['dump_size'],
+            'timestamp': row['captured'],
+            'pid': row['pid'] if row['pid'] is not None else "Unknown",
+            'process_name': row['process_name'] or "Unknown Process",
+            'region_count': row['region_count']
+        } for row in rows]
+        
         # Log the number of dumps found
         app.logger.info(f"Found {len(dumps)} memory dumps")
         return jsonify(dumps)
@@ -726,18 +1162,24 @@ def get_memory_dumps():
 
 @app.route('/api/memory/analyze/<int:pid>', methods=['POST'])
 def analyze_process_memory(pid):
+    """Start recording a resource timeline for a process"""
     try:
         data = request.json or {}
         duration = data.get('duration', 60)
         interval = data.get('interval', 5)
         
-        # Placeholder response until the full implementation
+        timeline_id = get_recorder().start(pid, duration, interval)
         return jsonify({
             'status': 'success',
-            'message': f'Analysis of process {pid} completed',
-            'timelineId': f'analysis_{pid}_{datetime.now().strftime("%Y%m%d%H%M%S")}'
+            'message': f'Recording timeline of process {pid} for {duration} seconds',
+            'timelineId': timeline_id
         })
         
+    except psutil.NoSuchProcess:
+        return jsonify({
+            'status': 'error',
+            'message': f'Process {pid} not found'
+        }), 404
     except Exception as e:
         app.logger.error(f"Process analysis failed: {str(e)}")
         return jsonify({
@@ -745,6 +1187,71 @@ def analyze_process_memory(pid):
             'message': str(e)
         }), 500
 
+@app.route('/api/memory/timeline/<timeline_id>')
+def get_process_timeline(timeline_id):
+    """Return a timeline's summary and a downsampled view of its samples.
+
+    ?points= caps the number of points (samples are bucketed with
+    avg/min/max per metric); ?start= and ?end= select a window in
+    seconds since the recording started.
+    """
+    try:
+        timeline = get_recorder().get(timeline_id)
+        if timeline is None:
+            return jsonify({'error': 'Timeline not found'}), 404
+        points = request.args.get('points', DEFAULT_VIEW_POINTS, type=int)
+        start = request.args.get('start', type=float)
+        end = request.args.get('end', type=float)
+        return jsonify({
+            'timeline': timeline.summary(),
+            'view': timeline.view(points, start, end)
+        })
+    except Exception as e:
+        app.logger.error(f"Failed to read timeline {timeline_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/memory/timeline/<timeline_id>/stop', methods=['POST'])
+def stop_process_timeline(timeline_id):
+    if get_recorder().stop(timeline_id):
+        return jsonify({'status': 'success'})
+    return jsonify({'status': 'error', 'message': 'Timeline is not recording'}), 404
+
+@app.route('/api/memory/timelines')
+def get_active_timelines():
+    """List recordings in progress"""
+    return jsonify(get_recorder().active())
+
+@app.route('/api/memory/snapshots', methods=['GET', 'POST'])
+def system_snapshots():
+    """POST captures a system-wide snapshot; GET lists snapshot ids, newest first"""
+    try:
+        if request.method == 'POST':
+            return jsonify({'status': 'success', 'snapshot': snapshot_store.capture()})
+        return jsonify(snapshot_store.list())
+    except Exception as e:
+        app.logger.error(f"System snapshot failed: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/memory/snapshots/diff')
+def diff_system_snapshots():
+    """What changed between ?from=<id> and ?to=<id> (default: the two newest)"""
+    try:
+        old_id = request.args.get('from')
+        new_id = request.args.get('to')
+        if not old_id or not new_id:
+            snapshot_ids = snapshot_store.list()
+            if len(snapshot_ids) < 2:
+                return jsonify({'error': 'At least two snapshots are needed'}), 400
+            new_id = new_id or snapshot_ids[0]
+            old_id = old_id or snapshot_ids[1]
+        diff = snapshot_store.diff(old_id, new_id)
+        if diff is None:
+            return jsonify({'error': 'Snapshot not found'}), 404
+        return jsonify(diff)
+    except Exception as e:
+        app.logger.error(f"Snapshot diff failed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/memory/capture/<int:pid>', methods=['POST'])
 def capture_process_memory(pid):
     try:
@@ -786,11 +1293,14 @@ def get_memory_dump_details(dump_id):
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        # Get basic file info
+        # File info and the capture's process details in one indexed lookup
         cursor.execute("""
-            SELECT * FROM file_metadata WHERE id = ?
+            SELECT f.*, m.info AS memory_info
+            FROM file_metadata f LEFT JOIN memory_dumps m ON m.id = f.id
+            WHERE f.id = ?
         """, (dump_id,))
         file_data = dict(cursor.fetchone() or {})
+        memory_info = json.loads(file_data.pop('memory_info', None) or '{}')
         
         # Get custody information
         cursor.execute("""
@@ -800,73 +1310,143 @@ def get_memory_dump_details(dump_id):
         """, (dump_id,))
         custody_events = [dict(row) for row in cursor.fetchall()]
         
-        # Read memory info from JSON if available
-        memory_info = {}
-        json_path = file_data.get('file_path', '') + '.json'
-        if os.path.exists(json_path):
-            with open(json_path, 'r') as f:
-                import json
-                memory_info = json.load(f)
-        
         conn.close()
         
+        # Region listing comes from the dump's footer index, one page at a time
+        dump_index = None
+        dump_path = file_data.get('file_path', '')
+        if dump_path and is_dump_container(dump_path):
+            offset = max(0, request.args.get('region_offset', 0, type=int))
+            limit = max(1, min(request.args.get('region_limit', 200, type=int), 5000))
+            with DumpReader(dump_path) as reader:
+                dump_index = reader.summary()
+                # Hex strings as well: kernel addresses exceed JavaScript's exact integer range
+                dump_index['region_list'] = [
+                    dict(region, start_hex=hex(region['start']), end_hex=hex(region['end']))
+                    for region in reader.regions[offset:offset + limit]
+                ]
+                dump_index['skipped_list'] = reader.skipped[:limit]
+                dump_index['region_offset'] = offset
+        
         return jsonify({
             'file_info': file_data,
             'custody_events': custody_events,
-            'memory_info': memory_info
+            'memory_info': memory_info,
+            'dump_index': dump_index
         })
         
     except Exception as e:
         app.logger.error(f"Failed to get memory dump details: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/memory/dump/<int:dump_id>/read')
+def read_memory_dump(dump_id):
+    """Read a virtual address range from a dump without unpacking the whole file"""
+    try:
+        address = int(request.args.get('address', ''), 0)
+        length = max(1, min(request.args.get('length', 256, type=int), 1024 * 1024))
+    except ValueError:
+        return jsonify({'error': 'address must be an integer (e.g. 0x7f00deadb000)'}), 400
+    
+    conn = sqlite3.connect("src/database/evidence.db")
+    try:
+        row = conn.execute("SELECT file_path FROM file_metadata WHERE id = ?", (dump_id,)).fetchone()
+    finally:
+        conn.close()
+    if not row or not is_dump_container(row[0]):
+        return jsonify({'error': 'Memory dump not found'}), 404
+    
+    try:
+        with DumpReader(row[0]) as reader:
+            data = reader.read(address, length)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 416
+    
+    if request.args.get('format') == 'raw':
+        return Response(data, mimetype='application/octet-stream')
+    return jsonify({'address': hex(address), 'length': len(data), 'hex': data.hex()})
+
+@app.route('/api/ioc/scan/<int:file_id>', methods=['POST'])
+def scan_evidence_iocs(file_id):
+    """Extract IOCs from an evidence file or memory dump into ioc_hits"""
+    extractor = None
+    try:
+        options = request.get_json(silent=True) or {}
+        extractor = IOCExtractor(keywords=options.get('keywords', []))
+        counts = extractor.scan_evidence(file_id)
+        return jsonify({'status': 'success', 'file_id': file_id, 'counts': counts})
+    except ValueError as e:
+        # Unusable keywords
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    finally:
+        if extractor:
+            extractor.close()
+
+@app.route('/api/ioc/hits')
+def get_ioc_hits():
+    """Search IOC hits by evidence, type and/or exact value (keyset paged by id)"""
+    conditions = []
+    params = []
+    for column, arg in (('file_id', 'file_id'), ('ioc_type', 'type'), ('value', 'value')):
+        value = request.args.get(arg)
+        if value:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    cursor_arg = request.args.get('cursor', type=int)
+    if cursor_arg:
+        conditions.append("id > ?")
+        params.append(cursor_arg)
+    limit = max(1, min(request.args.get('limit', 200, type=int), 5000))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    conn = sqlite3.connect("src/database/evidence.db")
+    try:
+        setup_ioc_tables(conn)
+        rows = conn.execute(f"""
+            SELECT id, file_id, source_path, ioc_type, value, offset, encoding, scan_timestamp
+            FROM ioc_hits {where}
+            ORDER BY id LIMIT ?
+        """, params + [limit]).fetchall()
+    finally:
+        conn.close()
+    
+    keys = ('id', 'file_id', 'source', 'type', 'value', 'offset', 'encoding', 'scanned')
+    hits = [dict(zip(keys, row)) for row in rows]
+    for hit in hits:
+        hit['offset_hex'] = hex(hit['offset'])
+    return jsonify({
+        'hits': hits,
+        'count': len(hits),
+        'next_cursor': hits[-1]['id'] if len(hits) == limit else None
+    })
+
 @app.route('/api/memory/dumps/clear', methods=['POST'])
 def clear_memory_dumps():
+    conn = None
     try:
-        # Connect to database
         conn = sqlite3.connect("src/database/evidence.db")
-        cursor = conn.cursor()
-        
-        # First, get a list of files to delete
-        cursor.execute("""
-            SELECT file_path FROM file_metadata 
-            WHERE file_name LIKE 'memory_dump_%'
-        """)
-        
-        file_paths = [row[0] for row in cursor.fetchall()]
-        
-        # Delete files from filesystem
-        deleted_count = 0
-        for file_path in file_paths:
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    # Also try to delete the JSON companion file
-                    json_path = f"{file_path}.json"
-                    if os.path.exists(json_path):
-                        os.remove(json_path)
-                    deleted_count += 1
-            except Exception as e:
-                app.logger.error(f"Error deleting file {file_path}: {e}")
-        
-        # Delete entries from custody_chain
-        cursor.execute("""
-            DELETE FROM custody_chain 
-            WHERE evidence_id IN (
-                SELECT id FROM file_metadata 
-                WHERE file_name LIKE 'memory_dump_%'
-            )
-        """)
-        
-        # Delete entries from file_metadata
-        cursor.execute("""
-            DELETE FROM file_metadata 
-            WHERE file_name LIKE 'memory_dump_%'
-        """)
-        
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+        with conn:
+            # IMMEDIATE: no capture can be recorded between the read and the deletes
+            conn.execute("BEGIN IMMEDIATE")
+            dump_paths = [row[0] for row in conn.execute("SELECT dump_path FROM memory_dumps")]
+            conn.execute("""
+                DELETE FROM custody_chain
+                WHERE evidence_id IN (SELECT id FROM memory_dumps)
+            """)
+            conn.execute("DELETE FROM file_metadata WHERE id IN (SELECT id FROM memory_dumps)")
+            deleted_count = conn.execute("DELETE FROM memory_dumps").rowcount
+
+        # Files go once no row points at them; sidecars too, even without
+        # their dump, or the next backfill would index them again
+        for dump_path in dump_paths:
+            for path in (dump_path, f"{dump_path}.json"):
+                try:
+                    if path and os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    app.logger.error(f"Error deleting file {path}: {e}")
         
         app.logger.info(f"Deleted {deleted_count} memory dumps")
         
@@ -882,6 +1462,9 @@ def clear_memory_dumps():
             'success': False,
             'error': str(e)
         }), 500
+    finally:
+        if conn:
+            conn.close()
 
 # In app.py - Update the deepfake endpoint
 @app.route('/api/analyze/deepfake', methods=['POST'])
@@ -6,6 +6,9 @@ const modal = new bootstrap.Modal(document.getElementById('fileDetailsModal'));
 let currentEmailPage = 1;
 const emailsPerPage = 10; // Configurable
 let totalEmails = 0;
+// Keyset cursors: emailPageCursors[n - 1] fetches page n (page 1 has none)
+let emailPageCursors = [null];
+let nextEmailCursor = null;
 
 // Utility Object
 const Utils = {
@@ -77,20 +80,30 @@ const Utils = {
 // Email Functions
 async function loadEmails(page = 1) {
     try {
-        // Update current page
-        currentEmailPage = page;
+        // Pages are walked by cursor, so only known pages can be requested
+        if (page === 1) {
+            emailPageCursors = [null];
+        } else if (page > emailPageCursors.length) {
+            page = emailPageCursors.length;
+        }
+        const cursor = emailPageCursors[page - 1];
         
         // Show loading indicator
         document.getElementById('emailsBody').innerHTML = '<tr><td colspan="6" class="text-center">Loading emails...</td></tr>';
         
-        const response = await fetch(`/api/emails?page=${page}&limit=${emailsPerPage}`);
+        let url = `/api/emails?limit=${emailsPerPage}`;
+        if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+        const response = await fetch(url);
         const data = await response.json();
         
         if (Array.isArray(data.emails)) {
-            // Sort emails by date (newest first)
-            data.emails.sort((a, b) => new Date(b.date) - new Date(a.date));
+            // Update current page
+            currentEmailPage = page;
+            nextEmailCursor = data.next_cursor;
+            emailPageCursors = emailPageCursors.slice(0, page);
+            if (nextEmailCursor) emailPageCursors.push(nextEmailCursor);
             
-            // Update UI
+            // Update UI (rows arrive newest first)
             updateEmailTable(data.emails);
             
             // Update pagination
@@ -100,7 +113,7 @@ async function loadEmails(page = 1) {
             // Update counter
             document.getElementById('emailCount').textContent = `${totalEmails} emails`;
         } else {
-            throw new Error('Invalid response format');
+            throw new Error(data.error || 'Invalid response format');
         }
     } catch (error) {
         console.error('Error loading emails:', error);
@@ -113,42 +126,24 @@ async function loadEmails(page = 1) {
 function updateEmailPagination(currentPage, totalCount) {
     const totalPages = Math.ceil(totalCount / emailsPerPage);
     const paginationEl = document.getElementById('emailPagination');
+    const hasNext = nextEmailCursor !== null;
     
     let paginationHtml = `
         <nav aria-label="Email pagination">
             <ul class="pagination justify-content-center mb-0">
+                <li class="page-item ${currentPage <= 1 ? 'disabled' : ''}">
+                    <button class="page-link" ${currentPage <= 1 ? 'disabled' : ''} 
+                     onclick="loadEmails(1)">First</button>
+                </li>
                 <li class="page-item ${currentPage <= 1 ? 'disabled' : ''}">
                     <button class="page-link" ${currentPage <= 1 ? 'disabled' : ''} 
                      onclick="loadEmails(${currentPage-1})">Previous</button>
                 </li>
-    `;
-    
-    // Show page numbers with limit to avoid too many buttons
-    const maxPageButtons = 5;
-    const startPage = Math.max(1, currentPage - Math.floor(maxPageButtons / 2));
-    const endPage = Math.min(totalPages, startPage + maxPageButtons - 1);
-    
-    if (startPage > 1) {
-        paginationHtml += `<li class="page-item"><button class="page-link" onclick="loadEmails(1)">1</button></li>`;
-        if (startPage > 2) paginationHtml += `<li class="page-item disabled"><span class="page-link">...</span></li>`;
-    }
-    
-    for (let i = startPage; i <= endPage; i++) {
-        paginationHtml += `
-            <li class="page-item ${currentPage === i ? 'active' : ''}">
-                <button class="page-link" onclick="loadEmails(${i})">${i}</button>
-            </li>
-        `;
-    }
-    
-    if (endPage < totalPages) {
-        if (endPage < totalPages - 1) paginationHtml += `<li class="page-item disabled"><span class="page-link">...</span></li>`;
-        paginationHtml += `<li class="page-item"><button class="page-link" onclick="loadEmails(${totalPages})">${totalPages}</button></li>`;
-    }
-    
-    paginationHtml += `
-                <li class="page-item ${currentPage >= totalPages ? 'disabled' : ''}">
-                    <button class="page-link" ${currentPage >= totalPages ? 'disabled' : ''}
+                <li class="page-item active">
+                    <span class="page-link">${currentPage}</span>
+                </li>
+                <li class="page-item ${hasNext ? '' : 'disabled'}">
+                    <button class="page-link" ${hasNext ? '' : 'disabled'}
                      onclick="loadEmails(${currentPage+1})">Next</button>
                 </li>
             </ul>
@@ -179,11 +174,8 @@ async function refreshEmails() {
         const data = await response.json();
         
         if (data.status === 'success') {
-            // Reset to first page since we have new emails
-            currentEmailPage = 1;
-            
-            // Force refresh email list
-            await loadEmails(1); // Explicitly go to page 1 to see new emails
+            // New emails arrive through the change feed on page 1
+            if (currentEmailPage !== 1) await loadEmails(1);
             
             // Show success message
             Utils.showAlert('success', data.message || `Fetched ${data.count} new emails`);
@@ -208,9 +200,16 @@ function updateEmailTable(emails) {
     tbody.innerHTML = '';
     
     // Add new rows
-    emails.forEach(email => {
-        const row = document.createElement('tr');
-        row.innerHTML = `
+    emails.forEach(email => tbody.appendChild(buildEmailRow(email)));
+    updateEmailTableHeader();
+}
+
+// Rows carry their id and sort key so live changes can find and place them
+function buildEmailRow(email) {
+    const row = document.createElement('tr');
+    row.dataset.emailId = email.id;
+    row.dataset.dateSort = email.date_sort || '';
+    row.innerHTML = `
             <td>
                 <input type="checkbox" class="email-checkbox" data-id="${email.id}">
             </td>
@@ -218,9 +217,9 @@ function updateEmailTable(emails) {
             <td>${email.sender}</td>
             <td>${email.subject}</td>
             <td>
-                <span class="badge bg-${email.spf_pass ? 'success' : 'danger'}" title="SPF">SPF</span>
-                <span class="badge bg-${email.dkim_pass ? 'success' : 'danger'}" title="DKIM">DKIM</span>
-                <span class="badge bg-${email.dmarc_pass ? 'success' : 'danger'}" title="DMARC">DMARC</span>
+                <span class="badge bg-${email.spf_pass ? 'success' : 'danger'}" title="SPF: ${email.spf_result || 'none'}">SPF</span>
+                <span class="badge bg-${email.dkim_pass ? 'success' : 'danger'}" title="DKIM: ${email.dkim_result || 'none'}${email.dkim_domain ? ' (' + email.dkim_domain + ')' : ''}">DKIM</span>
+                <span class="badge bg-${email.dmarc_pass ? 'success' : 'danger'}" title="DMARC: ${email.dmarc_result || 'none'}">DMARC</span>
             </td>
             <td>
                 <span class="badge ${email.is_forged ? 'bg-danger' : 'bg-success'}">
@@ -234,9 +233,10 @@ function updateEmailTable(emails) {
                 </button>
             </td>
         `;
-        tbody.appendChild(row);
-    });
-    
+    return row;
+}
+
+function updateEmailTableHeader() {
     // Update header to include checkbox column
     const headerRow = document.querySelector('#emailsTable thead tr');
     if (headerRow && headerRow.querySelector('th:first-child') && !headerRow.querySelector('th:first-child').classList.contains('select-all')) {
@@ -253,6 +253,49 @@ function updateEmailTable(emails) {
     }
 }
 
+function compareEmailKeys(a, b) {
+    // [date_sort, id] pairs, compared like the (date_sort, id) keyset
+    if (a[0] !== b[0]) return a[0] < b[0] ? -1 : 1;
+    return a[1] - b[1];
+}
+
+// Live changes: replace, place or remove one email row on the current page
+function applyEmailChange(change) {
+    if (change.operation === 'delete') {
+        removeEmailRow(change.id);
+        return;
+    }
+    const existing = document.querySelector(`#emailsBody tr[data-email-id="${change.id}"]`);
+    if (existing) {
+        existing.replaceWith(buildEmailRow(change.row));
+        return;
+    }
+    // An email not shown yet can only belong on the first page
+    if (currentEmailPage !== 1) return;
+    const tbody = document.getElementById('emailsBody');
+    const rows = Array.from(tbody.querySelectorAll('tr[data-email-id]'));
+    const key = [change.row.date_sort || '', change.row.id];
+    const next = rows.find(row => compareEmailKeys([row.dataset.dateSort, Number(row.dataset.emailId)], key) < 0);
+    if (!next && rows.length >= emailsPerPage) return;
+    // Drop "Loading" / "No emails" placeholder rows
+    tbody.querySelectorAll('tr:not([data-email-id])').forEach(row => row.remove());
+    tbody.insertBefore(buildEmailRow(change.row), next || null);
+
+    // Keep one page of rows; the last one moves on to page 2
+    const shown = tbody.querySelectorAll('tr[data-email-id]');
+    if (shown.length > emailsPerPage) shown[shown.length - 1].remove();
+    if (shown.length >= emailsPerPage) {
+        const last = tbody.querySelectorAll('tr[data-email-id]')[emailsPerPage - 1];
+        nextEmailCursor = `${last.dataset.dateSort}|${last.dataset.emailId}`;
+        emailPageCursors = [null, nextEmailCursor];
+    }
+}
+
+function removeEmailRow(id) {
+    const existing = document.querySelector(`#emailsBody tr[data-email-id="${id}"]`);
+    if (existing) existing.remove();
+}
+
 // Add delete selected function
 function deleteSelectedEmails() {
     const selectedEmails = document.querySelectorAll('.email-checkbox:checked');
@@ -272,7 +315,7 @@ function deleteSelectedEmails() {
         .then(response => {
             if (response.ok) {
                 Utils.showAlert('success', `Successfully deleted ${selectedEmails.length} emails`);
-                loadEmails(currentEmailPage);
+                ids.forEach(removeEmailRow);
             } else {
                 throw new Error('Failed to delete selected emails');
             }
@@ -297,24 +340,33 @@ if (emailHeader) {
 }
 
 // Evidence Functions
-async function loadEvidence() {
+// Light projection for the list; full records are fetched per item on demand
+const EVIDENCE_LIST_FIELDS = 'id,filename,size,type,mime,manipulation_score';
+const evidencePerPage = 100;
+let evidenceCursor = null;
+
+async function loadEvidence(cursor = null) {
     try {
-        const response = await fetch('/api/evidence');
+        let url = `/api/evidence?limit=${evidencePerPage}&fields=${EVIDENCE_LIST_FIELDS}`;
+        if (cursor !== null) url += `&cursor=${cursor}`;
+
+        const response = await fetch(url);
         const data = await response.json();
         
-        if (Array.isArray(data)) {
-            // Sort data by upload_date in descending order (newest first)
-            data.sort((a, b) => {
-                const dateA = new Date(a.upload_date || 0);
-                const dateB = new Date(b.upload_date || 0);
-                return dateB - dateA;  // For descending order
-            });
-            
+        if (Array.isArray(data.evidence)) {
             const tbody = document.getElementById('resultsBody');
-            tbody.innerHTML = '';
-            data.forEach(result => addResultRow(result));
-            analysisCount = data.length;
+            if (cursor === null) {
+                tbody.innerHTML = '';
+                analysisCount = 0;
+            }
+            // Rows arrive newest first; append them in that order
+            data.evidence.forEach(result => addResultRow(result, true));
+            analysisCount += data.evidence.length;
+            evidenceCursor = data.next_cursor;
+            updateEvidenceLoadMore();
             document.getElementById('resultCount').textContent = `${analysisCount} files`;
+        } else {
+            throw new Error(data.error || 'Invalid response format');
         }
     } catch (error) {
         console.error('Error loading evidence:', error);
@@ -322,9 +374,50 @@ async function loadEvidence() {
     }
 }
 
-function addResultRow(result) {
+function updateEvidenceLoadMore() {
+    const tbody = document.getElementById('resultsBody');
+    const existing = document.getElementById('evidenceLoadMore');
+    if (existing) existing.remove();
+    if (evidenceCursor === null) return;
+
+    const row = document.createElement('tr');
+    row.id = 'evidenceLoadMore';
+    row.innerHTML = `
+        <td colspan="4" class="text-center">
+            <button class="btn btn-sm btn-outline-secondary" onclick="loadEvidence(evidenceCursor)">
+                Load more
+            </button>
+        </td>
+    `;
+    tbody.appendChild(row);
+}
+
+async function showEvidenceDetails(id) {
+    try {
+        const response = await fetch(`/api/evidence/${id}`);
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error);
+        showDetails(data);
+    } catch (error) {
+        console.error('Error loading evidence details:', error);
+        Utils.showAlert('danger', `Failed to load file details: ${error.message}`);
+    }
+}
+
+function addResultRow(result, append = false) {
     const tbody = document.getElementById('resultsBody');
+    const row = buildResultRow(result);
+    if (append) {
+        const loadMore = document.getElementById('evidenceLoadMore');
+        tbody.insertBefore(row, loadMore);
+    } else {
+        tbody.insertBefore(row, tbody.firstChild);
+    }
+}
+
+function buildResultRow(result) {
     const row = document.createElement('tr');
+    row.dataset.evidenceId = result.id;
     
     // Format the file type display
     const getFileType = (filename) => {
@@ -343,16 +436,13 @@ function addResultRow(result) {
 
     const fileType = getFileType(result.filename);
     
-    // Clean the result data for JSON stringification
-    const jsonStr = JSON.stringify(result).replace(/'/g, "&apos;");
-    
     row.innerHTML = `
         <td>${result.filename}</td>
         <td>${fileType}</td>
         <td>${Utils.formatFileSize(result.size)}</td>
         
         <td>
-            <button class="btn btn-sm btn-details me-2" onclick='showDetails(${jsonStr})'>
+            <button class="btn btn-sm btn-details me-2" onclick='showEvidenceDetails(${result.id})'>
                 Details
             </button>
             <button class="btn btn-sm btn-danger" onclick='deleteEvidence(${result.id}, "${result.filename}")'>
@@ -360,7 +450,32 @@ function addResultRow(result) {
             </button>
         </td>
     `;
-    tbody.insertBefore(row, tbody.firstChild);
+    return row;
+}
+
+// Live changes: insert, replace or remove one evidence row in place
+function upsertEvidenceRow(result) {
+    const existing = document.querySelector(`#resultsBody tr[data-evidence-id="${result.id}"]`);
+    if (existing) {
+        existing.replaceWith(buildResultRow(result));
+        return;
+    }
+    // Rows are newest (highest id) first; older items are not loaded yet
+    const first = document.querySelector('#resultsBody tr[data-evidence-id]');
+    if (!first || result.id > Number(first.dataset.evidenceId)) {
+        addResultRow(result);
+        analysisCount++;
+        document.getElementById('resultCount').textContent = `${analysisCount} files`;
+    }
+}
+
+function removeEvidenceRow(id) {
+    const existing = document.querySelector(`#resultsBody tr[data-evidence-id="${id}"]`);
+    if (existing) {
+        existing.remove();
+        analysisCount--;
+        document.getElementById('resultCount').textContent = `${analysisCount} files`;
+    }
 }
 
 function showDetails(result) {
@@ -512,8 +627,12 @@ function createPDFContent(result) {
 }
 
 // Custody Chain Functions
+// Evidence whose custody chain is on screen, refreshed on custody changes
+let custodyEvidenceId = null;
+
 async function loadCustodyChain(evidenceId) {
     const timeline = document.getElementById('custodyTimeline');
+    custodyEvidenceId = evidenceId;
     
     try {
         const response = await fetch(`/api/custody/${evidenceId}`);
@@ -577,7 +696,7 @@ async function deleteEvidence(id, filename) {
                 method: 'DELETE'
             });
             if (response.ok) {
-                loadEvidence();
+                removeEvidenceRow(id);
                 Utils.showAlert('success', 'Evidence deleted successfully');
             } else {
                 const data = await response.json();
@@ -599,7 +718,7 @@ async function deleteEmail(id, subject) {
             
             if (response.ok) {
                 Utils.showAlert('success', 'Email deleted successfully');
-                loadEmails(currentEmailPage); // Reload current page
+                removeEmailRow(id);
             } else {
                 const data = await response.json();
                 throw new Error(data.error || 'Failed to delete email');
@@ -623,7 +742,15 @@ function loadMemoryAnalysis() {
 function updateSystemMemory() {
     fetch('/api/memory/system')
         .then(response => response.json())
-        .then(data => {
+        .then(renderSystemMemory)
+        .catch(error => {
+            console.error('Error loading memory info:', error);
+            document.getElementById('systemMemoryInfo').innerHTML = 
+                '<div class="alert alert-danger">Error loading system memory information</div>';
+        });
+}
+
+function renderSystemMemory(data) {
             const memInfo = document.getElementById('systemMemoryInfo');
             memInfo.innerHTML = `
                 <div class="memory-stats">
@@ -659,16 +786,8 @@ function updateSystemMemory() {
                     </div>
                 </div>
             `;
-        })
-        .catch(error => {
-            console.error('Error loading memory info:', error);
-            document.getElementById('systemMemoryInfo').innerHTML = 
-                '<div class="alert alert-danger">Error loading system memory information</div>';
-        });
 }
 
-// Add auto-refresh for memory stats
-setInterval(updateSystemMemory, 5000); // Update every 5 seconds
 
 function refreshProcesses() {
     fetch('/api/memory/processes')
@@ -720,7 +839,93 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 // Initialize
+// Change feed: apply deltas pushed by /api/changes/stream
+function applyChanges(delta) {
+    if (delta.reset) {
+        // Changes were pruned before we saw them; start over
+        loadEvidence();
+        loadEmails(currentEmailPage);
+        return;
+    }
+    delta.changes.forEach(change => {
+        if (change.operation === 'reset') {
+            // The source was changed in bulk (maintenance); reload it
+            if (change.source === 'evidence') loadEvidence();
+            else if (change.source === 'email') loadEmails(currentEmailPage);
+            else if (custodyEvidenceId !== null &&
+                     document.getElementById('fileDetailsModal').classList.contains('show')) {
+                loadCustodyChain(custodyEvidenceId);
+            }
+        } else if (change.source === 'evidence') {
+            if (change.operation === 'delete') removeEvidenceRow(change.id);
+            else upsertEvidenceRow(change.row);
+        } else if (change.source === 'email') {
+            applyEmailChange(change);
+        } else if (change.source === 'custody' && change.id === custodyEvidenceId &&
+                   document.getElementById('fileDetailsModal').classList.contains('show')) {
+            loadCustodyChain(change.id);
+        }
+    });
+    if (delta.email_total !== undefined) {
+        totalEmails = delta.email_total;
+        document.getElementById('emailCount').textContent = `${totalEmails} emails`;
+        updateEmailPagination(currentEmailPage, totalEmails);
+    }
+}
+
+// Last change seq applied, shared by the stream and the polling fallback
+let changeSeq = null;
+
+function pollChanges() {
+    const query = changeSeq === null ? '' : `?since=${changeSeq}`;
+    fetch(`/api/changes${query}`)
+        .then(response => response.json())
+        .then(delta => {
+            if (delta.error) throw new Error(delta.error);
+            if (changeSeq !== null) applyChanges(delta);
+            changeSeq = delta.seq;
+            setTimeout(pollChanges, delta.more ? 0 : 5000);
+        })
+        .catch(error => {
+            console.error('Error polling changes:', error);
+            setTimeout(pollChanges, 5000);
+        });
+}
+
+function startPolling() {
+    // Without server-sent events (or when the server refuses a stream)
+    pollChanges();
+    setInterval(updateSystemMemory, 5000); // Update every 5 seconds
+}
+
+function connectChangeStream() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    // The server ends streams periodically; reconnects resume after the
+    // last event id on their own
+    const stream = new EventSource('/api/changes/stream');
+    stream.addEventListener('ready', event => {
+        if (changeSeq === null) changeSeq = JSON.parse(event.data).seq;
+    });
+    stream.addEventListener('changes', event => {
+        const delta = JSON.parse(event.data);
+        applyChanges(delta);
+        changeSeq = delta.seq;
+    });
+    stream.addEventListener('memory', event => {
+        if (document.getElementById('systemMemoryInfo')) renderSystemMemory(JSON.parse(event.data));
+    });
+    stream.onerror = () => {
+        // CLOSED: the server refused the stream (e.g. 503), so it is not retried
+        if (stream.readyState === EventSource.CLOSED) startPolling();
+    };
+}
+
 window.addEventListener('DOMContentLoaded', () => {
+    // Connect first: changes made while the lists load are applied after them
+    connectChangeStream();
     loadEvidence();
     loadEmails();
     
@@ -758,9 +963,8 @@ window.addEventListener('DOMContentLoaded', () => {
             const result = await response.json();
 
             if (response.ok) {
-                addResultRow(result.result);
-                analysisCount++;
-                document.getElementById('resultCount').textContent = `${analysisCount} files`;
+                // The change feed may already have added this row
+                upsertEvidenceRow(result.result);
                 statusText.textContent = 'Analysis complete!';
                 analysisStatus.classList.replace('alert-info', 'alert-success');
                 Utils.showAlert('success', 'File analyzed successfully');
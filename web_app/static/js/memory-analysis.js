@@ -248,15 +248,10 @@ async function analyzeProcess(pid) {
         const result = await response.json();
         
         if (result.status === 'success') {
-            Utils.showAlert('success', `Analysis complete for ${process.name}. Timeline saved.`, 5000);
+            Utils.showAlert('success', `Recording timeline for ${process.name} (${durationNum} seconds).`, 5000);
             
-            // Option to view results
-            setTimeout(() => {
-                if (confirm('Analysis complete. View results now?')) {
-                    // Open results viewer
-                    openTimelineViewer(result.timelineId);
-                }
-            }, 500);
+            // The viewer follows the recording while it runs
+            openTimelineViewer(result.timelineId);
         } else {
             throw new Error(result.message || 'Analysis failed');
         }
@@ -518,6 +513,51 @@ async function viewDump(id) {
             </div>`;
             }
             
+            // Prepare region listing from the dump index
+            let regionsHtml = '';
+            if (data.dump_index) {
+                const index = data.dump_index;
+                regionsHtml = `
+                    <div class="card mb-3">
+                        <div class="card-header bg-dark text-white">
+                            Memory Regions (${index.regions})
+                            <small class="ms-2">${formatFileSize(index.captured)} captured,
+                            ${formatFileSize(index.stored)} stored, ${index.zero_chunks}/${index.chunks} zero chunks,
+                            ${index.skipped} ranges skipped</small>
+                        </div>
+                        <div class="card-body p-0">
+                            <div class="table-responsive" style="max-height: 300px;">
+                                <table class="table table-sm table-striped mb-0 text-monospace">
+                                    <thead>
+                                        <tr>
+                                            <th>Start</th>
+                                            <th>End</th>
+                                            <th>Perms</th>
+                                            <th>Mapping</th>
+                                        </tr>
+                                    </thead>
+                                    <tbody>
+                `;
+                
+                index.region_list.forEach(region => {
+                    regionsHtml += `
+                        <tr>
+                            <td>${region.start_hex}</td>
+                            <td>${region.end_hex}</td>
+                            <td>${region.perms}</td>
+                            <td>${region.path || '[anonymous]'}</td>
+                        </tr>
+                    `;
+                });
+                
+                regionsHtml += `
+                                    </tbody>
+                                </table>
+                            </div>
+                        </div>
+                    </div>`;
+            }
+            
             // Update modal title
             document.getElementById('memoryDumpModalTitle').textContent = 
                 `Memory Dump: ${data.file_info.file_name || `ID ${id}`}`;
@@ -535,6 +575,7 @@ async function viewDump(id) {
                 </div>
                 
                 ${processInfo}
+                ${regionsHtml}
                 ${custodyHtml}
             `;
         } else {
@@ -645,10 +686,93 @@ function formatFileSize(bytes) {
 }
 
 /**
- * Open timeline viewer for process analysis
+ * Open timeline viewer for process analysis.
+ * Shows RSS and CPU in the memory dump modal and re-polls while recording.
  */
+let timelineChart = null;
+let timelinePoll = null;
+
 function openTimelineViewer(timelineId) {
-    window.open(`/memory/timeline/${timelineId}`, '_blank');
+    const modalElement = document.getElementById('memoryDumpModal');
+    document.getElementById('memoryDumpModalTitle').textContent = 'Process Timeline';
+    document.getElementById('memoryDumpModalBody').innerHTML = `
+        <p id="timelineSummary" class="text-muted">Loading timeline...</p>
+        <div style="height: 320px"><canvas id="timelineChart"></canvas></div>
+        <p id="timelineCounts" class="mt-2 small"></p>`;
+
+    const modal = bootstrap.Modal.getOrCreateInstance(modalElement);
+    modal.show();
+    modalElement.addEventListener('hidden.bs.modal', stopTimelineViewer, { once: true });
+
+    if (timelineChart) {
+        timelineChart.destroy();
+    }
+    timelineChart = new Chart(document.getElementById('timelineChart'), {
+        type: 'line',
+        data: {
+            labels: [],
+            datasets: [
+                { label: 'RSS (MB)', data: [], borderColor: '#0d6efd', yAxisID: 'memory', pointRadius: 0 },
+                { label: 'CPU %', data: [], borderColor: '#dc3545', yAxisID: 'cpu', pointRadius: 0 }
+            ]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            animation: false,
+            scales: {
+                memory: { type: 'linear', position: 'left' },
+                cpu: { type: 'linear', position: 'right', min: 0, grid: { drawOnChartArea: false } }
+            }
+        }
+    });
+
+    loadTimeline(timelineId);
+}
+
+async function loadTimeline(timelineId) {
+    try {
+        const response = await fetch(`/api/memory/timeline/${timelineId}?points=300`);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || 'Failed to load timeline');
+        }
+        if (!timelineChart) {
+            return;  // Viewer closed while the request was in flight
+        }
+        const timeline = data.timeline;
+        const view = data.view;
+
+        timelineChart.data.labels = view.offset.map(offset => `${Math.round(offset)}s`);
+        timelineChart.data.datasets[0].data = view.avg.rss.map(value => value === null ? null : value / 1048576);
+        timelineChart.data.datasets[1].data = view.avg.cpu_percent;
+        timelineChart.update();
+
+        const last = view.offset.length - 1;
+        const latest = metric => last >= 0 && view.avg[metric][last] !== null ? view.avg[metric][last] : 'N/A';
+        document.getElementById('timelineSummary').textContent =
+            `${timeline.name} (PID ${timeline.pid}) - ${timeline.status}, ` +
+            `${timeline.samples} samples every ${timeline.interval}s`;
+        document.getElementById('timelineCounts').textContent =
+            `Threads: ${latest('threads')} | Open files: ${latest('open_files')} | Connections: ${latest('connections')}`;
+
+        clearTimeout(timelinePoll);
+        if (timeline.status === 'recording') {
+            timelinePoll = setTimeout(() => loadTimeline(timelineId), timeline.interval * 1000);
+        }
+    } catch (error) {
+        console.error('Failed to load timeline:', error);
+        document.getElementById('timelineSummary').textContent = `Error: ${error.message}`;
+    }
+}
+
+function stopTimelineViewer() {
+    clearTimeout(timelinePoll);
+    timelinePoll = null;
+    if (timelineChart) {
+        timelineChart.destroy();
+        timelineChart = null;
+    }
 }
 
 /**